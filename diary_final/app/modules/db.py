@@ -1,2 +1,100 @@
 # modules/db.py
-# (full code with shim and chunks etc should be here)
+# 역할: 루트 modules/db.py(일기/메모/할 일 스키마·CRUD·연결 풀)를 그대로 다시 내보내는 shim + 문서 청크 테이블.
+# 테이블:
+#   documents(id PK, name, kind pdf/docx, pages, entry_kind diary/memo, entry_key, status, created_at)
+#   doc_chunks(id PK, doc_id FK, page, seq, text): 업로드 문서를 나눈 조각, documents 삭제 시 함께 삭제
+
+import importlib.util, os, sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# app/ 아래에서는 `modules` 가 이 폴더를 가리키므로 루트 db 모듈은 파일 경로로 불러온다
+_CORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "modules", "db.py")
+if "diary_core_db" not in sys.modules:
+    _spec = importlib.util.spec_from_file_location("diary_core_db", _CORE_PATH)
+    _mod = importlib.util.module_from_spec(_spec)
+    sys.modules["diary_core_db"] = _mod
+    _spec.loader.exec_module(_mod)
+from diary_core_db import *  # noqa: F401,F403
+from diary_core_db import reading, writing, get_pool as _core_get_pool
+
+def get_pool(path: str, max_readers: int = 4):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    pool = _core_get_pool(path, max_readers=max_readers)
+    init_chunk_schema(pool)
+    return pool
+
+def init_chunk_schema(conn):
+    with writing(conn) as c:
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS documents(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            pages INTEGER DEFAULT 0,
+            entry_kind TEXT,
+            entry_key TEXT,
+            status TEXT DEFAULT 'parsing',
+            created_at TEXT
+        )""")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_documents_entry ON documents(entry_kind, entry_key)")
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS doc_chunks(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            doc_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+            page INTEGER,
+            seq INTEGER,
+            text TEXT
+        )""")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_doc_chunks_doc ON doc_chunks(doc_id, page, seq)")
+
+def create_document(conn, name: str, kind: str, entry_kind: Optional[str] = None, entry_key: Optional[str] = None) -> int:
+    with writing(conn) as c:
+        cur = c.execute(
+            "INSERT INTO documents(name, kind, entry_kind, entry_key, status, created_at) VALUES(?,?,?,?, 'parsing', ?)",
+            (name, kind, entry_kind, entry_key, datetime.now().isoformat(timespec="seconds"))
+        )
+        return cur.lastrowid
+
+def add_chunks(conn, doc_id: int, chunks: List[Tuple[int, int, str]]) -> int:
+    # chunks: [(page, seq, text), ...] — 한 트랜잭션에서 executemany
+    with writing(conn) as c:
+        c.executemany("INSERT INTO doc_chunks(doc_id, page, seq, text) VALUES(?,?,?,?)",
+                      [(doc_id, p, s, t) for p, s, t in chunks])
+    return len(chunks)
+
+def finish_document(conn, doc_id: int, pages: int, status: str = "done"):
+    with writing(conn) as c:
+        c.execute("UPDATE documents SET pages=?, status=? WHERE id=?", (pages, status, doc_id))
+
+def delete_document(conn, doc_id: int):
+    with writing(conn) as c:
+        # doc_chunks 는 ON DELETE CASCADE 로 함께 지워진다 (연결마다 PRAGMA foreign_keys=ON, 루트 db.PRAGMAS)
+        c.execute("DELETE FROM documents WHERE id=?", (doc_id,))
+
+def list_documents(conn, entry_kind: Optional[str] = None, entry_key: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+    sql = ("SELECT d.*, (SELECT COUNT(*) FROM doc_chunks c WHERE c.doc_id = d.id) AS chunk_cnt "
+           "FROM documents d WHERE 1=1")
+    params: List[Any] = []
+    if entry_kind:
+        sql += " AND d.entry_kind=?"
+        params.append(entry_kind)
+    if entry_key:
+        sql += " AND d.entry_key=?"
+        params.append(entry_key)
+    sql += " ORDER BY d.id DESC LIMIT ?"
+    params.append(limit)
+    with reading(conn) as c:
+        return [dict(r) for r in c.execute(sql, params).fetchall()]
+
+def get_chunks(conn, doc_id: int, limit: int = 50, after: Optional[Tuple[int, int]] = None) -> List[Dict[str, Any]]:
+    # after: 직전 페이지 마지막 (page, seq) — 색인 순서대로 이어 읽기
+    sql = "SELECT * FROM doc_chunks WHERE doc_id=?"
+    params: List[Any] = [doc_id]
+    if after:
+        sql += " AND (page, seq) > (?, ?)"
+        params += list(after)
+    sql += " ORDER BY page, seq LIMIT ?"
+    params.append(limit)
+    with reading(conn) as c:
+        return [dict(r) for r in c.execute(sql, params).fetchall()]
@@ -0,0 +1,196 @@
+# modules/ingest.py
+# 역할: 업로드 문서(PDF/DOCX) 수집 파이프라인.
+# - PDF 는 페이지 구간, DOCX 는 문단 구간 단위로 프로세스 풀에서 파싱 → 청크로 나눠 doc_chunks 에 구간마다 일괄 INSERT
+#   (DOCX 는 word/document.xml 을 iterparse 로 흘려 읽고 다 읽은 문단은 지운다 → 문서 전체를 트리로 올리지 않음)
+# - 동시에 풀에 올리는 구간 수를 제한해 수백 페이지 문서도 메모리가 일정
+# - 워커는 spawn 으로 이 모듈을 다시 import 하므로, 모듈 맨 위에서는 db 를 import 하지 않는다 (앱 쪽 함수 안에서만)
+# - 파이프라인은 백그라운드 스레드에서 돌고, 페이지는 IngestJob 의 진행 상태만 읽는다 (스크립트 스레드 비차단)
+
+import os, shutil, tempfile, threading, multiprocessing, zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from xml.etree.ElementTree import iterparse
+
+PAGES_PER_TASK = 8       # 프로세스 하나가 한 번에 파싱하는 PDF 페이지 수
+DOCX_PARAS_PER_PAGE = 30  # DOCX 는 쪽 개념이 없으므로 문단 묶음을 한 "페이지"로 본다
+CHUNK_CHARS = 800
+CHUNK_OVERLAP = 100
+
+# ---------- 워커 프로세스에서 실행 (streamlit/db 를 import 하지 않음) ----------
+def split_chunks(text: str, size: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    # 문단 경계를 살려 size 글자 안팎으로 묶고, 긴 문단은 overlap 만큼 겹쳐 자른다
+    paras = [p.strip() for p in text.replace("\r", "").split("\n\n") if p.strip()]
+    chunks: List[str] = []
+    buf = ""
+    for p in paras:
+        p = " ".join(p.split())
+        if len(p) > size:
+            if buf:
+                chunks.append(buf)
+                buf = ""
+            step = max(1, size - overlap)
+            chunks += [p[i:i + size] for i in range(0, len(p), step) if p[i:i + size].strip()]
+            continue
+        if buf and len(buf) + 1 + len(p) > size:
+            chunks.append(buf)
+            buf = p
+        else:
+            buf = f"{buf}\n{p}" if buf else p
+    if buf:
+        chunks.append(buf)
+    return chunks
+
+def _pdf_page_count(path: str) -> int:
+    from pdfminer.pdfpage import PDFPage
+    with open(path, "rb") as f:
+        return sum(1 for _ in PDFPage.get_pages(f))
+
+def _parse_pdf_range(path: str, start: int, end: int) -> List[Tuple[int, int, str]]:
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTTextContainer
+    out = []
+    for offset, page in enumerate(extract_pages(path, page_numbers=range(start, end))):
+        text = "\n\n".join(el.get_text() for el in page if isinstance(el, LTTextContainer))
+        out += [(start + offset + 1, seq, ch) for seq, ch in enumerate(split_chunks(text))]
+    return out
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+def _docx_paragraphs(path: str, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+    # 본문(w:body) 바로 아래 문단 중 빈 것을 뺀 [start, end) 번째 글자들. 표 안의 문단은 python-docx 의 paragraphs 처럼 제외
+    # document(깊이 1) / body(2) / p(3): 끝 이벤트에서 깊이를 줄인 뒤 2 이면 본문 직속 요소
+    with zipfile.ZipFile(path) as zf, zf.open("word/document.xml") as f:
+        depth, i = 0, 0
+        for ev, el in iterparse(f, events=("start", "end")):
+            if ev == "start":
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 2:
+                continue
+            if el.tag == _W + "p":
+                text = "".join(t.text or "" for t in el.iter(_W + "t"))
+                if text.strip():
+                    if end is not None and i >= end:
+                        return
+                    if i >= start:
+                        yield text
+                    i += 1
+            el.clear()
+
+def _docx_para_count(path: str) -> int:
+    return sum(1 for _ in _docx_paragraphs(path))
+
+def _parse_docx_range(path: str, start: int, end: int) -> List[Tuple[int, int, str]]:
+    # start 는 DOCX_PARAS_PER_PAGE 의 배수 (구간이 "페이지" 경계에서 나뉘도록)
+    paras = list(_docx_paragraphs(path, start, end))
+    out = []
+    for i in range(0, len(paras), DOCX_PARAS_PER_PAGE):
+        page = (start + i) // DOCX_PARAS_PER_PAGE + 1
+        out += [(page, seq, ch) for seq, ch in enumerate(split_chunks("\n\n".join(paras[i:i + DOCX_PARAS_PER_PAGE])))]
+    return out
+
+# ---------- 앱 프로세스 ----------
+WORKERS = max(1, (os.cpu_count() or 2) - 1)
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def _pool() -> ProcessPoolExecutor:
+    # 프로세스당 하나. Streamlit 서버는 다중 스레드이므로 fork 대신 spawn 으로 워커를 띄운다.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+class IngestJob:
+    """문서 하나의 수집 작업. start() 후 진행 상태(done_pages/total_pages/chunks/status)를 폴링한다."""
+
+    def __init__(self, conn, path: str, name: str, kind: str,
+                 entry_kind: Optional[str] = None, entry_key: Optional[str] = None):
+        self.conn, self.path, self.name, self.kind = conn, path, name, kind
+        self.entry_kind, self.entry_key = entry_kind, entry_key
+        self.doc_id: Optional[int] = None
+        self.total_pages = 0
+        self.done_pages = 0
+        self.chunks = 0
+        self.status = "queued"   # queued → running → done / failed / cancelled
+        self.error = ""
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"ingest-{name}", daemon=True)
+
+    @property
+    def progress(self) -> float:
+        return self.done_pages / self.total_pages if self.total_pages else 0.0
+
+    def start(self) -> "IngestJob":
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _run(self):
+        from modules import db
+        self.status = "running"
+        try:
+            self.doc_id = db.create_document(self.conn, self.name, self.kind, self.entry_kind, self.entry_key)
+            ex = _pool()
+            if self.kind == "pdf":
+                self.total_pages = ex.submit(_pdf_page_count, self.path).result()
+                ranges = [(s, min(s + PAGES_PER_TASK, self.total_pages)) for s in range(0, self.total_pages, PAGES_PER_TASK)]
+                tasks = iter([(_parse_pdf_range, (self.path, s, e), e - s) for s, e in ranges])
+            else:
+                paras = ex.submit(_docx_para_count, self.path).result()
+                self.total_pages = -(-paras // DOCX_PARAS_PER_PAGE)
+                step = DOCX_PARAS_PER_PAGE * PAGES_PER_TASK
+                ranges = [(s, min(s + step, paras)) for s in range(0, paras, step)]
+                tasks = iter([(_parse_docx_range, (self.path, s, e), -(-(e - s) // DOCX_PARAS_PER_PAGE)) for s, e in ranges])
+            in_flight: Dict[Any, int] = {}
+            max_in_flight = WORKERS * 2
+            while True:
+                while not self._cancel.is_set() and len(in_flight) < max_in_flight:
+                    nxt = next(tasks, None)
+                    if nxt is None:
+                        break
+                    fn, args, pages = nxt
+                    in_flight[ex.submit(fn, *args)] = pages
+                if not in_flight:
+                    break
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    pages = in_flight.pop(fut)
+                    rows = fut.result()
+                    self.chunks += db.add_chunks(self.conn, self.doc_id, rows)
+                    self.done_pages += pages
+            self.status = "cancelled" if self._cancel.is_set() else "done"
+        except Exception as e:
+            self.status, self.error = "failed", str(e)
+        finally:
+            if self.doc_id is not None:
+                db.finish_document(self.conn, self.doc_id, self.total_pages, self.status)
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+# 재실행(rerun) 간에도 작업을 찾을 수 있도록 프로세스 단위로 보관
+_JOBS: Dict[str, IngestJob] = {}
+_JOBS_LOCK = threading.Lock()
+
+def start_ingest(conn, fileobj, name: str, entry_kind: Optional[str] = None, entry_key: Optional[str] = None) -> str:
+    # 업로드 파일을 임시 파일로 복사(청크 단위)한 뒤 백그라운드 수집 시작. 작업 id 반환.
+    kind = "pdf" if name.lower().endswith(".pdf") else "docx"
+    fd, path = tempfile.mkstemp(suffix="." + kind)
+    with os.fdopen(fd, "wb") as out:
+        shutil.copyfileobj(fileobj, out, 1024 * 1024)
+    job = IngestJob(conn, path, name, kind, entry_kind, entry_key)
+    with _JOBS_LOCK:
+        job_id = f"{len(_JOBS) + 1}:{name}"
+        _JOBS[job_id] = job
+    job.start()
+    return job_id
+
+def get_job(job_id: str) -> Optional[IngestJob]:
+    with _JOBS_LOCK:
+        return _JOBS.get(job_id)
@@ -0,0 +1,14 @@
+# modules/profiler.py
+# 역할: 루트 modules/profiler.py 를 그대로 쓰게 하는 shim.
+# 루트 db 모듈은 `from modules import profiler` 로 불러오는데, app/ 아래에서는 `modules` 가 이 폴더를 가리킨다.
+# 설정/느린 쿼리 기록이 한 벌이어야 하므로 다시 내보내지 않고 모듈 객체 자체를 바꿔 끼운다.
+
+import importlib.util, os, sys
+
+_CORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "modules", "profiler.py")
+if "diary_core_profiler" not in sys.modules:
+    _spec = importlib.util.spec_from_file_location("diary_core_profiler", _CORE_PATH)
+    _mod = importlib.util.module_from_spec(_spec)
+    sys.modules["diary_core_profiler"] = _mod
+    _spec.loader.exec_module(_mod)
+sys.modules[__name__] = sys.modules["diary_core_profiler"]
@@ -1 +1,60 @@
 # upload and parse page
+# 역할: PDF/DOCX 업로드 → 백그라운드 수집(페이지별 파싱·청크 분할·일괄 저장) → 진행률 표시
+
+import time
+import streamlit as st
+from datetime import date
+
+from core import config
+from modules import db, ingest
+
+st.set_page_config(page_title="업로드 & 파싱", page_icon="📥", layout="wide")
+conn = db.get_pool(config.DB_PATH)
+st.session_state.setdefault("ingest_jobs", [])
+
+st.title("📥 문서 업로드 & 파싱")
+st.caption("PDF는 페이지 단위로 병렬 파싱되며, 큰 파일도 화면을 막지 않고 백그라운드에서 처리됩니다.")
+
+files = st.file_uploader("PDF / DOCX", type=["pdf", "docx"], accept_multiple_files=True)
+link = st.radio("연결할 항목", ["없음", "일기(날짜)", "새 메모"], horizontal=True)
+link_date = st.date_input("일기 날짜", value=date.today()) if link == "일기(날짜)" else None
+
+if st.button("🚀 파싱 시작", type="primary", disabled=not files):
+    for f in files:
+        entry_kind, entry_key = None, None
+        if link == "일기(날짜)":
+            entry_kind, entry_key = "diary", link_date.isoformat()
+        elif link == "새 메모":
+            entry_kind, entry_key = "memo", str(db.add_memo(conn, f"📎 {f.name}", ["문서"], False))
+        st.session_state["ingest_jobs"].append(ingest.start_ingest(conn, f, f.name, entry_kind, entry_key))
+    st.rerun()
+
+running = False
+if st.session_state["ingest_jobs"]:
+    st.subheader("진행 상황", divider="gray")
+    for job_id in st.session_state["ingest_jobs"]:
+        job = ingest.get_job(job_id)
+        if job is None:
+            continue
+        c1, c2 = st.columns([0.85, 0.15])
+        with c1:
+            label = f"{job.name} · {job.done_pages}/{job.total_pages or '?'}쪽 · 청크 {job.chunks}개 · {job.status}"
+            st.progress(job.progress if job.status == "running" else (1.0 if job.status == "done" else job.progress), text=label)
+            if job.error:
+                st.error(job.error)
+        with c2:
+            if job.status == "running" and st.button("중지", key=f"cancel_{job_id}"):
+                job.cancel()
+        running = running or job.status in ("queued", "running")
+
+st.subheader("저장된 문서", divider="gray")
+for d in db.list_documents(conn, limit=20):
+    linked = f" · {d['entry_kind']} {d['entry_key']}" if d["entry_kind"] else ""
+    with st.expander(f"{d['name']} ({d['pages']}쪽 · 청크 {d['chunk_cnt']}개 · {d['status']}){linked}"):
+        for ch in db.get_chunks(conn, d["id"], limit=5):
+            st.markdown(f"**p.{ch['page']}** {ch['text'][:300]}")
+
+# 진행 중인 작업이 있으면 잠시 뒤 다시 그려 진행률만 갱신
+if running:
+    time.sleep(1.0)
+    st.rerun()
@@ -0,0 +1,70 @@
+# bench/datagen.py
+# 역할: 벤치마크용 합성 데이터 생성기. 같은 seed 면 항상 같은 DB 내용이 만들어진다.
+# - years 년치 일기(하루 1편), memos/todos 건수 지정, 한국어 문장/태그 조합
+# - 쓰기는 db.bulk_add 로 CHUNK 건씩 (트랜잭션당 한 번 커밋)
+
+import random
+from datetime import date, time, timedelta
+from typing import Any, Dict, List
+
+from modules import db
+
+CHUNK = 5000
+
+SUBJECTS = ["오늘", "아침에", "점심에", "저녁에", "퇴근길에", "주말에", "회의에서", "카페에서", "집에서", "산책하다가"]
+OBJECTS = ["프로젝트 일정", "새 아이디어", "읽던 책", "운동 계획", "가족 여행", "친구 생일", "장보기 목록", "코드 리뷰",
+           "발표 자료", "고양이 사진", "비 오는 날씨", "영화 감상", "요리 레시피", "시험 공부", "병원 예약"]
+VERBS = ["정리했다", "떠올렸다", "고민했다", "마무리했다", "시작했다", "다시 봤다", "기록해 두었다", "이야기했다", "미뤘다", "확인했다"]
+FEELINGS = ["기분이 좋았다.", "조금 피곤했다.", "뿌듯했다.", "아쉬웠다.", "설렜다.", "마음이 편했다.", "걱정이 됐다.", ""]
+TAGS = ["업무", "개인", "건강", "가족", "공부", "아이디어", "독서", "운동", "여행", "재테크", "회의", "쇼핑",
+        "요리", "영화", "음악", "취미", "약속", "병원", "정리", "회고"]
+TODO_VERBS = ["보내기", "확인하기", "예약하기", "정리하기", "구매하기", "작성하기", "준비하기", "연락하기"]
+
+def sentence(rng: random.Random) -> str:
+    return f"{rng.choice(SUBJECTS)} {rng.choice(OBJECTS)}을(를) {rng.choice(VERBS)}. {rng.choice(FEELINGS)}".strip()
+
+def paragraph(rng: random.Random, lo: int, hi: int) -> str:
+    return " ".join(sentence(rng) for _ in range(rng.randint(lo, hi)))
+
+def tags(rng: random.Random, k: int = 3) -> List[str]:
+    return rng.sample(TAGS, rng.randint(0, k))
+
+def _chunks(rows: List[Dict[str, Any]]):
+    for i in range(0, len(rows), CHUNK):
+        yield rows[i:i + CHUNK]
+
+def generate(conn, years: int = 3, memos: int = 100_000, todos: int = 100_000, seed: int = 42,
+             end: date = date(2025, 12, 31)) -> Dict[str, Any]:
+    # 생성한 범위 정보를 반환 (벤치마크가 조회 인자로 사용)
+    rng = random.Random(seed)
+    start = end - timedelta(days=365 * years - 1)
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    moods = list(db.MOOD_CODES)
+    priorities = list(db.PRIORITY_CODES)
+
+    diary_rows = [{"d": d, "text": paragraph(rng, 2, 8), "mood": rng.choice(moods), "tags": tags(rng)} for d in days]
+    for chunk in _chunks(diary_rows):
+        db.bulk_add(conn, "diary", chunk)
+
+    memo_rows = [{"text": paragraph(rng, 1, 3), "tags": tags(rng), "pinned": rng.random() < 0.02} for _ in range(memos)]
+    for chunk in _chunks(memo_rows):
+        db.bulk_add(conn, "memos", chunk)
+
+    todo_rows = [{
+        "title": f"{rng.choice(OBJECTS)} {rng.choice(TODO_VERBS)}",
+        "d": rng.choice(days),
+        "due": time(rng.randint(7, 22), rng.choice([0, 15, 30, 45])) if rng.random() < 0.6 else None,
+        "priority": rng.choices(priorities, weights=[6, 3, 1])[0],
+        "tags": tags(rng, 2),
+    } for _ in range(todos)]
+    for chunk in _chunks(todo_rows):
+        db.bulk_add(conn, "todos", chunk)
+
+    # 지난 날짜 할 일의 70% 는 완료 처리
+    with db.reading(conn) as c:
+        ids = [r[0] for r in c.execute("SELECT id FROM todos WHERE d < ?", (db.day_num(end - timedelta(days=7)),))]
+    done_ids = [i for i in ids if rng.random() < 0.7]
+    for i in range(0, len(done_ids), CHUNK):
+        db.bulk_set_todo_done(conn, done_ids[i:i + CHUNK], True)
+
+    return {"start": start, "end": end, "days": len(days), "memos": memos, "todos": todos, "seed": seed}
@@ -0,0 +1,250 @@
+# bench/run.py
+# 역할: modules/db.py 공개 함수 벤치마크. 데이터 크기별로 합성 DB 를 만들어 각 함수의 지연 시간을 잰다.
+# 사용 (diary_final/ 에서):
+#   python -m bench.run --sizes small,medium --out bench/results.json
+#   python -m bench.run --sizes small --out bench/results.json --baseline bench/baseline.json   # 측정 후 비교
+#   python -m bench.run --compare bench/baseline.json bench/results.json                      # 파일끼리 비교
+# - 크기별 원본 DB 는 bench/.data 에 한 번 만들어 두고, 실행마다 복사본에서 측정 (쓰기 벤치가 원본을 바꾸지 않음)
+# - 조회 함수는 매 호출 전에 조회 캐시를 비워 DB 작업 시간을 잰다 (--warm 이면 캐시 적중 시간)
+# - 비교 모드는 중앙값이 threshold 이상 느려진 항목을 회귀로 표시하고 종료 코드 1 을 반환
+
+import argparse, io, json, os, platform, random, shutil, sqlite3, statistics, subprocess, sys, tempfile, time
+from datetime import date, datetime, time as dtime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from modules import db, export
+from bench import datagen
+
+SIZES = {
+    "small": {"years": 1, "memos": 10_000, "todos": 10_000},
+    "medium": {"years": 3, "memos": 100_000, "todos": 100_000},
+    "large": {"years": 10, "memos": 300_000, "todos": 300_000},
+}
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data")
+
+# ---------- 데이터 준비 ----------
+def _template(size: str, seed: int) -> Tuple[str, Dict[str, Any]]:
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"{size}-{seed}.db")
+    meta_path = path + ".json"
+    if os.path.exists(path) and os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            return path, json.load(f)
+    for p in (path, path + "-wal", path + "-shm"):
+        if os.path.exists(p):
+            os.remove(p)
+    t0 = time.perf_counter()
+    conn = db.get_conn(path)
+    db.init_schema(conn)
+    info = datagen.generate(conn, seed=seed, **SIZES[size])
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    info = {k: (v.isoformat() if isinstance(v, date) else v) for k, v in info.items()}
+    info["generate_s"] = round(time.perf_counter() - t0, 2)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False)
+    return path, info
+
+def _working_copy(template: str, tmp: str, size: str) -> str:
+    path = os.path.join(tmp, f"{size}.db")
+    shutil.copyfile(template, path)
+    return path
+
+# ---------- 벤치 항목 ----------
+# (이름, 함수(conn, ctx), 읽기 여부, 반복 횟수 배수). ctx 는 실행마다 바뀌는 인자를 고르는 난수/날짜 범위.
+class Ctx:
+    def __init__(self, info: Dict[str, Any], seed: int):
+        self.rng = random.Random(seed)
+        self.start = date.fromisoformat(info["start"])
+        self.end = date.fromisoformat(info["end"])
+        self.tmp = ""
+        self.memo_ids: List[int] = []
+        self.todo_ids: List[int] = []
+
+    def day(self) -> date:
+        return self.start + timedelta(days=self.rng.randrange((self.end - self.start).days + 1))
+
+    def word(self) -> str:
+        return self.rng.choice(datagen.OBJECTS).split()[0]
+
+def _export_archive(conn, ctx):
+    export.write_archive(conn, io.BytesIO(), "zip")
+
+def _export_csv(conn, ctx):
+    out = tempfile.mkdtemp(dir=ctx.tmp)
+    db.export_csv_bundle(conn, out)
+    shutil.rmtree(out, ignore_errors=True)
+
+def _add_memo(conn, ctx):
+    ctx.memo_ids.append(db.add_memo(conn, datagen.paragraph(ctx.rng, 1, 3), datagen.tags(ctx.rng), False))
+
+def _add_todo(conn, ctx):
+    db.add_todo(conn, "벤치 할 일", ctx.day(), dtime(9, 0), "높음", ["업무"])
+
+def _bulk_add_todos(conn, ctx):
+    db.bulk_add(conn, "todos", [{"title": f"일괄 {i}", "d": ctx.day(), "priority": "보통", "tags": ["정리"]} for i in range(1000)])
+
+def _year_month(d: date) -> Tuple[int, int]:
+    return d.year, d.month
+
+def _some_todo(conn, ctx) -> int:
+    if not ctx.todo_ids:
+        with db.reading(conn) as c:
+            ctx.todo_ids = [r[0] for r in c.execute("SELECT id FROM todos ORDER BY random() LIMIT 500")]
+    return ctx.rng.choice(ctx.todo_ids)
+
+BENCHES: List[Tuple[str, Callable[[Any, Ctx], Any], bool, float]] = [
+    ("get_diary_for_date", lambda c, x: db.get_diary_for_date(c, x.day()), True, 1),
+    ("get_diary_page", lambda c, x: db.get_diary_page(c, limit=20), True, 1),
+    ("get_diaries_between.month", lambda c, x: db.get_diaries_between(c, x.end - timedelta(days=30), x.end), True, 1),
+    ("get_diaries_between.year", lambda c, x: db.get_diaries_between(c, x.end - timedelta(days=364), x.end), True, 0.5),
+    ("list_diaries_between.month", lambda c, x: db.list_diaries_between(c, x.end - timedelta(days=30), x.end), True, 1),
+    ("list_diaries_between.year", lambda c, x: db.list_diaries_between(c, x.end - timedelta(days=364), x.end), True, 0.5),
+    ("list_memos_page", lambda c, x: db.list_memos_page(c, limit=20), True, 1),
+    ("list_todos_for_date", lambda c, x: db.list_todos_for_date(c, x.day()), True, 1),
+    ("get_agenda", lambda c, x: db.get_agenda(c, x.day()), True, 1),
+    ("agenda_counts", lambda c, x: db.agenda_counts(c, x.day()), True, 1),
+    ("get_todo_summary_between", lambda c, x: db.get_todo_summary_between(c, x.end - timedelta(days=30), x.end), True, 1),
+    ("get_month_overview", lambda c, x: db.get_month_overview(c, *_year_month(x.day())), True, 1),
+    ("get_daily_stats.week", lambda c, x: db.get_daily_stats(c, x.end.replace(month=1, day=1), x.end, bucket="week"), True, 1),
+    ("get_daily_stats.all_month", lambda c, x: db.get_daily_stats(c, bucket="month"), True, 1),
+    ("tag_counts", lambda c, x: db.tag_counts(c, limit=20), True, 1),
+    ("tag_counts.prefix", lambda c, x: db.tag_counts(c, prefix="업", kind="memo"), True, 1),
+    ("search_all.fts", lambda c, x: db.search_all(c, x.word() + " " + x.rng.choice(datagen.VERBS)[:3], ["일기", "메모", "할 일"], [], "전체", []), True, 0.5),
+    ("search_all.short", lambda c, x: db.search_all(c, "일정", ["일기", "메모", "할 일"], [], "전체", []), True, 0.5),
+    ("search_all.tags_and", lambda c, x: db.search_all(c, "", ["메모"], [], "전체", ["업무", "건강"], "AND"), True, 0.5),
+    ("search_page.memos", lambda c, x: db.search_page(c, "메모", x.word(), [], "전체", []), True, 1),
+    ("outbox_count", lambda c, x: db.outbox_count(c), True, 1),
+    ("export_csv_bundle", _export_csv, True, 0.1),
+    ("export.write_archive", _export_archive, True, 0.1),
+    ("upsert_diary", lambda c, x: db.upsert_diary(c, x.day(), datagen.paragraph(x.rng, 2, 6), "🙂", ["회고"]), False, 1),
+    ("add_memo", _add_memo, False, 1),
+    ("update_memo", lambda c, x: db.update_memo(c, x.memo_ids[-1], "수정한 메모", ["개인"], True) if x.memo_ids else None, False, 1),
+    ("add_todo", _add_todo, False, 1),
+    ("update_todo", lambda c, x: db.update_todo(c, _some_todo(c, x), "수정한 할 일", None, "긴급"), False, 1),
+    ("set_todo_done", lambda c, x: db.set_todo_done(c, _some_todo(c, x), True), False, 1),
+    ("bulk_add.todos_1000", _bulk_add_todos, False, 0.2),
+    ("delete_memo", lambda c, x: db.delete_memo(c, x.memo_ids.pop()) if x.memo_ids else None, False, 1),
+]
+
+# ---------- 측정 ----------
+def _summary(samples: List[float]) -> Dict[str, float]:
+    s = sorted(samples)
+    return {
+        "n": len(s),
+        "min_ms": round(s[0], 3),
+        "median_ms": round(statistics.median(s), 3),
+        "p95_ms": round(s[min(len(s) - 1, int(len(s) * 0.95))], 3),
+        "mean_ms": round(statistics.fmean(s), 3),
+    }
+
+def run_size(size: str, repeat: int, seed: int, only: Optional[str], warm: bool) -> Dict[str, Any]:
+    template, info = _template(size, seed)
+    results: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = db.get_pool(_working_copy(template, tmp, size))
+        ctx = Ctx(info, seed)
+        ctx.tmp = tmp
+        for name, fn, is_read, factor in BENCHES:
+            if only and only not in name:
+                continue
+            n = max(3, int(repeat * factor))
+            fn(conn, ctx)  # 준비 호출 (연결/페이지 캐시 예열)
+            samples = []
+            for _ in range(n):
+                if is_read and not warm:
+                    db.cache_clear()
+                t0 = time.perf_counter()
+                fn(conn, ctx)
+                samples.append((time.perf_counter() - t0) * 1000)
+            results[name] = _summary(samples)
+            print(f"  {size:<7} {name:<28} median {results[name]['median_ms']:>9.3f} ms   p95 {results[name]['p95_ms']:>9.3f} ms")
+        conn.close()
+    return {"data": info, "benches": results}
+
+def _meta(args) -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "warm_cache": args.warm,
+    }
+
+# ---------- 비교 ----------
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.2,
+            min_delta_ms: float = 0.2) -> List[Dict[str, Any]]:
+    # 두 결과의 같은 (크기, 항목) 중앙값 비교. status: regression / improved / ok
+    rows = []
+    for size, cur in current.get("sizes", {}).items():
+        base = baseline.get("sizes", {}).get(size)
+        if not base:
+            continue
+        for name, c in cur["benches"].items():
+            b = base["benches"].get(name)
+            if not b:
+                continue
+            ratio = c["median_ms"] / b["median_ms"] if b["median_ms"] else 1.0
+            delta = c["median_ms"] - b["median_ms"]
+            status = "ok"
+            if ratio > 1 + threshold and delta > min_delta_ms:
+                status = "regression"
+            elif ratio < 1 - threshold and -delta > min_delta_ms:
+                status = "improved"
+            rows.append({"size": size, "bench": name, "base_ms": b["median_ms"], "cur_ms": c["median_ms"],
+                         "ratio": round(ratio, 3), "status": status})
+    return rows
+
+def print_compare(rows: List[Dict[str, Any]]) -> int:
+    mark = {"regression": "▲ 느려짐", "improved": "▼ 빨라짐", "ok": ""}
+    for r in rows:
+        print(f"  {r['size']:<7} {r['bench']:<28} {r['base_ms']:>9.3f} → {r['cur_ms']:>9.3f} ms  x{r['ratio']:<6} {mark[r['status']]}")
+    regressions = [r for r in rows if r["status"] == "regression"]
+    print(f"회귀 {len(regressions)}건 / 비교 {len(rows)}건")
+    return 1 if regressions else 0
+
+def _load(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="modules/db.py 벤치마크")
+    ap.add_argument("--sizes", default="small", help=f"쉼표 구분 ({', '.join(SIZES)})")
+    ap.add_argument("--repeat", type=int, default=20, help="항목별 반복 횟수 (무거운 항목은 자동으로 줄임)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--only", help="이름에 이 문자열이 든 항목만 실행")
+    ap.add_argument("--warm", action="store_true", help="조회 캐시를 비우지 않고 측정")
+    ap.add_argument("--out", default="bench/results.json")
+    ap.add_argument("--baseline", help="측정 후 이 결과 파일과 비교")
+    ap.add_argument("--threshold", type=float, default=0.2, help="회귀 판정 비율 (0.2 = 20%% 이상 느려짐)")
+    ap.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="측정 없이 두 결과 파일 비교")
+    args = ap.parse_args(argv)
+
+    if args.compare:
+        return print_compare(compare(_load(args.compare[0]), _load(args.compare[1]), args.threshold))
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        ap.error(f"알 수 없는 크기: {', '.join(unknown)}")
+    report = {"meta": _meta(args), "sizes": {}}
+    for size in sizes:
+        print(f"[{size}] {SIZES[size]}")
+        report["sizes"][size] = run_size(size, args.repeat, args.seed, args.only, args.warm)
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"저장: {args.out}")
+    if args.baseline:
+        return print_compare(compare(_load(args.baseline), report, args.threshold))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,6 @@
 # main.py
 # 역할: Streamlit 메인 앱. "오늘/타임라인/검색/설정" 탭으로 즉시 쓰기/찾기 중심 UX 제공.
-# 데이터는 반드시 ./data/app.db (SQLite)에 저장. (오프라인 우선, 내보내기/노션 동기화 제공)
+# 데이터는 반드시 ./data/app.db (SQLite)에 저장, ?user= 지정 시 사용자별 data/users/…/<user>.db. (오프라인 우선, 내보내기/노션 동기화 제공)
 
 import os
 import calendar
@@ -8,7 +8,7 @@ import streamlit as st
 from datetime import date, time, datetime, timedelta
 from streamlit_option_menu import option_menu
 
-from modules import db, ui, utils
+from modules import db, ui, utils, export, semantic, profiler, jobs, shards, book, autosave
 from modules.notion_client import NotionSync
 
 st.set_page_config(page_title="오늘 일기·메모·할 일", page_icon="🗒️", layout="wide")
@@ -22,10 +22,29 @@ if 'selected_date' not in st.session_state:
     st.session_state['selected_date'] = date.today()
 
 # --- 데이터 디렉토리/DB 준비 ---
-os.makedirs("data/exports", exist_ok=True)
-conn = db.get_conn("data/app.db")
-db.init_schema(conn)
+os.makedirs("data", exist_ok=True)
+# 사용자별 DB: ?user=이름 또는 DIARY_USER 로 지정하면 세션이 그 사용자 DB(data/users/…)에 묶인다.
+# 지정하지 않으면 기존처럼 data/app.db 하나를 쓴다.
+if "user" not in st.session_state:
+    st.session_state["user"] = st.query_params.get("user") or os.environ.get("DIARY_USER") or None
+USER = st.session_state["user"]
+
+def get_db():
+    # 사용자 DB 풀은 LRU 로 닫힐 수 있으므로 화면 조각(fragment)에서도 매번 라우터에서 받는다
+    return shards.get_router().pool(USER) if USER else db.get_pool(DB_PATH)
+
+try:
+    DB_PATH = shards.shard_path(USER) if USER else "data/app.db"
+except ValueError as e:
+    st.error(str(e))
+    st.stop()
+# 프로세스당 1회 생성 + 스키마 초기화/마이그레이션, 세션 간 공유
+_migrating = st.empty()
+conn = get_db() if USER else db.get_pool(DB_PATH, progress=lambda step, done, total: _migrating.progress(
+    done / total if total else 1.0, text=f"DB 업그레이드: {step} ({done}/{total})"))
+_migrating.empty()
 notion = NotionSync()  # .env 없으면 enabled=False
+jobs.start(conn)  # 백그라운드 작업 워커 (프로세스당 1개, 중단된 작업 이어서 실행)
 
 # --- 상단 헤더 ---
 st.title("🗒️ 오늘 일기 · 메모 · 할 일")
@@ -65,7 +84,9 @@ with tab_today:
                 st.session_state.selected_date = today
                 st.rerun()
 
-        # 캘린더 렌더링
+        # 캘린더 렌더링 (하루별 일기/기분/할 일 현황은 한 번의 쿼리로)
+        overview = db.get_month_overview(conn, year, month)
+        db.prefetch_month_overview(conn, year, month)
         cal_data = calendar.monthcalendar(year, month)
         days_header = ["월", "화", "수", "목", "금", "토", "일"]
         cols = st.columns(7)
@@ -82,7 +103,8 @@ with tab_today:
                 is_today = (day_date == today)
                 btn_type = "primary" if is_selected else ("secondary" if is_today else "secondary")
 
-                if cols[i].button(f"{day_num}", key=f"day_{day_num}", type=btn_type, use_container_width=True):
+                label = ui.calendar_label(day_num, overview.get(day_date.isoformat()))
+                if cols[i].button(label, key=f"day_{day_num}", type=btn_type, use_container_width=True):
                     st.session_state.selected_date = day_date
                     st.rerun()
 
@@ -92,6 +114,7 @@ with tab_today:
         ganji_tag = utils.get_ganji_day(sel_date)
         st.markdown(f"### {sel_date.strftime('%Y년 %m월 %d일')} <span style='font-size: 0.8em; background-color: #eee; padding: 3px 6px; border-radius: 5px;'>{ganji_tag}</span>", unsafe_allow_html=True)
         st.caption("캘린더에서 날짜를 선택하여 해당일의 기록을 보거나 작성하세요.")
+        st.caption("날짜 옆 표시: 기분(일기 작성일) · 할 일 완료/전체 (🟩 모두 완료 🟨 절반 이상 🟧 일부 🟥 미착수)")
 
 
     st.divider()
@@ -100,17 +123,73 @@ with tab_today:
     # --- (A) 오늘 일기 ---
     with col1:
         st.subheader("📓 오늘 일기", divider="gray")
-        existing = db.get_diary_for_date(conn, sel_date)
+        # 자동 저장: 날짜별로 "마지막으로 autosave 에 넘긴 내용의 해시"를 세션에 두고 바뀐 경우에만 넘긴다.
+        # 날짜를 옮긴 직후 실행에는 이전 날짜의 위젯 값이 아직 세션에 있으므로 그것도 넘기고 바로 저장시킨다
+        diary_sent = st.session_state.setdefault("diary_sent", {})
+        for d_prev in [d for d in diary_sent if d != sel_date]:
+            prev_text = st.session_state.get(f"diary_text_{d_prev}")
+            if prev_text is not None:
+                prev = (prev_text, st.session_state.get(f"mood_{d_prev}", "🙂"), utils.split_tags(st.session_state.get(f"tags_{d_prev}", "")))
+                if autosave.content_hash(*prev) != diary_sent[d_prev]:
+                    autosave.submit(conn, d_prev, *prev)
+                autosave.flush(conn, d_prev)
+            del diary_sent[d_prev]
+        existing = autosave.peek(conn, sel_date) or db.get_diary_for_date(conn, sel_date)
         diary_text = st.text_area("오늘 있었던 일/감정/배운 점", value=existing.get("text",""), height=220, placeholder="자유롭게 적어보세요", key=f"diary_text_{sel_date}")
         mood = st.select_slider("기분", ["😣","😕","😐","🙂","😄"], value=existing.get("mood","🙂") or "🙂", key=f"mood_{sel_date}")
         tags_str = st.text_input("태그 (쉼표로 구분)", value=",".join(existing.get("tags",[])), key=f"tags_{sel_date}")
+        ui.render_tag_hints(db.tag_counts(conn, prefix=tags_str.split(",")[-1], kind="diary", limit=8))
+        diary_tags = utils.split_tags(tags_str)
+        diary_hash = autosave.content_hash(diary_text, mood, diary_tags)
+        if sel_date not in diary_sent:
+            diary_sent[sel_date] = autosave.content_hash(existing.get("text", ""), existing.get("mood") or "🙂", existing.get("tags", []))
+        if diary_hash != diary_sent[sel_date]:
+            autosave.submit(conn, sel_date, diary_text, mood, diary_tags)
+            diary_sent[sel_date] = diary_hash
+
+        # 저장 상태만 주기적으로 다시 그린다 (대기/저장 중일 때만)
+        @st.fragment(run_every=1.0 if autosave.status(conn, sel_date)["state"] in ("pending", "saving", "error") else None)
+        def _autosave_status():
+            ui.render_autosave(autosave.status(get_db(), sel_date))
+        _autosave_status()
         if st.button("💾 일기 저장", type="primary"):
-            db.upsert_diary(conn, sel_date, diary_text, mood, utils.split_tags(tags_str))
+            autosave.save_now(conn, sel_date, diary_text, mood, diary_tags)
             ui.ok("일기 저장 완료!")
             st.rerun()
 
+        revs = db.list_diary_revisions(conn, sel_date)
+        if len(revs) > 1:
+            with st.expander(f"🕘 이전 버전 ({len(revs)})", expanded=False):
+                rev_no = st.selectbox("개정", [r["rev"] for r in revs], key=f"diary_rev_{sel_date}",
+                                      format_func=lambda n: next(f"#{r['rev']} · {r['saved_at'] or '이력 이전'} · {r['mood'] or ''} · {r['text_len']}자"
+                                                                 for r in revs if r["rev"] == n))
+                rev = db.get_diary_revision(conn, sel_date, rev_no)
+                st.text_area("내용", value=rev["text"], height=160, disabled=True, key=f"diary_rev_text_{sel_date}_{rev_no}")
+                if rev_no != revs[0]["rev"] and st.button("↩️ 이 버전으로 되돌리기", key=f"diary_restore_{sel_date}"):
+                    autosave.discard(conn, sel_date)
+                    db.restore_diary_revision(conn, sel_date, rev_no)
+                    for k in (f"diary_text_{sel_date}", f"mood_{sel_date}", f"tags_{sel_date}"):
+                        st.session_state.pop(k, None)
+                    diary_sent.pop(sel_date, None)
+                    st.rerun()
+
+        def load_diary_text(iso):
+            return db.get_diary_for_date(conn, date.fromisoformat(iso))["text"]
         with st.expander("📚 오늘/최근 보기", expanded=False):
-            ui.render_diary_snippets(db.get_diary_recent(conn, center=sel_date, limit=7))
+            recent, recent_next = db.get_diary_page(conn, after=ui.page_cursor("diary_recent"), limit=7)
+            ui.render_diary_snippets(recent, load_diary_text)
+            ui.render_pager("diary_recent", recent_next)
+
+    def save_grid(kind, added, updated, deleted, **defaults):
+        # 표 편집 결과 (ui.grid_changes) → 한 트랜잭션. 표의 태그 칸은 쉼표 구분 문자열
+        for r in added:
+            r.update(defaults, tags=utils.split_tags(r.get("tags") or ""))
+        for ch in updated.values():
+            if "tags" in ch:
+                ch["tags"] = utils.split_tags(ch["tags"] or "")
+        res = db.apply_edits(conn, kind, added, updated, deleted)
+        ui.ok(f"추가 {res['added']} · 수정 {res['updated']} · 삭제 {res['deleted']}")
+        st.rerun()
 
     # --- (B) 빠른 메모 ---
     with col2:
@@ -118,6 +197,7 @@ with tab_today:
         with st.form("new_memo_form"):
             memo_text = st.text_area("떠오르는 생각을 바로 기록", height=140, placeholder="예: 아이디어, 링크, 회의키워드 …")
             memo_tags = st.text_input("메모 태그", placeholder="예: 아이디어, 업무")
+            ui.render_tag_hints(db.tag_counts(conn, kind="memo", limit=8))
             pinned = st.checkbox("🔖 상단 고정", value=False)
             submitted = st.form_submit_button("➕ 메모 추가")
             if submitted:
@@ -129,7 +209,8 @@ with tab_today:
                     ui.warn("메모 내용을 입력하세요.")
 
         st.markdown("##### 📒 최신 메모")
-        memos = db.list_memos(conn, limit=10)
+        memos, memos_next = db.list_memos_page(conn, after=ui.page_cursor("memos"), limit=10)
+        memo_grid = st.toggle("표로 편집", key="memo_grid_mode", help="여러 메모를 고친 뒤 한 번에 저장")
         def handle_memo_update(mid, text, tags, pinned):
             db.update_memo(conn, mid, text, utils.split_tags(tags), pinned)
             st.session_state['editing_memo_id'] = None
@@ -140,7 +221,21 @@ with tab_today:
             st.session_state['editing_memo_id'] = None
             ui.ok("메모 삭제 완료")
             st.rerun()
-        ui.render_memos(memos, on_update=handle_memo_update, on_delete=handle_memo_delete)
+        if memo_grid:
+            ui.render_memo_grid([db.get_memo(conn, m["id"]) for m in memos],
+                                on_save=lambda *changes: save_grid("memos", *changes))
+        else:
+            ui.render_memos(memos, on_update=handle_memo_update, on_delete=handle_memo_delete,
+                            load_text=lambda mid: (db.get_memo(conn, mid) or {}).get("text", ""))
+        ui.render_pager("memos", memos_next)
+        if memos:
+            with st.expander("🧹 메모 일괄 삭제", expanded=False):
+                del_ids = st.multiselect("삭제할 메모", [m["id"] for m in memos],
+                                         format_func=lambda mid: next(m["snippet"][:30] for m in memos if m["id"] == mid))
+                if st.button("🗑️ 선택 삭제", disabled=not del_ids):
+                    db.bulk_delete_memos(conn, del_ids)
+                    ui.ok(f"메모 {len(del_ids)}개 삭제")
+                    st.rerun()
 
     # --- (C) 오늘 할 일 ---
     with col3:
@@ -152,10 +247,14 @@ with tab_today:
                 due_t = st.time_input("시간", value=time(18,0), step=300)
             with c2:
                 priority = st.selectbox("우선순위", ["보통","높음","긴급"], index=0)
+            todo_tags = st.text_input("할 일 태그", placeholder="예: 집안일, 업무")
+            ui.render_tag_hints(db.tag_counts(conn, kind="todo", limit=8))
+            no_date = st.checkbox("날짜 없이 (나중에 할 일)", value=False)
             submitted = st.form_submit_button("➕ 할 일 추가")
             if submitted:
                 if todo_title.strip():
-                    db.add_todo(conn, todo_title.strip(), sel_date, due_t, priority)
+                    db.add_todo(conn, todo_title.strip(), None if no_date else sel_date, None if no_date else due_t,
+                                priority, utils.split_tags(todo_tags))
                     ui.ok("할 일 추가 완료")
                     st.rerun()
                 else:
@@ -163,8 +262,9 @@ with tab_today:
 
         st.markdown("##### 🧾 목록 (미완료→긴급→시간순 정렬)")
         todos = db.list_todos_for_date(conn, sel_date)
-        def handle_todo_update(tid, title, due, priority):
-            db.update_todo(conn, tid, title, due, priority)
+        todo_grid = st.toggle("표로 편집", key="todo_grid_mode", help="여러 할 일을 고친 뒤 한 번에 저장")
+        def handle_todo_update(tid, title, due, priority, tags):
+            db.update_todo(conn, tid, title, due, priority, utils.split_tags(tags))
             st.session_state['editing_todo_id'] = None
             ui.ok("할 일 수정 완료")
             st.rerun()
@@ -173,45 +273,89 @@ with tab_today:
             st.session_state['editing_todo_id'] = None
             ui.ok("할 일 삭제 완료")
             st.rerun()
-        ui.render_todos(todos,
-                        on_toggle=lambda tid, val: db.set_todo_done(conn, tid, val),
-                        on_update=handle_todo_update,
-                        on_delete=handle_todo_delete)
+        if todo_grid:
+            ui.render_todo_grid(todos, on_save=lambda *changes: save_grid("todos", *changes, d=sel_date),
+                                key=f"todo_grid_{sel_date}")
+        else:
+            ui.render_todos(todos,
+                            on_toggle=lambda tid, val: db.set_todo_done(conn, tid, val),
+                            on_update=handle_todo_update,
+                            on_delete=handle_todo_delete)
+        if todos:
+            with st.expander("🧹 일괄 작업", expanded=False):
+                open_ids = [t["id"] for t in todos if not t["done"]]
+                b1, b2 = st.columns(2)
+                with b1:
+                    if st.button("✔️ 모두 완료", disabled=not open_ids, use_container_width=True):
+                        db.bulk_set_todo_done(conn, open_ids, True)
+                        ui.ok(f"{len(open_ids)}개 완료 처리")
+                        st.rerun()
+                with b2:
+                    if st.button("➡️ 미완료 내일로", disabled=not open_ids, use_container_width=True):
+                        db.move_todos(conn, open_ids, sel_date + timedelta(days=1))
+                        ui.ok(f"{len(open_ids)}개 이동")
+                        st.rerun()
+
+        # 날짜를 넘나드는 미완료 할 일: 구간마다 부분 색인 범위 조회 한 번 (날짜별로 따로 묻지 않음)
+        counts = db.agenda_counts(conn, sel_date)
+        with st.expander(f"📅 일정 · 지난 {counts['overdue']} · 7일 {counts['upcoming']} · 날짜 없음 {counts['backlog']}",
+                         expanded=False):
+            ui.render_agenda(db.get_agenda(conn, sel_date, limit=20), counts,
+                             on_toggle=lambda tid, val: db.set_todo_done(conn, tid, val),
+                             on_move=lambda tid: db.move_todos(conn, [tid], sel_date))
 
     st.divider()
     if notion.enabled:
-        # ... (노션 동기화 부분은 기존과 동일)
-        pass
+        pending = notion.pending_count(conn)
+        syncing = jobs.active_jobs(conn, "notion_sync")
+        if st.button(f"🔄 노션 동기화 (대기 {pending}건)", disabled=not pending or bool(syncing)):
+            jobs.submit(conn, "notion_sync")
+            ui.ok("노션 동기화를 백그라운드에서 시작했습니다 (설정 탭에서 진행 상황 확인)")
+        elif syncing:
+            st.caption(f"노션 동기화 진행 중… {syncing[0]['done']}/{syncing[0]['total']}")
 
 # ... 이하 tab_timeline, tab_search, tab_settings 코드는 기존과 동일합니다 ...
 # (이하 생략)
 # ===== [2] 타임라인 =====
 with tab_timeline:
     today = date.today()
-    range_mode = st.radio("범위", ["최근 7일","이번 달"], horizontal=True, index=0)
+    range_mode = st.radio("범위", ["최근 7일","이번 달","올해","전체"], horizontal=True, index=0)
     if range_mode == "최근 7일":
         start_d = today - timedelta(days=6)
         end_d = today
-    else:
+    elif range_mode == "이번 달":
         start_d = today.replace(day=1)
         next_month = (today.replace(day=28) + timedelta(days=4)).replace(day=1)
         end_d = next_month - timedelta(days=1)
+    elif range_mode == "올해":
+        start_d, end_d = today.replace(month=1, day=1), today.replace(month=12, day=31)
+    else:
+        start_d, end_d = None, None
+    # 긴 범위는 주/월 단위로 묶어 차트 점 개수를 줄인다
+    bucket_labels = {"일": "day", "주": "week", "월": "month"}
+    default_bucket = {"최근 7일": "일", "이번 달": "일", "올해": "주", "전체": "월"}[range_mode]
+    bucket = st.radio("단위", list(bucket_labels), horizontal=True,
+                      index=list(bucket_labels).index(default_bucket), key=f"bucket_{range_mode}")
 
-    diaries = db.get_diaries_between(conn, start_d, end_d)
-    todos_sum = db.get_todo_summary_between(conn, start_d, end_d)
+    # 차트/요약은 daily_stats 집계만 읽는다 (일기 본문은 짧은 범위의 타임라인에서만)
+    stats = db.get_daily_stats(conn, start_d, end_d, bucket=bucket_labels[bucket])
 
     # 데이터 시각화 렌더링
-    ui.render_charts(diaries, todos_sum)
+    ui.render_charts(stats)
     st.divider()
 
-    # 기존 타임라인 렌더링
     st.subheader("🗓️ 타임라인(주/월)", divider="gray")
-    ui.render_timeline(diaries, todos_sum)
+    if start_d and (end_d - start_d).days <= 31:
+        ui.render_timeline(db.list_diaries_between(conn, start_d, end_d), db.get_todo_summary_between(conn, start_d, end_d),
+                           load_text=lambda iso: db.get_diary_for_date(conn, date.fromisoformat(iso))["text"])
+    else:
+        ui.render_stats_table(stats)
 
 
 # ===== [3] 검색 =====
 with tab_search:
     st.subheader("🔎 통합 검색", divider="gray")
+    s_mode = st.radio("검색 방식", ["키워드", "의미 (유사도)"], horizontal=True, index=0)
     q = st.text_input("키워드", placeholder="내용/태그/기분/우선순위…")
     colf1, colf2, colf3, colf4 = st.columns(4)
     with colf1:
@@ -221,11 +365,34 @@ with tab_search:
     with colf3:
         f_done = st.selectbox("완료여부(할 일)", ["전체","미완료","완료"], index=0)
     with colf4:
-        f_tag = st.text_input("태그 필터", placeholder="쉼표로 다중")
-
-    if st.button("검색 실행", type="primary") or q:
-        results = db.search_all(conn, q=q, kinds=f_kind, moods=f_mood, done=f_done, tags=utils.split_tags(f_tag))
-        ui.render_search_results(results)
+        f_tag = st.multiselect("태그 필터", [t["name"] for t in db.tag_counts(conn, limit=200)], default=[])
+        f_tag_mode = st.radio("태그 조건", ["AND","OR"], horizontal=True, index=0, label_visibility="collapsed")
+
+    if s_mode == "의미 (유사도)":
+        # 일기/메모만 대상. 바뀐 항목의 재임베딩은 백그라운드 작업에 맡기고, 지금 색인으로 바로 상위 k 개 조회
+        if q:
+            idx = semantic.get_index(conn, DB_PATH)
+            waiting = idx.pending()
+            if waiting:
+                if not jobs.active_jobs(conn, "semantic"):
+                    jobs.submit(conn, "semantic", {"db_path": DB_PATH})
+                st.caption(f"색인 갱신 중… ({waiting}건 대기) 최근에 바뀐 항목은 갱신이 끝난 뒤 결과에 반영됩니다.")
+            kinds = [k for k, label in (("diary", "일기"), ("memo", "메모")) if label in f_kind]
+            ui.render_semantic_results(idx.search(q, k=20, kinds=kinds or None))
+        else:
+            st.caption("문장이나 주제를 입력하면 비슷한 일기·메모를 찾습니다.")
+    elif st.button("검색 실행", type="primary") or q or f_tag:
+        # 종류별로 한 페이지씩 조회 (검색어/필터가 바뀌면 첫 페이지부터)
+        scope = (q, tuple(f_mood), f_done, tuple(f_tag), f_tag_mode)
+        st.markdown("### 결과")
+        for k in ["일기","메모","할 일"]:
+            if k not in f_kind:
+                continue
+            rows, nxt = db.search_page(conn, k, q, f_mood, f_done, f_tag, f_tag_mode,
+                                       after=ui.page_cursor(f"search_{k}", scope), limit=db.PAGE_SIZE)
+            st.markdown(f"#### {k}")
+            ui.render_search_section(k, rows)
+            ui.render_pager(f"search_{k}", nxt)
     else:
         st.caption("키워드 또는 필터를 입력해 검색하세요.")
 
@@ -234,18 +401,81 @@ with tab_settings:
     st.subheader("⚙️ 설정 & 내보내기", divider="gray")
     colx, coly = st.columns([0.5,0.5])
     with colx:
-        if st.button("⬇️ 전체 CSV 번들 내보내기"):
-            out_paths = db.export_csv_bundle(conn, out_dir="data/exports")
-            st.success("내보내기 완료! 아래 파일들이 생성되었습니다.")
-            for p in out_paths:
-                st.write(f"- `{p}`")
-        st.caption("내보낸 파일은 `data/exports` 폴더에 저장됩니다.")
+        ex1, ex2 = st.columns(2)
+        with ex1:
+            ex_fmt = st.selectbox("형식", list(export.FORMATS), format_func=lambda f: {"zip": "ZIP (CSV 4종)", "jsonl.gz": "JSONL (gzip)"}[f])
+        with ex2:
+            ex_inc = st.checkbox("지난 내보내기 이후 변경분만", value=False)
+        if st.button("📦 아카이브 만들기"):
+            # 만든 실행에서 한 번만 넘기고 닫는다. 세션에 두면 다시 실행될 때마다 파일 전체를 다시 읽게 된다
+            # (내려받기 주소용으로 Streamlit 이 들고 있는 사본 하나만 남는다)
+            ex_file, ex_name, ex_mime = export.build_archive(conn, fmt=ex_fmt, incremental=ex_inc)
+            with ex_file:
+                st.download_button(f"⬇️ {ex_name}", data=ex_file.read(), file_name=ex_name, mime=ex_mime)
+        marks = db.get_export_marks(conn)
+        st.caption("서버 디스크에 파일을 남기지 않고 바로 내려받습니다." + (f" 마지막 기준 시각: {max(marks.values())}" if marks else ""))
+
+        with st.expander("📚 일기책 (DOCX/Markdown)", expanded=False):
+            bk_today = date.today()
+            bk1, bk2 = st.columns([0.65, 0.35])
+            with bk1:
+                bk_range = st.date_input("기간", value=(date(bk_today.year, 1, 1), bk_today), key="book_range")
+            with bk2:
+                bk_fmt = st.selectbox("형식", list(book.FORMATS), format_func=lambda f: {"docx": "Word (DOCX)", "md": "Markdown"}[f], key="book_fmt")
+            if isinstance(bk_range, tuple) and len(bk_range) == 2:
+                bk_start, bk_end = bk_range
+                bk_months = len(book._months(bk_start, bk_end))
+                # 몇 달이면 화면에서 바로, 길면 백그라운드 작업으로 파일에 쓴 뒤 내려받기
+                if bk_months <= book.INLINE_MONTHS:
+                    if st.button("📚 일기책 만들기", key="book_build"):
+                        st.session_state["book_file"] = book.build_book(conn, bk_start, bk_end, bk_fmt)
+                elif st.button(f"📚 일기책 만들기 ({bk_months}개월, 백그라운드)", key="book_job"):
+                    jobs.submit(conn, "book", {"start": bk_start.isoformat(), "end": bk_end.isoformat(), "fmt": bk_fmt,
+                                               "out_dir": os.path.splitext(DB_PATH)[0] + "-exports" if USER else jobs.EXPORT_DIR})
+            if st.session_state.get("book_file"):
+                bk_file, bk_name, bk_mime = st.session_state["book_file"]
+                st.download_button(f"⬇️ {bk_name}", data=bk_file.getvalue(), file_name=bk_name, mime=bk_mime)
+            bk_done = next((j for j in jobs.list_jobs(conn, limit=20) if j["kind"] == "book" and j["status"] == "done"), None)
+            if bk_done and bk_done["result"] and os.path.exists(bk_done["result"]["path"]):
+                bk_path = bk_done["result"]["path"]
+                with open(bk_path, "rb") as f:
+                    st.download_button(f"⬇️ {os.path.basename(bk_path)} (작업 #{bk_done['id']})", data=f.read(),
+                                       file_name=os.path.basename(bk_path), mime=book.FORMATS[bk_done["params"]["fmt"]][0])
 
     with coly:
-        st.write(f"DB 경로: **data/app.db**")
-        if st.button("🔧 DB 점검/최적화 (VACUUM)"):
-            db.vacuum(conn)
-            st.success("VACUUM 완료")
+        st.write(f"DB 경로: **{DB_PATH}**" + (f" (사용자: {USER})" if USER else ""))
+        cs = db.cache_stats()
+        st.caption(f"조회 캐시: 적중 {cs['hits']} · 미스 {cs['misses']} · 적중률 {cs['hit_rate']*100:.0f}% · 항목 {cs['size']}/{cs['max']}")
+        mi = db.maintenance_info(conn)
+        st.caption(f"DB {mi['page_count'] * mi['page_size'] / 1048576:.1f}MB · 빈 페이지 {mi['freelist_count']} · auto_vacuum={mi['auto_vacuum']}")
+        jb1, jb2 = st.columns(2)
+        with jb1:
+            if st.button("🔧 DB 정리 (백그라운드)", use_container_width=True):
+                jobs.submit(conn, "vacuum")
+        with jb2:
+            out_dir = os.path.splitext(DB_PATH)[0] + "-exports" if USER else jobs.EXPORT_DIR
+            if st.button("🗂️ CSV 폴더로 내보내기", use_container_width=True, help=f"{out_dir} 에 저장"):
+                jobs.submit(conn, "export_csv", {"out_dir": out_dir})
+
+        # 작업 상태만 주기적으로 다시 그린다 (나머지 화면은 다시 실행하지 않음)
+        @st.fragment(run_every=1.0 if jobs.active_jobs(conn) else None)
+        def _job_status():
+            c = get_db()
+            ui.render_jobs(jobs.list_jobs(c, limit=5), on_cancel=lambda jid: jobs.cancel(c, jid))
+        _job_status()
+
+    with st.expander("🩺 쿼리 프로파일링", expanded=profiler.enabled()):
+        pf1, pf2 = st.columns([0.7, 0.3])
+        with pf1:
+            prof_on = st.toggle("프로파일링 켜기 (끄면 콜백/래퍼를 모두 해제)", value=profiler.enabled())
+        with pf2:
+            if st.button("기록 초기화", use_container_width=True):
+                profiler.reset()
+        if prof_on != profiler.enabled():
+            profiler.enable() if prof_on else profiler.disable()
+            st.rerun()
+        profiler.SLOW_MS = float(st.number_input("느린 쿼리 기준 (ms)", min_value=1, value=int(profiler.SLOW_MS), step=10))
+        ui.render_profile(profiler.report(), profiler.slow_queries())
 
 st.divider()
 st.caption("💡 팁: 메모는 핀(🔖) 고정이 가능하고, 할 일은 미완료/긴급/시간순으로 정렬됩니다.")
\ No newline at end of file
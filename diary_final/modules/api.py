@@ -0,0 +1,490 @@
+# modules/api.py
+# 역할: Streamlit 없이 db.py 기능을 JSON HTTP API 로 제공 (Flutter 앱 등 다른 클라이언트용).
+#       요청마다 스크립트 전체를 다시 실행하는 Streamlit 과 달리, 요청 하나 = db 함수 호출 하나 (+ 조회 캐시).
+# 사용 (diary_final/ 에서):
+#   python -m modules.api --db data/app.db --port 8765
+#   curl -H 'Accept-Encoding: gzip' --compressed http://127.0.0.1:8765/api/month/2024-05
+# - 연결: db.get_pool (쓰기 1 + 읽기 여러 개). 요청은 스레드별로 처리 (ThreadingHTTPServer)
+# - ETag: 응답이 읽는 테이블들의 세대 번호(db.generations). If-None-Match 가 같으면 db 를 읽지 않고 304
+#   다른 프로세스(Streamlit 앱)의 쓰기는 요청마다 db.check_external_writes 로 감지해 세대를 올린다
+# - --shards: 사용자별 DB (modules/shards.py). 요청의 X-Diary-User 헤더로 DB 를 고른다
+# - gzip: Accept-Encoding 에 gzip 이 있고 본문이 GZIP_MIN 바이트 이상이면 압축. 인코딩 결과는 ETag 별로 캐시
+# - 묶음 요청: POST /api/batch {"requests": [{"method", "path", "body", "etag"}, ...]}
+#   왕복 한 번에 여러 조회. 쓰기가 섞여 있으면 전체를 한 트랜잭션(커밋 1회)으로 실행하고 하나라도 실패하면 모두 취소
+# 경로:
+#   GET    /api/health
+#   GET    /api/diary?after=&limit=             최신 일기 페이지 (next 를 다음 요청의 after 로). 목록은 본문 대신 snippet/body_len/has_more
+#   GET    /api/diary/<YYYY-MM-DD>              PUT 같은 경로 {text, mood, tags}
+#   GET    /api/diary/<YYYY-MM-DD>/revisions    개정 이력 (최신부터)   GET …/revisions/<rev>  본문 포함
+#   POST   /api/diary/<YYYY-MM-DD>/revisions/<rev>/restore   그 개정으로 되돌림 (새 개정으로 쌓임)
+#   GET    /api/memos?after=&limit=             POST {text, tags, pinned}
+#   GET    /api/memos/<id>                      본문 포함 (목록은 snippet 만)
+#   PUT    /api/memos/<id> {text, tags, pinned} DELETE 같은 경로
+#   GET    /api/todos/<YYYY-MM-DD>              POST /api/todos {title, d(없으면 날짜 없음), due, priority, tags}
+#   PUT    /api/todos/<id> {title, due, priority, tags}   PUT /api/todos/<id>/done {done}   DELETE /api/todos/<id>
+#   GET    /api/agenda?today=&days=7&limit=     미완료 할 일: 지난 것 / 다가오는 days 일 / 날짜 없음
+#   GET    /api/month/<YYYY-MM>                 월간 개요 (캘린더)
+#   GET    /api/stats?start=&end=&bucket=day    기간 통계
+#   GET    /api/search?q=&kinds=일기,메모&moods=&done=전체&tags=&tag_mode=AND[&kind=메모&after=&limit=]
+#   GET    /api/tags?prefix=&kind=&limit=
+
+import argparse, gzip, json, os, re, sys, threading, time
+from collections import OrderedDict
+from datetime import date, time as dtime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from modules import db, shards
+
+GZIP_MIN = 1024          # 이보다 작은 본문은 압축하지 않음 (헤더/CPU 비용이 더 큼)
+GZIP_LEVEL = 5
+RESPONSE_CACHE = 256     # (DB, 경로, ETag) → 인코딩된 본문
+MAX_BODY = 8 * 1024 * 1024
+MAX_BATCH = 50
+BOOT = format(int(time.time()), "x")  # 재시작하면 세대 번호가 0 부터 다시 시작하므로 ETag 에 섞는다
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+# ---------- 값 변환 ----------
+def _date(s: str) -> date:
+    try:
+        return date.fromisoformat(s)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"날짜 형식 오류: {s!r}")
+
+def _time(s) -> Optional[dtime]:
+    if not s:
+        return None
+    try:
+        return dtime.fromisoformat(s)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"시간 형식 오류: {s!r}")
+
+def _int(s, default: int, lo: int = 1, hi: int = 500) -> int:
+    if s in (None, ""):
+        return default
+    try:
+        return max(lo, min(hi, int(s)))
+    except ValueError:
+        raise ApiError(400, f"숫자 형식 오류: {s!r}")
+
+def _list(s) -> List[str]:
+    if isinstance(s, list):
+        return [str(x) for x in s]
+    return [x.strip() for x in (s or "").split(",") if x.strip()]
+
+def _cursor(s) -> Optional[tuple]:
+    # 페이지 커서는 JSON 배열 문자열로 주고받는다 (응답의 next 를 그대로 after 에)
+    if not s:
+        return None
+    try:
+        v = json.loads(s)
+    except ValueError:
+        raise ApiError(400, "after 형식 오류")
+    if not isinstance(v, list):
+        raise ApiError(400, "after 형식 오류")
+    return tuple(v)
+
+def _page(result) -> Dict[str, Any]:
+    items, nxt = result
+    return {"items": items, "next": json.dumps(list(nxt)) if nxt else None}
+
+class _AfterCommit:
+    # 쓰기 응답으로 저장된 행을 다시 읽어 돌려줄 때. 조회는 읽기 연결이라 묶음 트랜잭션 안에서는 예전 행이 보이므로
+    # 묶음 요청은 커밋한 뒤에 읽고, 단건 요청은 call 이 바로 읽는다
+    def __init__(self, read: Callable[[], Any]):
+        self.read = read
+
+def _need(body: Dict[str, Any], *keys: str):
+    missing = [k for k in keys if body.get(k) in (None, "")]
+    if missing:
+        raise ApiError(400, f"필수 값 없음: {', '.join(missing)}")
+
+# ---------- 경로 ----------
+# (메서드, 경로 정규식, 처리 함수, 읽는/쓰는 테이블). 처리 함수: fn(conn, match, query, body) -> 결과
+# GET 의 테이블은 ETag 계산에, 쓰기는 어떤 테이블을 바꾸는지 기록용 (무효화는 db 쓰기 함수가 한다)
+ROUTES: List[Tuple[str, "re.Pattern", Callable, Tuple[str, ...]]] = []
+# 처리 함수 → vary(query) -> str. 테이블 말고도 결과를 바꾸는 값(예: 생략된 today = 오늘 날짜)을 ETag 에 섞는다
+_VARY: Dict[Callable, Callable[[Dict[str, str]], str]] = {}
+
+def route(method: str, pattern: str, *tables: str, vary: Optional[Callable[[Dict[str, str]], str]] = None):
+    def deco(fn):
+        ROUTES.append((method, re.compile(f"^{pattern}$"), fn, tables))
+        if vary:
+            _VARY[fn] = vary
+        return fn
+    return deco
+
+DATE = r"(\d{4}-\d{2}-\d{2})"
+
+@route("GET", "/api/health")
+def _health(conn, m, q, body):
+    return {"ok": True, "schema_version": db.schema_version(conn), "cache": db.cache_stats()}
+
+@route("GET", "/api/diary", "diary")
+def _diary_page(conn, m, q, body):
+    return _page(db.get_diary_page(conn, after=_cursor(q.get("after")), limit=_int(q.get("limit"), 7)))
+
+@route("GET", f"/api/diary/{DATE}", "diary")
+def _diary_get(conn, m, q, body):
+    return db.get_diary_for_date(conn, _date(m[1]))
+
+@route("PUT", f"/api/diary/{DATE}", "diary", "tags")
+def _diary_put(conn, m, q, body):
+    if body.get("mood") and db.mood_code(body["mood"]) is None:
+        raise ApiError(400, f"알 수 없는 기분: {body['mood']!r}")
+    db.upsert_diary(conn, _date(m[1]), body.get("text") or "", body.get("mood"), _list(body.get("tags")))
+    return _AfterCommit(lambda: db.get_diary_for_date(conn, _date(m[1])))
+
+@route("GET", f"/api/diary/{DATE}/revisions", "diary")
+def _diary_revisions(conn, m, q, body):
+    return {"items": db.list_diary_revisions(conn, _date(m[1]))}
+
+@route("GET", rf"/api/diary/{DATE}/revisions/(\d+)", "diary")
+def _diary_revision(conn, m, q, body):
+    r = db.get_diary_revision(conn, _date(m[1]), int(m[2]))
+    if r is None:
+        raise ApiError(404, f"개정 없음: {m[1]} #{m[2]}")
+    return r
+
+@route("POST", rf"/api/diary/{DATE}/revisions/(\d+)/restore", "diary", "tags")
+def _diary_restore(conn, m, q, body):
+    _diary_revision(conn, m, q, body)  # 없으면 404
+    db.restore_diary_revision(conn, _date(m[1]), int(m[2]))
+    return _AfterCommit(lambda: db.get_diary_for_date(conn, _date(m[1])))
+
+@route("GET", "/api/memos", "memos")
+def _memos_page(conn, m, q, body):
+    return _page(db.list_memos_page(conn, after=_cursor(q.get("after")), limit=_int(q.get("limit"), db.PAGE_SIZE)))
+
+@route("POST", "/api/memos", "memos", "tags")
+def _memo_add(conn, m, q, body):
+    _need(body, "text")
+    return {"id": db.add_memo(conn, body["text"], _list(body.get("tags")), bool(body.get("pinned")))}
+
+@route("GET", r"/api/memos/(\d+)", "memos")
+def _memo_get(conn, m, q, body):
+    memo = db.get_memo(conn, int(m[1]))
+    if memo is None:
+        raise ApiError(404, f"메모 없음: {m[1]}")
+    return memo
+
+@route("PUT", r"/api/memos/(\d+)", "memos", "tags")
+def _memo_put(conn, m, q, body):
+    _need(body, "text")
+    db.update_memo(conn, int(m[1]), body["text"], _list(body.get("tags")), bool(body.get("pinned")))
+    return {"id": int(m[1])}
+
+@route("DELETE", r"/api/memos/(\d+)", "memos", "tags")
+def _memo_delete(conn, m, q, body):
+    db.delete_memo(conn, int(m[1]))
+    return {"id": int(m[1])}
+
+@route("GET", f"/api/todos/{DATE}", "todos")
+def _todos_for_date(conn, m, q, body):
+    return db.list_todos_for_date(conn, _date(m[1]))
+
+@route("POST", "/api/todos", "todos", "tags")
+def _todo_add(conn, m, q, body):
+    _need(body, "title")
+    return {"id": db.add_todo(conn, body["title"], _date(body["d"]) if body.get("d") else None, _time(body.get("due")),
+                              body.get("priority") or "보통", _list(body.get("tags")))}
+
+@route("PUT", r"/api/todos/(\d+)", "todos", "tags")
+def _todo_put(conn, m, q, body):
+    _need(body, "title")
+    tags = _list(body["tags"]) if "tags" in body else None
+    db.update_todo(conn, int(m[1]), body["title"], _time(body.get("due")), body.get("priority") or "보통", tags)
+    return {"id": int(m[1])}
+
+@route("PUT", r"/api/todos/(\d+)/done", "todos")
+def _todo_done(conn, m, q, body):
+    db.set_todo_done(conn, int(m[1]), bool(body.get("done", True)))
+    return {"id": int(m[1])}
+
+@route("DELETE", r"/api/todos/(\d+)", "todos", "tags")
+def _todo_delete(conn, m, q, body):
+    db.delete_todo(conn, int(m[1]))
+    return {"id": int(m[1])}
+
+def _agenda_today(q: Dict[str, str]) -> date:
+    return _date(q["today"]) if q.get("today") else date.today()
+
+# today 를 생략하면 자정이 지나면 결과가 바뀌므로, 실제로 쓴 날짜를 ETag(→ 응답 캐시 키)에 넣는다
+@route("GET", "/api/agenda", "todos", vary=lambda q: _agenda_today(q).isoformat())
+def _agenda(conn, m, q, body):
+    today = _agenda_today(q)
+    days = _int(q.get("days"), db.AGENDA_DAYS, hi=366)
+    return {"counts": db.agenda_counts(conn, today, days),
+            **db.get_agenda(conn, today, days, _int(q.get("limit"), 50))}
+
+@route("GET", r"/api/month/(\d{4})-(\d{2})", "diary", "todos")
+def _month(conn, m, q, body):
+    month = int(m[2])
+    if not 1 <= month <= 12:
+        raise ApiError(400, f"월 범위 오류: {month}")
+    return db.get_month_overview(conn, int(m[1]), month)
+
+@route("GET", "/api/stats", "diary", "todos")
+def _stats(conn, m, q, body):
+    bucket = q.get("bucket") or "day"
+    if bucket not in db.STATS_BUCKETS:
+        raise ApiError(400, f"bucket 은 {', '.join(db.STATS_BUCKETS)} 중 하나")
+    start = _date(q["start"]) if q.get("start") else None
+    end = _date(q["end"]) if q.get("end") else None
+    return db.get_daily_stats(conn, start, end, bucket)
+
+@route("GET", "/api/search", "diary", "memos", "todos", "tags")
+def _search(conn, m, q, body):
+    # kind 가 있으면 그 종류의 한 페이지(+ next), 없으면 kinds 별 첫 100건
+    args = (q.get("q") or "", _list(q.get("moods")), q.get("done") or "전체", _list(q.get("tags")), q.get("tag_mode") or "AND")
+    if q.get("kind"):
+        if q["kind"] not in db.SEARCH_KINDS:
+            raise ApiError(400, f"kind 는 {', '.join(db.SEARCH_KINDS)} 중 하나")
+        return _page(db.search_page(conn, q["kind"], *args, after=_cursor(q.get("after")),
+                                    limit=_int(q.get("limit"), db.PAGE_SIZE)))
+    kinds = _list(q.get("kinds")) or list(db.SEARCH_KINDS)
+    return db.search_all(conn, args[0], kinds, *args[1:])
+
+@route("GET", "/api/tags", "tags")
+def _tags(conn, m, q, body):
+    return db.tag_counts(conn, q.get("prefix") or "", q.get("kind") or None, _int(q.get("limit"), 20))
+
+def resolve(method: str, path: str):
+    allowed = []
+    for meth, pat, fn, tables in ROUTES:
+        m = pat.match(path)
+        if m:
+            if meth == method:
+                return fn, m, tables
+            allowed.append(meth)
+    raise ApiError(405 if allowed else 404, "허용되지 않는 메서드" if allowed else f"없는 경로: {path}")
+
+# ---------- 응답 인코딩 ----------
+_encoded: "OrderedDict[tuple, tuple]" = OrderedDict()
+_encoded_lock = threading.Lock()
+
+def etag_for(conn, tables: Tuple[str, ...], extra: str = "") -> Optional[str]:
+    if not tables:
+        return None
+    return f'W/"{BOOT}-{".".join(map(str, db.generations(conn, *tables)))}{"-" + extra if extra else ""}"'
+
+def _matches(header: Optional[str], etag: Optional[str]) -> bool:
+    if not header or not etag:
+        return False
+    return header.strip() == "*" or etag in [t.strip() for t in header.split(",")]
+
+def encode(key, value, want_gzip: bool) -> Tuple[bytes, bool]:
+    # (본문, gzip 여부). key(경로+ETag)가 있으면 JSON/gzip 결과를 재사용
+    if key is not None:
+        with _encoded_lock:
+            hit = _encoded.get(key)
+            if hit is not None:
+                _encoded.move_to_end(key)
+    else:
+        hit = None
+    if hit is None:
+        raw = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        hit = [raw, None]
+        if key is not None:
+            with _encoded_lock:
+                _encoded[key] = hit
+                while len(_encoded) > RESPONSE_CACHE:
+                    _encoded.popitem(last=False)
+    raw = hit[0]
+    if not want_gzip or len(raw) < GZIP_MIN:
+        return raw, False
+    if hit[1] is None:
+        hit[1] = gzip.compress(raw, GZIP_LEVEL)
+    return hit[1], True
+
+# ---------- 요청 처리 ----------
+def call(conn, method: str, target: str, body: Optional[Dict[str, Any]] = None,
+         if_none_match: Optional[str] = None, defer: bool = False) -> Tuple[int, Any, Optional[str], Optional[tuple]]:
+    # (상태, 결과, ETag, 응답 캐시 키). HTTP 서버와 묶음 요청이 같이 쓴다
+    # defer: 쓰기 결과의 _AfterCommit 을 그대로 돌려준다 (묶음 요청이 커밋 후에 읽음)
+    url = urlsplit(target)
+    fn, m, tables = resolve(method, url.path)
+    q = {k: v[-1] for k, v in parse_qs(url.query).items()}
+    if method != "GET":
+        result = fn(conn, m, q, body or {})
+        if isinstance(result, _AfterCommit) and not defer:
+            result = result.read()
+        return 200, result, None, None
+    # 세대 번호는 읽기 전에 잡는다: 그 사이 쓰기가 있으면 ETag 가 결과보다 오래된 쪽이라 다음 요청에서 다시 받는다
+    etag = etag_for(conn, tables, _VARY[fn](q) if fn in _VARY else "")
+    if _matches(if_none_match, etag):
+        return 304, None, etag, None
+    return 200, fn(conn, m, q, body or {}), etag, (db._db_key(conn), target, etag) if etag else None
+
+def batch(conn, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    if not isinstance(requests, list) or len(requests) > MAX_BATCH:
+        raise ApiError(400, f"requests 는 {MAX_BATCH}개 이하의 목록")
+    writes = any((r.get("method") or "GET").upper() != "GET" for r in requests)
+    out: List[Dict[str, Any]] = []
+
+    def run():
+        for r in requests:
+            method = (r.get("method") or "GET").upper()
+            try:
+                status, result, etag, _ = call(conn, method, r.get("path") or "", r.get("body"), r.get("etag"), defer=writes)
+                out.append({"status": status, "etag": etag, "body": result})
+            except ApiError as e:
+                if writes:
+                    raise
+                out.append({"status": e.status, "error": str(e)})
+
+    if writes:
+        # 쓰기가 섞이면 한 트랜잭션. 블록 안의 조회는 읽기 연결이라 같은 묶음의 쓰기 결과는 보이지 않는다
+        # (쓰기 응답의 저장된 행은 커밋 뒤에 읽어 채운다)
+        with db.transaction(conn):
+            run()
+        for o in out:
+            if isinstance(o.get("body"), _AfterCommit):
+                o["body"] = o["body"].read()
+    else:
+        run()
+    return out
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "DiaryAPI/1.0"
+    protocol_version = "HTTP/1.1"   # keep-alive: 클라이언트가 연결을 재사용
+    conn = None                     # make_server 가 설정
+    router = None                   # 사용자별 DB 모드(--shards)이면 shards.Router
+    quiet = False
+
+    def log_message(self, fmt, *args):
+        if not self.quiet:
+            super().log_message(fmt, *args)
+
+    def _body(self) -> Dict[str, Any]:
+        n = int(self.headers.get("Content-Length") or 0)
+        if n > MAX_BODY:
+            raise ApiError(413, "본문이 너무 큽니다")
+        if not n:
+            return {}
+        try:
+            v = json.loads(self.rfile.read(n))
+        except ValueError:
+            raise ApiError(400, "JSON 본문 오류")
+        if not isinstance(v, dict):
+            raise ApiError(400, "JSON 객체가 필요합니다")
+        return v
+
+    def _send(self, status: int, value: Any = None, etag: Optional[str] = None, key=None):
+        self.send_response(status)
+        self.send_header("Vary", "Accept-Encoding, X-Diary-User")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")  # 매번 재검증 (304 는 본문 없이 응답)
+        if status == 304:
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        data, gz = encode(key, value, "gzip" in (self.headers.get("Accept-Encoding") or ""))
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        if gz:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    def _conn(self):
+        # 사용자별 DB 모드에서는 X-Diary-User 헤더의 사용자 DB
+        if self.router is None:
+            return self.conn
+        user = self.headers.get("X-Diary-User")
+        if not user:
+            raise ApiError(401, "X-Diary-User 헤더가 필요합니다")
+        try:
+            return self.router.pool(user)
+        except ValueError as e:
+            raise ApiError(400, str(e))
+
+    def _handle(self, method: str):
+        try:
+            body = self._body() if method not in ("GET", "HEAD") else {}
+            conn = self._conn()
+            db.check_external_writes(conn)
+            if method == "POST" and urlsplit(self.path).path == "/api/batch":
+                self._send(200, {"responses": batch(conn, body.get("requests"))})
+                return
+            status, result, etag, key = call(conn, "GET" if method == "HEAD" else method, self.path, body,
+                                             self.headers.get("If-None-Match"))
+            self._send(status, result, etag, key)
+        except ApiError as e:
+            self._send(e.status, {"error": str(e)})
+        except (ValueError, KeyError) as e:
+            self._send(400, {"error": f"{type(e).__name__}: {e}"})
+        except Exception as e:
+            self.log_error("%s %s: %r", method, self.path, e)
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET, HEAD, POST, PUT, DELETE, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type, If-None-Match, X-Diary-User")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_HEAD(self):
+        self._handle("HEAD")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+def make_server(conn, host: str = "127.0.0.1", port: int = 8765, quiet: bool = False,
+                router=None) -> ThreadingHTTPServer:
+    # port=0 이면 빈 포트를 고른다 (server.server_address[1]). 로컬 확인/스크립트용
+    # router(shards.Router)를 주면 conn 대신 요청의 X-Diary-User 로 사용자 DB 를 고른다
+    handler = type("BoundHandler", (Handler,), {"conn": conn, "router": router, "quiet": quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m modules.api", description="일기/메모/할 일 JSON HTTP API")
+    ap.add_argument("--db", default=os.path.join("data", "app.db"))
+    ap.add_argument("--host", default="127.0.0.1", help="다른 기기에서 접속하려면 0.0.0.0 (인증 없음 주의)")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--readers", type=int, default=4, help="읽기 연결 수")
+    ap.add_argument("--quiet", action="store_true", help="요청 로그 끄기")
+    ap.add_argument("--shards", action="store_true", help="사용자별 DB (data/users/…, X-Diary-User 헤더로 선택)")
+    args = ap.parse_args(argv)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+    router = shards.get_router() if args.shards else None
+    conn = None if router else db.get_pool(args.db, max_readers=args.readers)
+    server = make_server(conn, args.host, args.port, args.quiet, router)
+    print(f"http://{args.host}:{server.server_address[1]}/api/health  (DB: {router.root + '/' if router else args.db})",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if router:
+            router.close()
+        else:
+            conn.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+# modules/autosave.py
+# 역할: 일기 자동 저장. 화면(main.py)은 바뀐 내용을 submit 으로 넘기기만 하고, 쓰기는 저장 스레드가 한다.
+# - 모으기: 같은 (DB, 날짜)의 편집은 마지막 내용 하나로 합친다. 저장 전에 또 바뀌면 덮어쓸 뿐 쓰기가 늘지 않는다
+# - 미루기: 마지막 편집 후 DEBOUNCE 초 조용하면 저장. 계속 고치는 중이어도 MAX_WAIT 초가 지나면 한 번 저장
+# - 간격: 한 날짜의 쓰기 사이는 최소 MIN_INTERVAL 초 (DB 는 열린 일기 하나당 몇 초에 한 번 이하로 쓰기를 받는다)
+# - 같은 내용이면 쓰지 않음: 마지막으로 저장한 내용의 해시와 같으면 건너뛴다 (고쳤다가 되돌린 경우 등)
+# - 저장 스레드는 프로세스에 하나, 모든 DB(사용자 풀)를 함께 처리한다. 풀은 닫혀 있어도 쓰기 때 다시 열린다
+# 사용 (main.py):
+#   autosave.submit(conn, d, text, mood, tags)   # 내용이 바뀔 때마다
+#   autosave.status(conn, d)                     # {"state": pending|saving|saved|error|idle, "saved_at", "error"}
+#   autosave.peek(conn, d)                       # 아직 쓰지 않은 내용 (날짜를 옮겼다가 돌아왔을 때 화면 값으로)
+#   autosave.save_now / discard                  # 💾 버튼 / 예전 버전 복원
+
+import hashlib, json, threading, time, traceback
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from modules import db
+
+DEBOUNCE = 2.0       # 마지막 편집 후 이만큼 조용하면 저장(초)
+MAX_WAIT = 10.0      # 계속 편집 중이어도 첫 미저장 편집 후 이만큼 지나면 저장(초)
+MIN_INTERVAL = 3.0   # 같은 날짜 쓰기 사이 최소 간격(초). 실패 후 재시도 간격도 같다
+KEEP_SAVED = 600.0   # 저장 끝난 항목을 상태 표시용으로 남겨 두는 시간(초)
+
+def content_hash(text: str, mood: Optional[str], tags: List[str]) -> str:
+    raw = json.dumps([text or "", mood, [t.strip() for t in tags if t and t.strip()]], ensure_ascii=False)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+class _Entry:
+    __slots__ = ("conn", "d", "payload", "hash", "first_at", "changed_at", "saved_hash", "saved_at",
+                 "last_write", "saving", "error")
+
+    def __init__(self, conn, d: date):
+        self.conn, self.d = conn, d
+        self.payload: Optional[Tuple[str, Optional[str], List[str]]] = None  # 아직 쓰지 않은 내용
+        self.hash: Optional[str] = None
+        self.first_at = self.changed_at = 0.0
+        self.saved_hash: Optional[str] = None
+        self.saved_at: Optional[str] = None
+        self.last_write = 0.0
+        self.saving = False
+        self.error: Optional[str] = None
+
+    def due_at(self) -> float:
+        # 저장해도 되는 가장 이른 시각 (monotonic)
+        quiet = min(self.changed_at + DEBOUNCE, self.first_at + MAX_WAIT)
+        return max(quiet, self.last_write + MIN_INTERVAL)
+
+_entries: Dict[Tuple[Any, str], _Entry] = {}
+_cond = threading.Condition()
+_thread: Optional[threading.Thread] = None
+
+def _key(conn, d: date) -> Tuple[Any, str]:
+    return db._db_key(conn), d.isoformat()
+
+def _ensure_thread():
+    global _thread
+    if _thread is None or not _thread.is_alive():
+        _thread = threading.Thread(target=_loop, name="diary-autosave", daemon=True)
+        _thread.start()
+
+# ---------- 화면 쪽 ----------
+def submit(conn, d: date, text: str, mood: Optional[str], tags: List[str]) -> str:
+    # 바뀐 내용을 맡긴다. 반환: 현재 상태 (status 의 state)
+    h = content_hash(text, mood, tags)
+    now = time.monotonic()
+    with _cond:
+        e = _entries.setdefault(_key(conn, d), _Entry(conn, d))
+        e.conn = conn
+        if h == e.hash:
+            return _state(e)
+        if h == e.saved_hash and not e.saving:  # 저장된 내용으로 되돌림: 쓸 것 없음
+            e.payload = e.hash = None
+            return _state(e)
+        if e.payload is None:
+            e.first_at = now
+        e.payload, e.hash, e.changed_at = (text or "", mood, list(tags)), h, now
+        _ensure_thread()
+        _cond.notify_all()
+        return _state(e)
+
+def flush(conn, d: Optional[date] = None):
+    # 미루기를 건너뛰고 곧 저장 (날짜를 옮길 때). 최소 간격은 지킨다. d 가 None 이면 이 DB 의 모든 날짜
+    dbk = db._db_key(conn)
+    with _cond:
+        for (k, iso), e in _entries.items():
+            if k == dbk and (d is None or iso == d.isoformat()) and e.payload is not None:
+                e.first_at = e.changed_at = 0.0
+        _cond.notify_all()
+
+def save_now(conn, d: date, text: str, mood: Optional[str], tags: List[str]) -> bool:
+    # 💾 버튼: 호출한 스레드에서 바로 쓴다. 대기 중이던 자동 저장은 이 내용으로 대신한다
+    h = content_hash(text, mood, tags)
+    with _cond:
+        e = _entries.setdefault(_key(conn, d), _Entry(conn, d))
+        e.payload = e.hash = None
+        _cond.wait_for(lambda: not e.saving)  # 저장 스레드가 쓰던 예전 내용이 이 저장 뒤에 덮어쓰지 않도록
+    changed = db.upsert_diary(conn, d, text, mood, tags)
+    with _cond:
+        e.saved_hash, e.saved_at, e.last_write, e.error = h, datetime.now().strftime("%H:%M:%S"), time.monotonic(), None
+    return changed
+
+def discard(conn, d: date):
+    # 아직 쓰지 않은 내용을 버린다 (예전 버전 복원 등 다른 경로로 일기를 바꿀 때). 쓰는 중이면 끝날 때까지 기다림
+    with _cond:
+        e = _entries.get(_key(conn, d))
+        if e is not None:
+            e.payload = e.hash = None
+            _cond.wait_for(lambda: not e.saving)
+
+def peek(conn, d: date) -> Optional[Dict[str, Any]]:
+    with _cond:
+        e = _entries.get(_key(conn, d))
+        if e is None or e.payload is None:
+            return None
+        text, mood, tags = e.payload
+        return {"text": text, "mood": mood, "tags": tags}
+
+def _state(e: _Entry) -> str:
+    if e.saving:
+        return "saving"
+    if e.payload is not None:
+        return "error" if e.error else "pending"
+    return "saved" if e.saved_at else "idle"
+
+def status(conn, d: date) -> Dict[str, Any]:
+    with _cond:
+        e = _entries.get(_key(conn, d))
+        if e is None:
+            return {"state": "idle", "saved_at": None, "error": None}
+        return {"state": _state(e), "saved_at": e.saved_at, "error": e.error}
+
+def pending_count() -> int:
+    with _cond:
+        return sum(1 for e in _entries.values() if e.payload is not None or e.saving)
+
+# ---------- 저장 스레드 ----------
+def _loop():
+    while True:
+        with _cond:
+            now = time.monotonic()
+            ready = [e for e in _entries.values() if e.payload is not None and not e.saving and e.due_at() <= now]
+            if not ready:
+                waits = [e.due_at() - now for e in _entries.values() if e.payload is not None and not e.saving]
+                for k in [k for k, e in _entries.items() if e.payload is None and not e.saving and now - e.last_write > KEEP_SAVED]:
+                    del _entries[k]
+                _cond.wait(max(0.05, min(waits)) if waits else None)
+                continue
+            batch = []
+            for e in ready:
+                batch.append((e, e.payload, e.hash))
+                e.saving = True
+        for e, (text, mood, tags), h in batch:
+            err = None
+            try:
+                if h != e.saved_hash:
+                    db.upsert_diary(e.conn, e.d, text, mood, tags)
+            except Exception as ex:
+                traceback.print_exc()
+                err = f"{type(ex).__name__}: {ex}"[:300]
+            with _cond:
+                e.saving, e.last_write, e.error = False, time.monotonic(), err
+                if err is None:
+                    e.saved_hash, e.saved_at = h, datetime.now().strftime("%H:%M:%S")
+                    if e.hash == h:  # 쓰는 동안 더 바뀌지 않았으면 대기 내용 비움
+                        e.payload = e.hash = None
+                    else:
+                        e.first_at = time.monotonic()
+                _cond.notify_all()
@@ -0,0 +1,256 @@
+# modules/book.py
+# 역할: "일기책" 내보내기. 기간 안의 일기·할 일·메모를 날짜순으로 엮어 DOCX 또는 Markdown 한 권으로 만든다.
+# - 한 달 = 한 장(section). 날짜마다 요일·일진(utils.get_ganji_day)·기분, 일기 본문, 할 일, 메모
+# - 행은 세 테이블을 날짜순 커서로 fetchmany 하며 한 달 치씩만 모은다 (메모리는 "한 달 + 작업 중인 달들" 수준)
+# - 달마다 서식 작업은 프로세스 풀에서 병렬로: Markdown 은 문자열, DOCX 는 본문 XML 조각을 만들어 돌려주고
+#   부모가 순서대로 이어 붙인다 (Markdown 은 파일에 바로 쓰고, DOCX 는 python-docx 특성상 저장 전까지 메모리에 든다)
+# - 프로세스는 spawn 으로 띄운다 (Streamlit/작업 스레드가 있는 프로세스에서 fork 하지 않도록). 달이 적으면 풀 없이 처리
+# 사용: book.export_book(conn, "data/exports/book.docx", date(2023,1,1), date(2024,12,31))  또는  jobs.submit(conn, "book", {...})
+
+import io, multiprocessing, os, re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape as xml_escape
+
+from modules import db, utils
+
+FORMATS = {"docx": ("application/vnd.openxmlformats-officedocument.wordprocessingml.document", ".docx"),
+           "md": ("text/markdown", ".md")}
+FETCH_ROWS = 2000
+MAX_WORKERS = 4
+INLINE_MONTHS = 3      # 이 이하면 프로세스 풀 없이 바로 렌더링 (풀 시작 비용이 더 큼)
+FONT = "맑은 고딕"
+WEEKDAYS = "월화수목금토일"
+
+# 날짜/기분/우선순위는 표시값으로 읽는다. 행 순서: 날짜 → id
+_D, _MOOD, _PRI = db.display_sql("d"), db.display_sql("mood"), db.display_sql("priority")
+BOOK_SQL = {
+    "diary": f"SELECT d, {_D}, {_MOOD}, tags, text FROM diary WHERE d BETWEEN ? AND ? ORDER BY d ASC, id ASC",
+    "todos": f"SELECT d, {_D}, due, {_PRI}, done, title FROM todos WHERE d BETWEEN ? AND ? "
+             f"ORDER BY d ASC, done ASC, priority DESC, due IS NULL, due ASC, id ASC",
+    "memos": "SELECT created_at, substr(created_at, 1, 10), created_at, pinned, tags, text FROM memos "
+             "WHERE created_at >= ? AND created_at < ? ORDER BY created_at ASC, id ASC",
+}
+
+# ---------- 행 읽기 ----------
+def _rows(c, sql: str, params) -> Iterator[tuple]:
+    cur = c.execute(sql, params)
+    while True:
+        chunk = cur.fetchmany(FETCH_ROWS)
+        if not chunk:
+            return
+        for r in chunk:
+            yield tuple(r)
+
+def _months(start: date, end: date) -> List[Tuple[int, int]]:
+    out, y, m = [], start.year, start.month
+    while (y, m) <= (end.year, end.month):
+        out.append((y, m))
+        y, m = db._shift_month(y, m, 1)
+    return out
+
+def _month_of_iso(s: str) -> Tuple[int, int]:
+    return int(s[:4]), int(s[5:7])
+
+def iter_months(c, start: date, end: date) -> Iterator[Dict[str, Any]]:
+    # 달마다 {"year", "month", "diary": [...], "todos": [...], "memos": [...]} (빈 달은 건너뜀).
+    # 세 커서를 함께 앞으로 움직이며 그 달 행만 모은다. 행은 표시값 튜플 (프로세스로 넘기기 쉽게)
+    lo, hi = db.day_num(start), db.day_num(end)
+    next_day = date.fromordinal(end.toordinal() + 1).isoformat()
+    streams = {
+        "diary": _rows(c, BOOK_SQL["diary"], (lo, hi)),
+        "todos": _rows(c, BOOK_SQL["todos"], (lo, hi)),
+        "memos": _rows(c, BOOK_SQL["memos"], (start.isoformat(), next_day)),
+    }
+    month_of = {"diary": lambda r: _month_of_iso(r[1]), "todos": lambda r: _month_of_iso(r[1]),
+                "memos": lambda r: _month_of_iso(r[1])}
+    heads = {k: next(it, None) for k, it in streams.items()}
+    for y, m in _months(start, end):
+        part: Dict[str, Any] = {"year": y, "month": m}
+        for k, it in streams.items():
+            rows = []
+            while heads[k] is not None and month_of[k](heads[k]) == (y, m):
+                rows.append(heads[k][1:])  # 정렬용 첫 열은 버림
+                heads[k] = next(it, None)
+            part[k] = rows
+        if part["diary"] or part["todos"] or part["memos"]:
+            yield part
+
+# ---------- 한 달 구성 ----------
+def _day_title(iso: str, mood: Optional[str]) -> str:
+    d = date.fromisoformat(iso)
+    title = f"{d.month}월 {d.day}일 ({WEEKDAYS[d.weekday()]}) · {utils.get_ganji_day(d)}일"
+    return f"{title} · {mood}" if mood else title
+
+def _month_days(part: Dict[str, Any]) -> List[Tuple[str, Dict[str, list]]]:
+    # 날짜(ISO) → 그날의 일기/할 일/메모, 날짜순
+    days: Dict[str, Dict[str, list]] = {}
+    for k in ("diary", "todos", "memos"):
+        for r in part[k]:
+            days.setdefault(r[0], {"diary": [], "todos": [], "memos": []})[k].append(r)
+    return sorted(days.items())
+
+def _month_summary(part: Dict[str, Any]) -> str:
+    moods = [db.MOOD_CODES[r[1]] for r in part["diary"] if r[1] in db.MOOD_CODES]
+    done = sum(1 for r in part["todos"] if r[3])
+    s = f"일기 {len(part['diary'])}편"
+    if moods:
+        s += f" · 평균 기분 {db.MOODS[round(sum(moods) / len(moods))]}"
+    if part["todos"]:
+        s += f" · 할 일 {done}/{len(part['todos'])} 완료"
+    if part["memos"]:
+        s += f" · 메모 {len(part['memos'])}개"
+    return s
+
+def _todo_line(r) -> str:
+    # r: (날짜, due, 우선순위, done, title)
+    meta = " · ".join(x for x in (r[1], r[2] if r[2] != "보통" else None) if x)
+    return f"{'☑' if r[3] else '☐'} {r[4]}" + (f" ({meta})" if meta else "")
+
+def _memo_line(r) -> str:
+    # r: (날짜, created_at, pinned, tags, text)
+    t = r[1][11:16]
+    return f"{'🔖 ' if r[2] else ''}{t + ' ' if t else ''}{r[4]}" + (f" #{' #'.join(r[3].split(','))}" if r[3] else "")
+
+# ---------- Markdown ----------
+def render_markdown(part: Dict[str, Any]) -> str:
+    out = [f"## {part['year']}년 {part['month']}월", "", f"_{_month_summary(part)}_", ""]
+    for iso, day in _month_days(part):
+        mood = day["diary"][0][1] if day["diary"] else None
+        out += [f"### {_day_title(iso, mood)}", ""]
+        for r in day["diary"]:
+            out += [(r[3] or "").strip(), ""]
+            if r[2]:
+                out += ["태그: " + " ".join(f"#{t}" for t in r[2].split(",")), ""]
+        if day["todos"]:
+            out += [f"- {_todo_line(r)}" for r in day["todos"]] + [""]
+        if day["memos"]:
+            out += [f"> 📝 {_memo_line(r)}" for r in day["memos"]] + [""]
+    return "\n".join(out) + "\n"
+
+# ---------- DOCX ----------
+# 달 조각은 python-docx 객체 대신 WordprocessingML 문단을 문자열로 바로 만든다
+# (문단마다 요소 생성·스타일 조회를 거치는 python-docx 보다 훨씬 빠르고, 작업 프로세스에 python-docx 가 필요 없다).
+# 스타일 id 는 python-docx 기본 서식 파일의 것이고, 문서 틀(_new_docx)만 python-docx 로 만든다.
+_XML_BAD = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")  # XML 에 넣을 수 없는 제어 문자
+STYLES = {"h1": "Heading1", "h2": "Heading2", "bullet": "ListBullet", "quote": "Quote"}
+
+def _w_p(text: str, style: Optional[str] = None, italic: bool = False) -> str:
+    ppr = f'<w:pPr><w:pStyle w:val="{STYLES[style]}"/></w:pPr>' if style else ""
+    rpr = "<w:rPr><w:i/></w:rPr>" if italic else ""
+    lines = _XML_BAD.sub("", text).split("\n")
+    runs = "<w:br/>".join(f'<w:t xml:space="preserve">{xml_escape(line)}</w:t>' for line in lines)
+    return f"<w:p>{ppr}<w:r>{rpr}{runs}</w:r></w:p>"
+
+def render_docx_fragment(part: Dict[str, Any]) -> bytes:
+    # 한 달 분량의 본문 문단들 (w: 접두어, 네임스페이스 선언은 붙일 때 _append_fragment 가 감싼다)
+    out = [_w_p(f"{part['year']}년 {part['month']}월", "h1"), _w_p(_month_summary(part), italic=True)]
+    for iso, day in _month_days(part):
+        mood = day["diary"][0][1] if day["diary"] else None
+        out.append(_w_p(_day_title(iso, mood), "h2"))
+        for r in day["diary"]:
+            out += [_w_p(chunk.strip()) for chunk in (r[3] or "").strip().split("\n\n") if chunk.strip()]
+            if r[2]:
+                out.append(_w_p(" ".join(f"#{t}" for t in r[2].split(",")), italic=True))
+        out += [_w_p(_todo_line(r), "bullet") for r in day["todos"]]
+        out += [_w_p(f"📝 {_memo_line(r)}", "quote") for r in day["memos"]]
+    return "".join(out).encode("utf-8")
+
+def _render(fmt: str, part: Dict[str, Any]):
+    # 프로세스 풀 작업 (모듈 최상위 함수여야 spawn 으로 넘길 수 있다)
+    return render_docx_fragment(part) if fmt == "docx" else render_markdown(part).encode("utf-8")
+
+def _new_docx(title: str, subtitle: str):
+    from docx import Document
+    from docx.oxml.ns import qn
+    doc = Document()
+    normal = doc.styles["Normal"]
+    normal.font.name = FONT
+    normal.element.get_or_add_rPr().get_or_add_rFonts().set(qn("w:eastAsia"), FONT)  # 한글 글꼴
+    doc.add_heading(title, level=0)
+    doc.add_paragraph(subtitle)
+    return doc
+
+def _append_fragment(doc, frag: bytes):
+    from docx.oxml import parse_xml
+    from docx.oxml.ns import nsdecls
+    sect = doc.element.body.sectPr  # 문서 끝 구역 설정은 항상 본문 마지막에 있어야 한다
+    for el in list(parse_xml(f"<w:body {nsdecls('w')}>".encode() + frag + b"</w:body>")):
+        sect.addprevious(el)
+
+# ---------- 내보내기 ----------
+def _rendered(parts: Iterator[Dict[str, Any]], fmt: str, workers: int, inline: bool) -> Iterator[Tuple[Dict[str, Any], bytes]]:
+    # (달, 렌더링 결과) 를 달 순서대로. 풀에는 workers*2 달까지만 미리 넣는다 (메모리 상한)
+    if inline or workers <= 1:
+        for p in parts:
+            yield p, _render(fmt, p)
+        return
+    ex = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        pending = []
+        for p in parts:
+            pending.append((p, ex.submit(_render, fmt, p)))
+            if len(pending) >= workers * 2:
+                q, fut = pending.pop(0)
+                yield q, fut.result()
+        for q, fut in pending:
+            yield q, fut.result()
+    finally:
+        ex.shutdown(wait=True, cancel_futures=True)
+
+def write_book(conn, out: BinaryIO, start: date, end: date, fmt: str = "docx", workers: Optional[int] = None,
+               progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+    # out 에 책 한 권을 쓴다. 반환: {"months", "diary", "todos", "memos"}
+    if fmt not in FORMATS:
+        raise ValueError(f"알 수 없는 형식: {fmt}")
+    if end < start:
+        start, end = end, start
+    total = len(_months(start, end))
+    workers = workers or min(MAX_WORKERS, os.cpu_count() or 1)
+    title = "일기책"
+    subtitle = f"{start.isoformat()} ~ {end.isoformat()} · {datetime.now().strftime('%Y-%m-%d')} 만듦"
+    stats = {"months": 0, "diary": 0, "todos": 0, "memos": 0}
+    doc = _new_docx(title, subtitle) if fmt == "docx" else None
+    if fmt == "md":
+        out.write(f"# {title}\n\n{subtitle}\n\n".encode("utf-8"))
+    with db.reading(conn) as c:
+        for part, data in _rendered(iter_months(c, start, end), fmt, workers, inline=total <= INLINE_MONTHS):
+            if doc is not None:
+                _append_fragment(doc, data)
+            else:
+                out.write(data)
+            stats["months"] += 1
+            for k in ("diary", "todos", "memos"):
+                stats[k] += len(part[k])
+            if progress:
+                progress((part["year"] - start.year) * 12 + part["month"] - start.month + 1, total)
+    if doc is not None:
+        doc.save(out)
+    if progress:
+        progress(total, total)
+    return stats
+
+def export_book(conn, path: str, start: date, end: date, fmt: Optional[str] = None, workers: Optional[int] = None,
+                progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+    # 파일로 저장 (형식은 확장자로). 임시 파일에 쓴 뒤 바꿔 넣어 중간에 실패해도 이전 파일이 남는다
+    fmt = fmt or ("md" if path.endswith(".md") else "docx")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".part"
+    try:
+        with open(tmp, "wb") as f:
+            stats = write_book(conn, f, start, end, fmt, workers, progress)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return dict(stats, path=path, bytes=os.path.getsize(path))
+
+def build_book(conn, start: date, end: date, fmt: str = "docx"):
+    # Streamlit 다운로드용 (파일, 이름, MIME). 기간이 짧을 때 화면에서 바로 만든다
+    buf = io.BytesIO()
+    write_book(conn, buf, start, end, fmt)
+    return buf, book_filename(start, end, fmt), FORMATS[fmt][0]
+
+def book_filename(start: date, end: date, fmt: str) -> str:
+    return f"diary_book_{start.isoformat()}_{end.isoformat()}{FORMATS[fmt][1]}"
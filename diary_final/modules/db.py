@@ -1,21 +1,409 @@
 # modules/db.py
 # 역할: SQLite 스키마 및 CRUD. 데이터는 항상 ./data/app.db 에 저장.
 # 테이블:
-#   diary(id PK, d TEXT ISO, text TEXT, mood TEXT, tags TEXT CSV, saved_at TEXT)
-#   memos(id PK, text TEXT, tags TEXT CSV, pinned INTEGER, created_at TEXT)
-#   todos(id PK, title TEXT, d TEXT ISO, due TEXT HH:MM, priority TEXT, done INTEGER, created_at TEXT)
+#   diary(id PK, d INTEGER 일 번호, text TEXT, mood INTEGER 1~5, tags TEXT CSV, saved_at TEXT) STRICT
+#   memos(id PK, text TEXT, tags TEXT CSV, pinned INTEGER, created_at TEXT) STRICT
+#   todos(id PK, title TEXT, d INTEGER 일 번호(NULL=날짜 없음), due TEXT HH:MM, priority INTEGER 1~3, done INTEGER, created_at TEXT) STRICT
+#   (일 번호 = 1970-01-01 부터의 일 수. 표시값 변환은 아래 "저장값 ↔ 표시값" 에서만 한다)
+#   todos.tags TEXT CSV (화면 표시/전문 검색용 사본, 태그 필터는 아래 정규화 테이블 사용)
+#   tags(id PK, name UNIQUE), entity_tags(kind, entity_id, tag_id): 항목-태그 연결 (kind: diary/memo/todo)
+#   diary_fts / memos_fts / todos_fts: FTS5(trigram) 외부 콘텐츠 색인, 트리거로 원본과 동기화
+#   export_state(name PK, marks TEXT JSON, exported_at TEXT): 증분 내보내기 기준 시각(watermark)
+#   sync_outbox(kind, key, op, ver, queued_at): 노션에 보낼 변경분 (트리거로 기록, 항목당 1행으로 합쳐짐)
+#   notion_pages(kind, key, page_id, synced_at): 로컬 항목 → 노션 페이지 id
+#   semantic_queue(kind, key, ver), semantic_slots(slot PK, kind, key): 의미 검색 색인 갱신 대기열/벡터 행 위치
+#   daily_stats(d PK, diaries, mood 1~5, text_len, word_cnt, todo_total, todo_done): 날짜별 집계 (트리거로 유지)
+#   jobs(id PK, kind, params JSON, status, done, total, message, result JSON, cancel, created_at, started_at, finished_at): 백그라운드 작업 (modules/jobs.py)
+#   diary_revisions(id PK, d, rev, base, saved_at, mood, tags, crc, text_len, body BLOB) STRICT: 일기 개정 이력 (추가만 함)
+#     body = zlib(본문) (base=rev, 전체본) 또는 zlib(JSON 변경분: 직전 개정 기준) — 아래 "일기 개정 이력" 참고
+#   diary.d 는 UNIQUE (idx_diary_day): 저장은 INSERT … ON CONFLICT(d) DO UPDATE
+#   diary / memos 의 snippet(앞 140자), body_len, has_more: 목록 화면용 사본 (쓰기 때 함께 저장, 본문 text 는 맨 끝 열)
+#   diary / memos / todos 의 updated_at TEXT: 마지막으로 바뀐 시각 (증분 내보내기 기준), export_tombstones(source, key, deleted_at): 지운 항목
 
-import sqlite3, csv, os
-from datetime import date, datetime, time
-from typing import List, Dict, Any, Optional
+import sqlite3, csv, os, queue, threading, functools, calendar, json, itertools, difflib, zlib
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Iterable, List, Dict, Any, Optional
 
-def get_conn(path: str) -> sqlite3.Connection:
-    conn = sqlite3.connect(path, check_same_thread=False)
+from modules import profiler
+
+# ---------- 연결 관리 ----------
+# WAL 모드에서는 읽기와 쓰기가 서로 막지 않으므로 읽기 연결 여러 개 + 쓰기 연결 1개로 나눈다.
+PRAGMAS = {
+    "busy_timeout": 5000,       # 다른 프로세스가 쓰는 중이면 5초까지 대기 (database is locked 방지)
+    "synchronous": "NORMAL",    # WAL 에서는 NORMAL 로도 손상 없이 안전, 커밋마다 fsync 하지 않음
+    "cache_size": -16000,       # 16MB 페이지 캐시
+    "mmap_size": 268435456,     # 256MB 메모리 맵 읽기
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",       # 연결마다 켜야 함. 꺼져 있으면 REFERENCES … ON DELETE CASCADE 가 무시된다 (app/ 의 doc_chunks)
+}
+
+class _Connection(sqlite3.Connection):
+    # 경로를 기억하고 약한 참조가 가능한 연결 (profiler 가 열린 연결을 추적해 켜고 끌 때 콜백을 붙이고 뗀다)
+    path = ""
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False, factory=_Connection)
+    conn.path = path
+    return conn
+
+def _configure(conn: sqlite3.Connection, readonly: bool = False) -> sqlite3.Connection:
     conn.row_factory = sqlite3.Row
+    for k, v in PRAGMAS.items():
+        conn.execute(f"PRAGMA {k}={v}")
+    if readonly:
+        conn.execute("PRAGMA query_only=1")
+    profiler.track(conn)
     return conn
 
-def init_schema(conn: sqlite3.Connection):
-    cur = conn.cursor()
+def get_conn(path: str) -> sqlite3.Connection:
+    # 단일 연결이 필요한 곳(스크립트/CLI)용. 앱에서는 get_pool 을 사용한다.
+    conn = _configure(_connect(path))
+    # 새 DB 파일에만 적용됨 (WAL 전환보다 먼저). 기존 DB 는 vacuum() 첫 실행 때 전환한다
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+class ConnectionPool:
+    """DB 파일 하나에 대한 프로세스 공용 연결 묶음: 쓰기 연결 1개(잠금으로 직렬화) + 읽기 연결 최대 max_readers개.
+    close() 는 연결만 닫고, 그 뒤에 다시 쓰면 필요한 연결을 새로 연다 (사용자별 DB 를 LRU 로 닫는 modules/shards.py)."""
+
+    def __init__(self, path: str, max_readers: int = 4, on_open: Optional[Callable[["ConnectionPool"], None]] = None):
+        self.path = path
+        self.max_readers = max_readers
+        self.on_open = on_open  # 닫힌 뒤 다시 열릴 때 호출
+        self._writer: Optional[sqlite3.Connection] = get_conn(path)
+        self._write_lock = threading.RLock()
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._opened = 0
+        self._writing = 0  # 쓰기 연결을 잡고 있는 깊이 (busy 확인용, 같은 스레드 재진입 포함)
+        self._epoch = 0  # close() 마다 증가. 닫히기 전에 빌려 간 읽기 연결은 돌려받을 때 닫는다
+        self._open_lock = threading.Lock()
+        # 메모리 DB는 연결마다 별개의 DB 이므로 읽기도 쓰기 연결로 처리
+        self._shared = path == ":memory:" or max_readers <= 0
+
+    def _get_writer(self) -> sqlite3.Connection:
+        # _write_lock 안에서 호출
+        if self._writer is None:
+            self._writer = get_conn(self.path)
+            if self.on_open:
+                self.on_open(self)
+        return self._writer
+
+    def _take_reader(self):
+        try:
+            return self._readers.get_nowait(), self._epoch
+        except queue.Empty:
+            pass
+        with self._open_lock:
+            if self._opened < self.max_readers:
+                self._opened += 1
+                return _configure(_connect(self.path), readonly=True), self._epoch
+        return self._readers.get(), self._epoch
+
+    @contextmanager
+    def read(self):
+        if self._shared:
+            with self.writer() as c:
+                yield c
+            return
+        c, epoch = self._take_reader()
+        try:
+            yield c
+        finally:
+            if c.in_transaction:
+                c.rollback()
+            if epoch == self._epoch:
+                self._readers.put(c)
+            else:
+                c.close()
+
+    @contextmanager
+    def writer(self):
+        # 쓰기 연결을 잡는다 (같은 스레드에서 재진입 가능). 트랜잭션은 _writing/transaction 이 연다.
+        with self._write_lock:
+            self._writing += 1
+            try:
+                yield self._get_writer()
+            finally:
+                self._writing -= 1
+
+    def busy(self) -> bool:
+        # 쓰기 중이거나 빌려 간 읽기 연결이 있으면 True (닫아도 되는지 확인용)
+        return self._writing > 0 or self._readers.qsize() < self._opened
+
+    def is_open(self) -> bool:
+        return self._writer is not None
+
+    def close(self):
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            with self._open_lock:
+                self._epoch += 1
+                self._opened = 0
+                while True:
+                    try:
+                        self._readers.get_nowait().close()
+                    except queue.Empty:
+                        break
+
+_POOLS: Dict[str, ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+def get_pool(path: str, max_readers: int = 4,
+             progress: Optional[Callable[[str, int, int], None]] = None) -> ConnectionPool:
+    # 프로세스당 경로별로 한 번만 만들고, 스키마 초기화/마이그레이션도 이때 한 번만 수행
+    key = os.path.abspath(path) if path != ":memory:" else path
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = ConnectionPool(path, max_readers=max_readers)
+            init_schema(pool, progress)
+            _POOLS[key] = pool
+        return pool
+
+def forget_pool(pool: ConnectionPool) -> bool:
+    # get_pool 의 등록을 푼다 (shards 가 LRU 로 밀어낸 사용자 풀). 다른 풀이 등록돼 있으면 그대로 둔다
+    key = os.path.abspath(pool.path) if pool.path != ":memory:" else pool.path
+    with _POOLS_LOCK:
+        if _POOLS.get(key) is not pool:
+            return False
+        del _POOLS[key]
+        return True
+
+@contextmanager
+def _reading(conn):
+    # conn 은 ConnectionPool 또는 sqlite3.Connection
+    if isinstance(conn, ConnectionPool):
+        with conn.read() as c:
+            yield c
+    else:
+        yield conn
+
+# ---------- 트랜잭션 ----------
+# 바깥 트랜잭션이 열려 있으면 안쪽 쓰기는 SAVEPOINT 로 참여하고, 커밋(fsync)은 바깥에서 한 번만 한다.
+_tx_state: Dict[int, Dict[str, Any]] = {}  # id(sqlite3.Connection) -> {"depth", "tables"}
+
+@contextmanager
+def _tx(c: sqlite3.Connection, conn, tables):
+    state = _tx_state.get(id(c))
+    if state is not None:
+        state["depth"] += 1
+        sp = f"sp{state['depth']}"
+        c.execute(f"SAVEPOINT {sp}")
+        try:
+            yield c
+        except BaseException:
+            c.execute(f"ROLLBACK TO {sp}")
+            c.execute(f"RELEASE {sp}")
+            raise
+        else:
+            c.execute(f"RELEASE {sp}")
+            state["tables"].update(tables)
+        finally:
+            state["depth"] -= 1
+        return
+    state = _tx_state[id(c)] = {"depth": 0, "tables": set(tables)}
+    try:
+        if not c.in_transaction:
+            c.execute("BEGIN IMMEDIATE")
+        yield c
+    except BaseException:
+        c.rollback()
+        raise
+    else:
+        c.commit()
+    finally:
+        del _tx_state[id(c)]
+        _bump(conn, state["tables"])
+
+@contextmanager
+def _writing(conn, *tables: str):
+    # tables: 이 쓰기가 바꾸는 테이블. 커밋 후 세대 번호를 올려 해당 캐시만 무효화한다.
+    if isinstance(conn, ConnectionPool):
+        with conn.writer() as c, _tx(c, conn, tables):
+            yield c
+    else:
+        with _tx(conn, conn, tables):
+            yield conn
+
+# 다른 모듈(export/sync/import 등)에서 직접 SQL 을 실행할 때 쓰는 공개 이름
+reading = _reading
+writing = _writing
+
+@contextmanager
+def transaction(conn):
+    # 여러 쓰기를 한 트랜잭션(한 번의 커밋)으로 묶는다. 안쪽의 db 쓰기 함수들은 같은 conn 을 넘기면 된다.
+    #   with db.transaction(conn):
+    #       db.add_memo(conn, ...); db.set_todo_done(conn, ...)
+    # 풀 사용 시 블록 안의 조회는 읽기 연결을 쓰므로 아직 커밋되지 않은 내용은 보이지 않는다.
+    with _writing(conn):
+        yield conn
+
+# ---------- 조회 캐시 ----------
+# (DB, 함수, 인자) → (읽을 당시 테이블 세대 번호들, 결과). 세대가 바뀌었으면 미스로 처리.
+CACHE_MAX = 256
+ALL_TABLES = ("diary", "memos", "todos", "tags")
+_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_gens: Dict[tuple, int] = {}
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+def _db_key(conn):
+    return os.path.abspath(conn.path) if isinstance(conn, ConnectionPool) and conn.path != ":memory:" else id(conn)
+
+def _bump(conn, tables):
+    if not tables:
+        return
+    dbk = _db_key(conn)
+    with _cache_lock:
+        for t in tables:
+            _gens[(dbk, t)] = _gens.get((dbk, t), 0) + 1
+        _cache_stats["invalidations"] += 1
+
+def invalidate(conn, *tables: str):
+    # db 함수 밖에서 직접 SQL로 쓴 경우 호출 (tables 생략 시 전체)
+    _bump(conn, tables or ALL_TABLES)
+
+def generations(conn, *tables: str) -> tuple:
+    # 테이블별 현재 세대 번호 (HTTP API 의 ETag 등 "바뀌었는지"만 알면 되는 곳에서 사용)
+    dbk = _db_key(conn)
+    with _cache_lock:
+        return tuple(_gens.get((dbk, t), 0) for t in (tables or ALL_TABLES))
+
+_data_versions: Dict[Any, int] = {}
+
+def check_external_writes(conn) -> bool:
+    # 다른 프로세스(예: Streamlit 앱과 API 서버)가 같은 DB 에 커밋했으면 이 프로세스의 캐시를 모두 무효화.
+    # 쓰기 연결의 PRAGMA data_version 은 "다른 연결"의 커밋에서만 바뀐다 (읽기 연결은 쓰지 않으므로 곧 다른 프로세스).
+    # 이 프로세스가 쓰는 중이면 기다리지 않고 다음 확인으로 미룬다.
+    if isinstance(conn, ConnectionPool):
+        if not conn._write_lock.acquire(blocking=False):
+            return False
+        try:
+            with conn.writer() as w:
+                ver = w.execute("PRAGMA data_version").fetchone()[0]
+        finally:
+            conn._write_lock.release()
+    else:
+        ver = conn.execute("PRAGMA data_version").fetchone()[0]
+    dbk = _db_key(conn)
+    prev = _data_versions.get(dbk)
+    _data_versions[dbk] = ver
+    if prev is None or prev == ver:
+        return False
+    invalidate(conn)
+    return True
+
+def _freeze(v):
+    if isinstance(v, (list, tuple, set)):
+        return tuple(_freeze(x) for x in v)
+    if isinstance(v, dict):
+        return tuple(sorted((k, _freeze(x)) for k, x in v.items()))
+    return v
+
+def _clone(v):
+    # 캐시에 든 결과를 호출자가 수정해도 캐시가 오염되지 않도록 복사해서 반환
+    if isinstance(v, list):
+        return [_clone(x) for x in v]
+    if isinstance(v, dict):
+        return {k: _clone(x) for k, x in v.items()}
+    if isinstance(v, tuple):
+        return tuple(_clone(x) for x in v)
+    return v
+
+def _cached(*tables: str):
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(conn, *args, **kwargs):
+            dbk = _db_key(conn)
+            key = (dbk, fn.__name__, _freeze(args), _freeze(kwargs))
+            with _cache_lock:
+                gens = tuple(_gens.get((dbk, t), 0) for t in tables)
+                hit = _cache.get(key)
+                if hit is not None and hit[0] == gens:
+                    _cache.move_to_end(key)
+                    _cache_stats["hits"] += 1
+                    return _clone(hit[1])
+                _cache_stats["misses"] += 1
+            val = fn(conn, *args, **kwargs)
+            with _cache_lock:
+                _cache[key] = (gens, val)
+                _cache.move_to_end(key)
+                while len(_cache) > CACHE_MAX:
+                    _cache.popitem(last=False)
+                    _cache_stats["evictions"] += 1
+            return _clone(val)
+        return wrapper
+    return deco
+
+def cache_stats() -> Dict[str, Any]:
+    with _cache_lock:
+        st = dict(_cache_stats, size=len(_cache), max=CACHE_MAX)
+    total = st["hits"] + st["misses"]
+    st["hit_rate"] = round(st["hits"] / total, 3) if total else 0.0
+    return st
+
+def cache_clear():
+    with _cache_lock:
+        _cache.clear()
+
+# ---------- 저장값 ↔ 표시값 ----------
+# 날짜는 정수 일 번호, 기분/우선순위는 작은 정수 코드로 저장한다.
+# 화면/검색/내보내기/노션 등 바깥으로 나가는 값은 모두 decode_row / display_sql 로 변환한다.
+EPOCH = date(1970, 1, 1)
+MOODS = {1: "😣", 2: "😕", 3: "😐", 4: "🙂", 5: "😄"}
+PRIORITIES = {1: "보통", 2: "높음", 3: "긴급"}
+MOOD_CODES = {v: k for k, v in MOODS.items()}
+PRIORITY_CODES = {v: k for k, v in PRIORITIES.items()}
+
+def day_num(d) -> Optional[int]:
+    # date 또는 ISO 문자열 → 일 번호
+    if d is None or d == "":
+        return None
+    if isinstance(d, str):
+        d = date.fromisoformat(d[:10])
+    return (d - EPOCH).days
+
+def day_iso(n: Optional[int]) -> Optional[str]:
+    return (EPOCH + timedelta(days=n)).isoformat() if n is not None else None
+
+def mood_code(mood) -> Optional[int]:
+    return mood if isinstance(mood, int) else MOOD_CODES.get(mood)
+
+def priority_code(priority) -> int:
+    return priority if isinstance(priority, int) else PRIORITY_CODES.get(priority, 1)
+
+def decode_row(row) -> Dict[str, Any]:
+    r = dict(row)
+    if "d" in r:
+        r["d"] = day_iso(r["d"])
+    if "mood" in r:
+        r["mood"] = MOODS.get(r["mood"])
+    if "priority" in r:
+        r["priority"] = PRIORITIES.get(r["priority"], "보통")
+    return r
+
+def display_sql(col: str, alias: str = "") -> str:
+    # decode_row 와 같은 변환의 SQL 식 (대량 내보내기, 표시값 LIKE 검색용)
+    ref = f"{alias}.{col}" if alias else col
+    if col == "d":
+        return f"date({ref} * 86400, 'unixepoch')"
+    labels = {"mood": MOODS, "priority": PRIORITIES}[col]
+    return f"CASE {ref} " + " ".join(f"WHEN {k} THEN '{v}'" for k, v in labels.items()) + " END"
+
+# ---------- 스키마 버전/마이그레이션 ----------
+# PRAGMA user_version = 마지막으로 적용한 단계 번호. 각 단계는 자기 트랜잭션 안에서 실행되므로
+# 도중에 실패하면 그 단계 전체가 롤백되고 다음 실행 때 다시 시도한다.
+MIGRATE_BATCH = 5000
+STRICT = " STRICT" if sqlite3.sqlite_version_info >= (3, 37, 0) else ""
+
+def _m1_base(cur, progress):
+    # 초기 스키마 (문자열 날짜/기분/우선순위)
     cur.execute("""
     CREATE TABLE IF NOT EXISTS diary(
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -25,7 +413,6 @@ def init_schema(conn: sqlite3.Connection):
         tags TEXT,
         saved_at TEXT
     )""")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_diary_d ON diary(d)")
     cur.execute("""
     CREATE TABLE IF NOT EXISTS memos(
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -34,7 +421,6 @@ def init_schema(conn: sqlite3.Connection):
         pinned INTEGER DEFAULT 0,
         created_at TEXT
     )""")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_memos_created ON memos(created_at)")
     cur.execute("""
     CREATE TABLE IF NOT EXISTS todos(
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -43,175 +429,1373 @@ def init_schema(conn: sqlite3.Connection):
         due TEXT,
         priority TEXT,
         done INTEGER DEFAULT 0,
-        created_at TEXT
+        created_at TEXT,
+        tags TEXT
     )""")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_todos_d ON todos(d)")
-    conn.commit()
+    if "tags" not in [r[1] for r in cur.execute("PRAGMA table_info(todos)")]:
+        cur.execute("ALTER TABLE todos ADD COLUMN tags TEXT")
 
-# ---------- 일기 ----------
-def upsert_diary(conn, d: date, text: str, mood: str, tags: List[str]):
-    cur = conn.cursor()
-    cur.execute("DELETE FROM diary WHERE d=?", (d.isoformat(),))
+# (테이블, 새 정의, 열 목록, 행 변환)
+_TYPED_TABLES = [
+    ("diary", """(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        d INTEGER NOT NULL,
+        text TEXT,
+        mood INTEGER,
+        tags TEXT,
+        saved_at TEXT
+    )""", ["id", "d", "text", "mood", "tags", "saved_at"],
+     lambda r: (r["id"], day_num(r["d"]), r["text"], mood_code(r["mood"]), r["tags"], r["saved_at"])),
+    ("memos", """(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        text TEXT,
+        tags TEXT,
+        pinned INTEGER NOT NULL DEFAULT 0,
+        created_at TEXT
+    )""", ["id", "text", "tags", "pinned", "created_at"],
+     lambda r: (r["id"], r["text"], r["tags"], int(r["pinned"] or 0), r["created_at"])),
+    ("todos", """(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT,
+        d INTEGER,
+        due TEXT,
+        priority INTEGER NOT NULL DEFAULT 1,
+        done INTEGER NOT NULL DEFAULT 0,
+        created_at TEXT,
+        tags TEXT
+    )""", ["id", "title", "d", "due", "priority", "done", "created_at", "tags"],
+     lambda r: (r["id"], r["title"], day_num(r["d"]), r["due"], priority_code(r["priority"]),
+                int(r["done"] or 0), r["created_at"], r["tags"])),
+]
+
+def _m2_typed(cur, progress):
+    # 새 테이블을 만들어 id 순으로 MIGRATE_BATCH 건씩 변환·복사한 뒤 바꿔 끼운다.
+    # DROP TABLE 은 트리거를 실행하지 않으므로 색인/태그/outbox 는 그대로, 트리거는 init_schema 가 다시 만든다.
+    total = sum(cur.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t, _, _, _ in _TYPED_TABLES)
+    done = 0
+    progress(done, total)
+    for table, ddl, cols, convert in _TYPED_TABLES:
+        seq = cur.execute("SELECT seq FROM sqlite_sequence WHERE name=?", (table,)).fetchone()
+        cur.execute(f"CREATE TABLE {table}_v2{ddl}{STRICT}")
+        insert = f"INSERT INTO {table}_v2({', '.join(cols)}) VALUES({', '.join(['?'] * len(cols))})"
+        last = 0
+        while True:
+            rows = cur.execute(f"SELECT * FROM {table} WHERE id > ? ORDER BY id LIMIT ?", (last, MIGRATE_BATCH)).fetchall()
+            if not rows:
+                break
+            cur.executemany(insert, [convert(r) for r in rows])
+            last = rows[-1]["id"]
+            done += len(rows)
+            progress(done, total)
+        cur.execute(f"DROP TABLE {table}")
+        cur.execute(f"ALTER TABLE {table}_v2 RENAME TO {table}")
+        if seq:
+            cur.execute("UPDATE sqlite_sequence SET seq=MAX(seq, ?) WHERE name=?", (seq[0], table))
+    # 날짜 키가 바뀌었으므로 집계는 새로 만든다 (_init_daily_stats 가 다시 채움)
+    cur.execute("DROP TABLE IF EXISTS daily_stats")
+
+def _m3_diary_unique(cur, progress):
+    # 같은 날짜 일기가 여럿이면 가장 나중 행만 남기고 날짜 유일 색인을 건다 (이후 저장은 ON CONFLICT 업서트).
+    # 지우는 행은 트리거가 색인/태그/집계를 정리한다. outbox 는 날짜 키라 'delete' 로 바뀌므로 남은 날짜는 되돌린다
+    dups = cur.execute("SELECT COUNT(*) FROM diary WHERE id NOT IN (SELECT MAX(id) FROM diary GROUP BY d)").fetchone()[0]
+    progress(0, dups)
+    if dups:
+        cur.execute("CREATE TEMP TABLE _dup_days AS SELECT DISTINCT d FROM diary WHERE id NOT IN (SELECT MAX(id) FROM diary GROUP BY d)")
+        cur.execute("DELETE FROM diary WHERE id NOT IN (SELECT MAX(id) FROM diary GROUP BY d)")
+        if cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='sync_outbox'").fetchone():
+            cur.execute(f"UPDATE sync_outbox SET op='upsert' WHERE kind='diary' AND key IN (SELECT {display_sql('d')} FROM temp._dup_days)")
+        cur.execute("DROP TABLE temp._dup_days")
+    cur.execute("DROP INDEX IF EXISTS idx_diary_d")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_diary_day ON diary(d)")
+    cur.execute(f"""CREATE TABLE IF NOT EXISTS diary_revisions(
+        id INTEGER PRIMARY KEY,
+        d INTEGER NOT NULL,
+        rev INTEGER NOT NULL,
+        base INTEGER NOT NULL,
+        saved_at TEXT,
+        mood INTEGER,
+        tags TEXT,
+        crc INTEGER NOT NULL,
+        text_len INTEGER NOT NULL,
+        body BLOB NOT NULL,
+        UNIQUE(d, rev)
+    ){STRICT}""")
+    progress(dups, dups)
+
+# 목록용 열: 본문 앞부분(snippet, 줄바꿈은 공백), 글자 수, 더 있는지. 쓰기 때 함께 저장한다.
+# 표에서 본문(text)보다 앞에 두므로 목록 조회는 행의 앞부분만 읽고 긴 본문의 overflow 페이지는 건드리지 않는다
+# (SQLite 는 필요한 열까지만 레코드를 읽는다. 가상 생성 열은 덮는 색인으로 쓰이지 않아 실제 열로 둔다)
+SNIPPET_LEN = 140
+LIST_COLS = ("snippet", "body_len", "has_more")
+
+def _list_sql(x: str) -> str:
+    # 본문 식 x → LIST_COLS 세 값의 SQL 식 (쓰기 문장과 마이그레이션이 같은 정의를 쓴다)
+    t = f"COALESCE({x}, '')"
+    return (f"substr(replace(replace({t}, char(13), ''), char(10), ' '), 1, {SNIPPET_LEN}), "
+            f"length({t}), length({t}) > {SNIPPET_LEN}")
+
+_LIST_UPSERT = ", ".join(f"{c}=excluded.{c}" for c in LIST_COLS)
+
+# (테이블, 새 정의, 열 목록) — 본문을 마지막 열로
+_LIST_TABLES = [
+    ("diary", """(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        d INTEGER NOT NULL,
+        mood INTEGER,
+        tags TEXT,
+        saved_at TEXT,
+        snippet TEXT NOT NULL DEFAULT '',
+        body_len INTEGER NOT NULL DEFAULT 0,
+        has_more INTEGER NOT NULL DEFAULT 0,
+        text TEXT
+    )""", ["id", "d", "mood", "tags", "saved_at", "text"]),
+    ("memos", """(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        pinned INTEGER NOT NULL DEFAULT 0,
+        created_at TEXT,
+        tags TEXT,
+        snippet TEXT NOT NULL DEFAULT '',
+        body_len INTEGER NOT NULL DEFAULT 0,
+        has_more INTEGER NOT NULL DEFAULT 0,
+        text TEXT
+    )""", ["id", "pinned", "created_at", "tags", "text"]),
+]
+
+def _m4_list_columns(cur, progress):
+    # 일기/메모를 목록용 열이 본문 앞에 오는 새 표로 옮긴다 (_m2_typed 와 같은 방식: id 순 배치 복사 후 바꿔 끼움)
+    total = sum(cur.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t, _, _ in _LIST_TABLES)
+    done = 0
+    progress(done, total)
+    for table, ddl, cols in _LIST_TABLES:
+        seq = cur.execute("SELECT seq FROM sqlite_sequence WHERE name=?", (table,)).fetchone()
+        cur.execute(f"CREATE TABLE {table}_v4{ddl}{STRICT}")
+        last = 0
+        while True:
+            row = cur.execute(f"SELECT MAX(id), COUNT(*) FROM (SELECT id FROM {table} WHERE id > ? ORDER BY id LIMIT ?)",
+                              (last, MIGRATE_BATCH)).fetchone()
+            if not row[1]:
+                break
+            cur.execute(f"INSERT INTO {table}_v4({', '.join(cols)}, {', '.join(LIST_COLS)}) "
+                        f"SELECT {', '.join(cols)}, {_list_sql('text')} FROM {table} WHERE id > ? AND id <= ?", (last, row[0]))
+            last = row[0]
+            done += row[1]
+            progress(done, total)
+        cur.execute(f"DROP TABLE {table}")
+        cur.execute(f"ALTER TABLE {table}_v4 RENAME TO {table}")
+        if seq:
+            cur.execute("UPDATE sqlite_sequence SET seq=MAX(seq, ?) WHERE name=?", (seq[0], table))
+
+def _m5_updated_at(cur, progress):
+    # 증분 내보내기용 수정 시각. 기존 행은 저장/작성 시각으로 채운다.
+    # 채우는 UPDATE 가 행마다 파생 트리거(FTS/노션 outbox 등)를 돌리지 않도록 먼저 떼어 둔다 (init_schema 가 다시 만든다)
+    sources = [("diary", "saved_at"), ("memos", "created_at"), ("todos", "created_at")]
+    total = sum(cur.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t, _ in sources)
+    done = 0
+    for table, base in sources:
+        for sqls in _derived_triggers(cur, table).values():
+            for name in sqls:
+                cur.execute(f"DROP TRIGGER {name}")
+        if "updated_at" not in [r[1] for r in cur.execute(f"PRAGMA table_info({table})")]:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN updated_at TEXT")
+        done += cur.execute(f"UPDATE {table} SET updated_at={base} WHERE updated_at IS NULL").rowcount
+        progress(done, total)
+
+def _m6_todo_due_order(cur, progress):
+    # 할 일 색인에 (due IS NULL) 을 더해 "마감 없음은 맨 뒤" 정렬을 색인 순서 그대로 읽는다.
+    # 같은 이름의 색인을 정의만 바꾸므로 지우기만 하고, 새 정의는 init_schema 가 만든다
+    cur.execute("DROP INDEX IF EXISTS idx_todos_day")
+    cur.execute("DROP INDEX IF EXISTS idx_todos_open")
+    progress(1, 1)
+
+MIGRATIONS = [
+    (1, "기본 테이블", _m1_base),
+    (2, "정수 날짜·기분·우선순위 코드 + STRICT 테이블", _m2_typed),
+    (3, "일기 날짜 유일 색인 + 개정 이력", _m3_diary_unique),
+    (4, "일기/메모 목록용 열(snippet, body_len, has_more)", _m4_list_columns),
+    (5, "수정 시각(updated_at) + 삭제 기록", _m5_updated_at),
+    (6, "할 일 색인: 마감 없음을 맨 뒤로", _m6_todo_due_order),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def schema_version(conn) -> int:
+    with _reading(conn) as c:
+        return c.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn, progress: Optional[Callable[[str, int, int], None]] = None) -> int:
+    # 밀린 단계를 차례로 적용하고 최종 버전을 반환. progress(단계 설명, 처리 행, 전체 행)
+    with _writing(conn) as c:
+        current = c.execute("PRAGMA user_version").fetchone()[0]
+    for ver, desc, step in MIGRATIONS:
+        if ver <= current:
+            continue
+        with _writing(conn, *ALL_TABLES) as c:
+            step(c.cursor(), lambda done, total, desc=desc: progress and progress(desc, done, total))
+            c.execute(f"PRAGMA user_version={ver}")
+        current = ver
+    return current
+
+def init_schema(conn, progress: Optional[Callable[[str, int, int], None]] = None):
+    migrate(conn, progress)
+    with _writing(conn, *ALL_TABLES) as c:
+        cur = c.cursor()
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_diary_day ON diary(d)")  # 3단계 마이그레이션이 중복을 정리한 뒤
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_memos_created ON memos(created_at)")
+        # 키셋 페이지: 보조 색인에는 rowid(id)가 뒤에 붙으므로 (pinned, created_at, id) / (d, id) 순서로 읽힌다
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_memos_page ON memos(pinned, created_at)")
+        # 날짜별 목록: d 한 값 안에서 (미완료 → 우선순위 높은 순 → 마감 시각, 마감 없음은 맨 뒤) 순서 그대로 읽힌다.
+        # 월간 개요의 done 집계도 색인만 읽음. ORDER BY 에도 같은 식(due IS NULL)을 써야 색인 순서가 쓰인다
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_todos_day ON todos(d, done, priority DESC, due IS NULL, due)")
+        cur.execute("DROP INDEX IF EXISTS idx_todos_d")  # idx_todos_day 가 같은 접두어로 대신함
+        # 일정(지난/다가오는/날짜 없음): 미완료만 담은 부분 색인이라 완료된 과거 할 일이 쌓여도 범위 조회가 작다
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_todos_open ON todos(d, priority DESC, due IS NULL, due) WHERE done=0")
+        # 증분 내보내기(updated_at 이후) 범위 조회용. 예전 saved_at/created_at 기준 색인은 대신함
+        for t in ("diary", "memos", "todos"):
+            cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{t}_updated ON {t}(updated_at)")
+        cur.execute("DROP INDEX IF EXISTS idx_diary_saved")
+        cur.execute("DROP INDEX IF EXISTS idx_todos_created")
+        cur.execute("CREATE TABLE IF NOT EXISTS export_state(name TEXT PRIMARY KEY, marks TEXT, exported_at TEXT)")
+        _init_tags(cur)
+        _init_fts(cur)
+        _init_outbox(cur)
+        _init_semantic_queue(cur)
+        _init_daily_stats(cur)
+        _init_export_tracking(cur)
+        cur.execute("""CREATE TABLE IF NOT EXISTS jobs(
+            id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, params TEXT, status TEXT NOT NULL DEFAULT 'queued',
+            done INTEGER NOT NULL DEFAULT 0, total INTEGER NOT NULL DEFAULT 0, message TEXT, result TEXT,
+            cancel INTEGER NOT NULL DEFAULT 0, created_at TEXT, started_at TEXT, finished_at TEXT)""")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, id)")
+
+# ---------- 전문 검색 색인(FTS5) ----------
+# 한국어는 공백 토큰화가 맞지 않으므로 trigram 토크나이저를 사용한다.
+# (색인 이름, 원본 테이블, 색인 컬럼)
+FTS_SOURCES = [
+    ("diary_fts", "diary", ["text", "tags"]),
+    ("memos_fts", "memos", ["text", "tags"]),
+    ("todos_fts", "todos", ["title"]),
+]
+# 검색 결과 snippet 의 강조 구간 표시 (UI에서 <mark>로 치환)
+HL_START, HL_END = "\x02", "\x03"
+
+def _init_fts(cur):
+    for fts, src, cols in FTS_SOURCES:
+        existed = cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (fts,)).fetchone()
+        try:
+            cur.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({', '.join(cols)}, "
+                        f"content='{src}', content_rowid='id', tokenize='trigram')")
+        except sqlite3.OperationalError:
+            return  # FTS5/trigram 미지원 SQLite: search_all 은 LIKE 검색으로 동작
+        new_vals = ", ".join(f"new.{c}" for c in cols)
+        old_vals = ", ".join(f"old.{c}" for c in cols)
+        col_list = ", ".join(cols)
+        cur.execute(f"""CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {src} BEGIN
+            INSERT INTO {fts}(rowid, {col_list}) VALUES (new.id, {new_vals});
+        END""")
+        cur.execute(f"""CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {src} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', old.id, {old_vals});
+        END""")
+        cur.execute(f"""CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {src} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', old.id, {old_vals});
+            INSERT INTO {fts}(rowid, {col_list}) VALUES (new.id, {new_vals});
+        END""")
+        if not existed:
+            # 기존 DB에 처음 색인을 붙이는 경우: 원본 테이블 전체로 재구축
+            cur.execute(f"INSERT INTO {fts}({fts}) VALUES('rebuild')")
+
+def rebuild_fts(conn):
+    with _writing(conn, *ALL_TABLES) as c:
+        cur = c.cursor()
+        for fts, _, _ in FTS_SOURCES:
+            cur.execute(f"INSERT INTO {fts}({fts}) VALUES('rebuild')")
+
+def _has_fts(cur) -> bool:
+    return cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='diary_fts'").fetchone() is not None
+
+# ---------- 태그 ----------
+# (kind, 원본 테이블): entity_tags.kind 값과 태그 CSV 사본을 가진 테이블
+TAG_SOURCES = [("diary", "diary"), ("memo", "memos"), ("todo", "todos")]
+
+def _init_tags(cur):
+    existed = cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='entity_tags'").fetchone()
+    cur.execute("CREATE TABLE IF NOT EXISTS tags(id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS entity_tags(
+        kind TEXT NOT NULL,
+        entity_id INTEGER NOT NULL,
+        tag_id INTEGER NOT NULL,
+        PRIMARY KEY(kind, entity_id, tag_id)
+    ) WITHOUT ROWID""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_entity_tags_tag ON entity_tags(tag_id, kind, entity_id)")
+    for kind, src in TAG_SOURCES:
+        cur.execute(f"""CREATE TRIGGER IF NOT EXISTS {src}_tags_ad AFTER DELETE ON {src} BEGIN
+            DELETE FROM entity_tags WHERE kind='{kind}' AND entity_id=old.id;
+        END""")
+    if not existed:
+        # 기존 DB: CSV tags 컬럼을 정규화 테이블로 옮긴다
+        for kind, src in TAG_SOURCES:
+            rows = cur.execute(f"SELECT id, tags FROM {src} WHERE tags IS NOT NULL AND tags != ''").fetchall()
+            for eid, csv_tags in rows:
+                _set_tags(cur, kind, eid, csv_tags.split(","))
+
+def _clean_tags(tags: List[str]) -> List[str]:
+    return list(dict.fromkeys(t.strip() for t in tags if t and t.strip()))
+
+def _set_tags(cur, kind: str, eid: int, tags: List[str]):
+    tags = _clean_tags(tags)
+    cur.execute("DELETE FROM entity_tags WHERE kind=? AND entity_id=?", (kind, eid))
+    if not tags:
+        return
+    cur.executemany("INSERT OR IGNORE INTO tags(name) VALUES(?)", [(t,) for t in tags])
     cur.execute(
-        "INSERT INTO diary(d, text, mood, tags, saved_at) VALUES(?,?,?,?,?)",
-        (d.isoformat(), text, mood, ",".join(tags), datetime.now().isoformat(timespec="seconds"))
+        f"INSERT OR IGNORE INTO entity_tags(kind, entity_id, tag_id) "
+        f"SELECT ?, ?, id FROM tags WHERE name IN ({','.join(['?']*len(tags))})",
+        [kind, eid, *tags]
     )
-    conn.commit()
 
+def _tag_filter(alias: str, kind: str, tags: List[str], mode: str = "AND"):
+    # 태그 → tag_id (UNIQUE 색인) → entity_id (idx_entity_tags_tag) 순서의 색인 조회
+    tags = _clean_tags(tags)
+    if not tags:
+        return "", []
+    sql = (f" AND {alias}.id IN (SELECT entity_id FROM entity_tags WHERE kind=? AND tag_id IN "
+           f"(SELECT id FROM tags WHERE name IN ({','.join(['?']*len(tags))}))")
+    params: List[Any] = [kind, *tags]
+    if mode == "AND":
+        sql += " GROUP BY entity_id HAVING COUNT(*)=?"
+        params.append(len(tags))
+    return sql + ")", params
+
+@_cached("tags")
+def tag_counts(conn, prefix: str = "", kind: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+    # 태그 자동완성/인기 태그: 접두어는 UNIQUE(name) 색인 범위 조회로 처리
+    sql = "SELECT t.name AS name, COUNT(*) AS cnt FROM tags t JOIN entity_tags et ON et.tag_id = t.id WHERE 1=1"
+    params: List[Any] = []
+    prefix = (prefix or "").strip()
+    if prefix:
+        sql += " AND t.name >= ? AND t.name < ?"
+        params += [prefix, prefix + "\U0010ffff"]
+    if kind:
+        sql += " AND et.kind = ?"
+        params.append(kind)
+    sql += " GROUP BY t.id ORDER BY cnt DESC, t.name ASC LIMIT ?"
+    params.append(limit)
+    with _reading(conn) as c:
+        return [dict(r) for r in c.execute(sql, params).fetchall()]
+
+# ---------- 동기화 변경 기록(outbox) ----------
+# (kind, 원본 테이블, 키 컬럼): 일기는 날짜, 메모/할 일은 id 로 노션 페이지와 연결
+OUTBOX_SOURCES = [("diary", "diary", "d"), ("memo", "memos", "id"), ("todo", "todos", "id")]
+_OUTBOX_NOW = "strftime('%Y-%m-%dT%H:%M:%f','now','localtime')"
+
+def _init_outbox(cur):
+    existed = cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='sync_outbox'").fetchone()
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS sync_outbox(
+        kind TEXT NOT NULL,
+        key TEXT NOT NULL,
+        op TEXT NOT NULL,
+        ver INTEGER NOT NULL DEFAULT 1,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        queued_at TEXT,
+        PRIMARY KEY(kind, key)
+    ) WITHOUT ROWID""")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS notion_pages(
+        kind TEXT NOT NULL,
+        key TEXT NOT NULL,
+        page_id TEXT NOT NULL,
+        synced_at TEXT,
+        PRIMARY KEY(kind, key)
+    ) WITHOUT ROWID""")
+    upsert = ("ON CONFLICT(kind, key) DO UPDATE SET op=excluded.op, queued_at=excluded.queued_at, "
+              "ver=sync_outbox.ver+1, attempts=0")
+    for kind, src, key in OUTBOX_SOURCES:
+        for ev, row, op in [("INSERT", "new", "upsert"), ("UPDATE", "new", "upsert"), ("DELETE", "old", "delete")]:
+            cur.execute(f"""CREATE TRIGGER IF NOT EXISTS {src}_outbox_{ev.lower()} AFTER {ev} ON {src} BEGIN
+                INSERT INTO sync_outbox(kind, key, op, queued_at) VALUES('{kind}', {_outbox_key(key, row)}, '{op}', {_OUTBOX_NOW}) {upsert};
+            END""")
+    if not existed:
+        # 기존 DB: 아직 노션에 보낸 적 없는 전체 항목을 대기열에 올린다
+        for kind, src, key in OUTBOX_SOURCES:
+            cur.execute(f"INSERT OR IGNORE INTO sync_outbox(kind, key, op, queued_at) "
+                        f"SELECT '{kind}', {_outbox_key(key, src)}, 'upsert', {_OUTBOX_NOW} FROM {src}")
+
+def _outbox_key(key: str, alias: str) -> str:
+    # 일기 키는 ISO 날짜 문자열 (저장 형식이 바뀌어도 노션 페이지 연결이 유지되도록)
+    return display_sql(key, alias) if key == "d" else f"{alias}.{key}"
+
+def outbox_rows(c, kind: str, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+    # outbox 키 → 표시값으로 바꾼 원본 행 (c: 읽기 연결)
+    src, key = next((s, k) for kd, s, k in OUTBOX_SOURCES if kd == kind)
+    params = [day_num(k) for k in keys] if key == "d" else keys
+    out: Dict[str, Dict[str, Any]] = {}
+    for i in range(0, len(params), 500):
+        part = params[i:i + 500]
+        for r in c.execute(f"SELECT * FROM {src} WHERE {key} IN ({','.join(['?'] * len(part))})", part):
+            row = decode_row(r)
+            out[str(row[key])] = row
+    return out
+
+# ---------- 증분 내보내기 추적 ----------
+# updated_at: db.py 의 쓰기 함수는 같은 문장에서 직접 채운다 (트리거가 다시 UPDATE 하면 FTS/outbox 트리거가 두 번 돈다).
+# 그 밖의 경로(직접 SQL 등)로 바뀐 행은 {src}_touch_update 트리거가 채운다. 지운 행은 export_tombstones 에 남긴다.
+# 키는 노션 outbox 와 같다: 일기는 ISO 날짜, 메모/할 일은 id
+_TOUCH_NOW = "strftime('%Y-%m-%dT%H:%M:%f','now','localtime')"
+
+def _init_export_tracking(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS export_tombstones(
+        source TEXT NOT NULL,
+        key TEXT NOT NULL,
+        deleted_at TEXT NOT NULL,
+        PRIMARY KEY(source, key)
+    ) WITHOUT ROWID""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_export_tombstones_at ON export_tombstones(deleted_at)")
+    for _, src, key in OUTBOX_SOURCES:
+        cur.execute(f"""CREATE TRIGGER IF NOT EXISTS {src}_touch_update AFTER UPDATE ON {src}
+            WHEN new.updated_at IS old.updated_at BEGIN
+            UPDATE {src} SET updated_at={_TOUCH_NOW} WHERE id=new.id;
+        END""")
+        cur.execute(f"""CREATE TRIGGER IF NOT EXISTS {src}_tombstone_delete AFTER DELETE ON {src} BEGIN
+            INSERT INTO export_tombstones(source, key, deleted_at) VALUES('{src}', {_outbox_key(key, 'old')}, {_TOUCH_NOW})
+            ON CONFLICT(source, key) DO UPDATE SET deleted_at=excluded.deleted_at;
+        END""")
+
+# 의미 검색 색인(modules/semantic.py)이 다시 임베딩할 일기/메모 id
+SEMANTIC_SOURCES = [("diary", "diary"), ("memo", "memos")]
+
+def _init_semantic_queue(cur):
+    existed = cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='semantic_queue'").fetchone()
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS semantic_queue(
+        kind TEXT NOT NULL,
+        key INTEGER NOT NULL,
+        ver INTEGER NOT NULL DEFAULT 1,
+        PRIMARY KEY(kind, key)
+    ) WITHOUT ROWID""")
+    cur.execute("CREATE TABLE IF NOT EXISTS semantic_slots(slot INTEGER PRIMARY KEY, kind TEXT, key INTEGER)")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_semantic_slots_key ON semantic_slots(kind, key)")
+    for kind, src in SEMANTIC_SOURCES:
+        for ev, row in [("INSERT", "new"), ("UPDATE", "new"), ("DELETE", "old")]:
+            cur.execute(f"""CREATE TRIGGER IF NOT EXISTS {src}_semantic_{ev.lower()} AFTER {ev} ON {src} BEGIN
+                INSERT INTO semantic_queue(kind, key) VALUES('{kind}', {row}.id)
+                ON CONFLICT(kind, key) DO UPDATE SET ver=semantic_queue.ver+1;
+            END""")
+    if not existed:
+        for kind, src in SEMANTIC_SOURCES:
+            cur.execute(f"INSERT OR IGNORE INTO semantic_queue(kind, key) SELECT '{kind}', id FROM {src}")
+
+# ---------- 일별 집계(daily_stats) ----------
+# 일기/할 일이 바뀔 때마다 트리거가 해당 날짜 한 줄만 다시 계산 (d 색인 범위 조회).
+# 타임라인/차트는 이 표만 읽으므로 긴 기간도 일기 본문을 불러오지 않는다.
+# 단어 수: 줄바꿈/탭을 공백으로 바꾸고 연속 공백을 줄인 뒤 공백 수 + 1 (근사치)
+_WS = ("replace(replace(replace(trim(replace(replace(replace(COALESCE(text,''), char(10), ' '), char(13), ' '), char(9), ' ')),"
+       " '    ', ' '), '   ', ' '), '  ', ' ')")
+_WORDS = f"CASE WHEN {_WS} = '' THEN 0 ELSE length({_WS}) - length(replace({_WS}, ' ', '')) + 1 END"
+_DIARY_STATS = f"COUNT(*), MAX(mood), COALESCE(SUM(length(text)), 0), COALESCE(SUM({_WORDS}), 0)"
+_TODO_STATS = "COUNT(*), COALESCE(SUM(done=1), 0)"
+
+# 집계 한 줄: 해당 날짜 행이 모두 지워졌으면 0/NULL 로 돌아간다 (d 가 NULL 인 할 일은 제외)
+def _diary_stats_sql(d: str) -> str:
+    return (f"INSERT INTO daily_stats(d, diaries, mood, text_len, word_cnt) "
+            f"SELECT * FROM (SELECT {d} AS d, {_DIARY_STATS} FROM diary WHERE d = {d}) WHERE d IS NOT NULL "
+            f"ON CONFLICT(d) DO UPDATE SET diaries=excluded.diaries, mood=excluded.mood, "
+            f"text_len=excluded.text_len, word_cnt=excluded.word_cnt")
+
+def _todo_stats_sql(d: str) -> str:
+    return (f"INSERT INTO daily_stats(d, todo_total, todo_done) "
+            f"SELECT * FROM (SELECT {d} AS d, {_TODO_STATS} FROM todos WHERE d = {d}) WHERE d IS NOT NULL "
+            f"ON CONFLICT(d) DO UPDATE SET todo_total=excluded.todo_total, todo_done=excluded.todo_done")
+
+def _init_daily_stats(cur):
+    existed = cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='daily_stats'").fetchone()
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS daily_stats(
+        d INTEGER PRIMARY KEY,
+        diaries INTEGER NOT NULL DEFAULT 0,
+        mood INTEGER,
+        text_len INTEGER NOT NULL DEFAULT 0,
+        word_cnt INTEGER NOT NULL DEFAULT 0,
+        todo_total INTEGER NOT NULL DEFAULT 0,
+        todo_done INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID""")
+    for src, stats_sql in [("diary", _diary_stats_sql), ("todos", _todo_stats_sql)]:
+        cur.execute(f"""CREATE TRIGGER IF NOT EXISTS {src}_stats_insert AFTER INSERT ON {src} BEGIN
+            {stats_sql("new.d")};
+        END""")
+        cur.execute(f"""CREATE TRIGGER IF NOT EXISTS {src}_stats_delete AFTER DELETE ON {src} BEGIN
+            {stats_sql("old.d")};
+        END""")
+        # 날짜가 옮겨진 경우까지 이전/새 날짜를 모두 다시 계산
+        cur.execute(f"""CREATE TRIGGER IF NOT EXISTS {src}_stats_update AFTER UPDATE ON {src} BEGIN
+            {stats_sql("old.d")};
+            {stats_sql("new.d")};
+        END""")
+    if not existed:
+        cur.execute(f"INSERT INTO daily_stats(d, diaries, mood, text_len, word_cnt) "
+                    f"SELECT d, {_DIARY_STATS} FROM diary WHERE d IS NOT NULL GROUP BY d")
+        cur.execute(f"INSERT INTO daily_stats(d, todo_total, todo_done) "
+                    f"SELECT d, {_TODO_STATS} FROM todos WHERE d IS NOT NULL GROUP BY d "
+                    f"ON CONFLICT(d) DO UPDATE SET todo_total=excluded.todo_total, todo_done=excluded.todo_done")
+
+def outbox_count(conn) -> int:
+    with _reading(conn) as c:
+        return c.execute("SELECT COUNT(*) FROM sync_outbox").fetchone()[0]
+
+# ---------- 키셋 페이지네이션 ----------
+# OFFSET 대신 "직전 페이지 마지막 행의 정렬 키" 다음부터 읽는다 (깊은 페이지도 색인 탐색 한 번).
+# 커서는 정렬 키 튜플, 다음 페이지가 없으면 None. limit+1 건을 읽어 다음 페이지 유무를 판단한다.
+PAGE_SIZE = 20
+
+def _page(rows, limit: int, key_cols):
+    rows = [dict(r) for r in rows]
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, tuple(rows[-1][k] for k in key_cols)
+
+# ---------- 일기 ----------
+def upsert_diary(conn, d: date, text: str, mood: str, tags: List[str]) -> bool:
+    # 날짜 유일 색인에 대한 업서트 (행 id·색인 항목 유지). 내용이 그대로면 아무것도 쓰지 않고 False.
+    # 바뀌었으면 같은 트랜잭션에서 개정 이력에 한 줄 추가
+    dn, text, csv_tags = day_num(d), text or "", ",".join(tags)
+    now = datetime.now().isoformat(timespec="seconds")
+    with _writing(conn, "diary", "tags") as c:
+        cur = c.cursor()
+        old = cur.execute("SELECT text, mood, tags, saved_at FROM diary WHERE d=?", (dn,)).fetchone()
+        if old is not None and (old["text"] or "", old["mood"], old["tags"] or "") == (text, mood_code(mood), csv_tags):
+            return False
+        eid = cur.execute(
+            f"INSERT INTO diary(d, text, mood, tags, saved_at, updated_at, {', '.join(LIST_COLS)}) "
+            f"VALUES(?1,?2,?3,?4,?5,{_TOUCH_NOW}, {_list_sql('?2')}) "
+            f"ON CONFLICT(d) DO UPDATE SET text=excluded.text, mood=excluded.mood, tags=excluded.tags, saved_at=excluded.saved_at, "
+            f"updated_at=excluded.updated_at, {_LIST_UPSERT} RETURNING id",
+            (dn, text, mood_code(mood), csv_tags, now)
+        ).fetchone()[0]
+        _set_tags(cur, "diary", eid, tags)
+        _add_revision(cur, dn, old, text, mood_code(mood), csv_tags, now)
+    return True
+
+@_cached("diary")
 def get_diary_for_date(conn, d: date) -> Dict[str, Any]:
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM diary WHERE d=?", (d.isoformat(),))
-    row = cur.fetchone()
-    if not row:
-        return {"date": d.isoformat(), "text":"", "mood":"🙂", "tags":[]}
-    return {"date": row["d"], "text": row["text"] or "", "mood": row["mood"] or "🙂", "tags": (row["tags"] or "").split(",") if row["tags"] else []}
+    with _reading(conn) as c:
+        cur = c.cursor()
+        cur.execute("SELECT * FROM diary WHERE d=?", (day_num(d),))
+        row = cur.fetchone()
+        if not row:
+            return {"date": d.isoformat(), "text":"", "mood":"🙂", "tags":[]}
+        row = decode_row(row)
+        return {"date": row["d"], "text": row["text"] or "", "mood": row["mood"] or "🙂", "tags": (row["tags"] or "").split(",") if row["tags"] else []}
 
 def get_diary_recent(conn, center: date, limit: int = 7) -> List[Dict[str, Any]]:
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM diary ORDER BY d DESC LIMIT ?", (limit,))
-    rows = cur.fetchall()
-    return [{"date": r["d"], "mood": r["mood"], "text": r["text"]} for r in rows]
+    return get_diary_page(conn, limit=limit)[0]
+
+# 목록 화면은 본문 대신 LIST_COLS 만 읽는다. 본문은 항목을 펼칠 때 get_diary_for_date / get_memo 로
+_DIARY_LIST = f"id, d, mood, tags, {', '.join(LIST_COLS)}"
+_MEMO_LIST = f"id, pinned, created_at, tags, {', '.join(LIST_COLS)}"
+
+@_cached("diary")
+def get_diary_page(conn, after: Optional[tuple] = None, limit: int = 7):
+    # 최신 일기부터 (d, id) 내림차순. after: 직전 페이지가 돌려준 커서. 본문은 snippet 만
+    sql, params = "SELECT id, d, mood, snippet, body_len, has_more FROM diary", []
+    if after:
+        sql += " WHERE (d, id) < (?, ?)"
+        params += list(after)
+    sql += " ORDER BY d DESC, id DESC LIMIT ?"
+    with _reading(conn) as c:
+        rows, nxt = _page(c.execute(sql, params + [limit + 1]).fetchall(), limit, ("d", "id"))
+    return [{"date": r["d"], "mood": r["mood"], "snippet": r["snippet"], "body_len": r["body_len"],
+             "has_more": bool(r["has_more"])} for r in map(decode_row, rows)], nxt
 
+@_cached("diary")
 def get_diaries_between(conn, start_d: date, end_d: date) -> List[Dict[str, Any]]:
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM diary WHERE d BETWEEN ? AND ? ORDER BY d ASC", (start_d.isoformat(), end_d.isoformat()))
-    return [dict(r) for r in cur.fetchall()]
+    with _reading(conn) as c:
+        cur = c.cursor()
+        cur.execute("SELECT * FROM diary WHERE d BETWEEN ? AND ? ORDER BY d ASC", (day_num(start_d), day_num(end_d)))
+        return [decode_row(r) for r in cur.fetchall()]
+
+@_cached("diary")
+def list_diaries_between(conn, start_d: date, end_d: date) -> List[Dict[str, Any]]:
+    # get_diaries_between 의 목록용 (타임라인): 본문 없이 snippet/body_len/has_more
+    with _reading(conn) as c:
+        rows = c.execute(f"SELECT {_DIARY_LIST} FROM diary WHERE d BETWEEN ? AND ? ORDER BY d ASC",
+                         (day_num(start_d), day_num(end_d))).fetchall()
+    return [dict(decode_row(r), has_more=bool(r["has_more"])) for r in rows]
+
+# ---------- 일기 개정 이력 ----------
+# 저장할 때마다 diary_revisions 에 한 줄 추가 (고치거나 지우지 않음). 본문은 직전 개정 대비 변경분만 zlib 으로 압축해 둔다.
+# - 변경분: JSON 목록. [시작, 끝] = 직전 본문의 그 구간 복사, 문자열 = 새로 들어간 글자
+#   앞뒤 공통 부분을 먼저 잘라내고 가운데만 difflib 로 비교한다 (자동 저장처럼 한 곳만 고치는 경우 거의 비용이 없다)
+# - REV_SNAPSHOT_EVERY 개정마다, 또는 변경분이 전체본보다 크면 전체본 (base = 자기 rev). 복원은 base 부터 차례로 적용
+# - 직전 개정의 crc 가 현재 행 본문과 다르면 (가져오기/bulk_add 등 이력 없이 바뀐 경우) 전체본으로 시작한다
+# - 이력이 생기기 전부터 있던 일기는 처음 고칠 때 이전 본문을 1번 개정으로 함께 남긴다
+REV_SNAPSHOT_EVERY = 20
+REV_DIFF_MAX = 4_000_000   # difflib 으로 비교할 가운데 구간 길이 곱의 상한. 넘으면 가운데를 통째로 새 글자로 둔다
+REV_MIN_COPY = 8           # 이보다 짧은 공통 구간은 복사 대신 글자로 (구간 표기가 더 길다)
+
+def _common_affix(old: str, new: str):
+    n = min(len(old), len(new))
+    p = 0
+    while p < n and old[p] == new[p]:
+        p += 1
+    s = 0
+    while s < n - p and old[-1 - s] == new[-1 - s]:
+        s += 1
+    return p, s
+
+def _text_delta(old: str, new: str) -> list:
+    p, s = _common_affix(old, new)
+    om, nm = old[p:len(old) - s], new[p:len(new) - s]
+    ops: list = []
+
+    def put(op):
+        if isinstance(op, str) and ops and isinstance(ops[-1], str):
+            ops[-1] += op
+        elif op:
+            ops.append(op)
+
+    if p:
+        put([0, p])
+    if om and nm and len(om) * len(nm) <= REV_DIFF_MAX:
+        for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, om, nm, autojunk=False).get_opcodes():
+            if tag == "equal" and i2 - i1 >= REV_MIN_COPY:
+                put([p + i1, p + i2])
+            elif tag != "delete":
+                put(nm[j1:j2])
+    else:
+        put(nm)
+    if s:
+        put([len(old) - s, len(old)])
+    return ops
+
+def _apply_delta(old: str, ops: list) -> str:
+    return "".join(old[o[0]:o[1]] if isinstance(o, list) else o for o in ops)
+
+def _crc(text: str) -> int:
+    return zlib.crc32(text.encode("utf-8"))
+
+def _add_revision(cur, dn: int, old, text: str, mood: Optional[int], csv_tags: str, saved_at: str):
+    # old: 이번 저장 전의 diary 행 (text, mood, tags, saved_at) 또는 None. upsert_diary 의 쓰기 트랜잭션 안에서 호출
+    last = cur.execute("SELECT rev, base, crc FROM diary_revisions WHERE d=? ORDER BY rev DESC LIMIT 1", (dn,)).fetchone()
+    old_text = (old["text"] or "") if old is not None else None
+    ins = ("INSERT INTO diary_revisions(d, rev, base, saved_at, mood, tags, crc, text_len, body) "
+           "VALUES(?,?,?,?,?,?,?,?,?)")
+    if last is None and old is not None:
+        cur.execute(ins, (dn, 1, 1, old["saved_at"], old["mood"], old["tags"], _crc(old_text), len(old_text),
+                          zlib.compress(old_text.encode("utf-8"))))
+        last = (1, 1, _crc(old_text))
+    rev = last[0] + 1 if last else 1
+    body, base = zlib.compress(text.encode("utf-8")), rev
+    if last is not None and old is not None and last[2] == _crc(old_text) and rev - last[1] < REV_SNAPSHOT_EVERY:
+        delta = zlib.compress(json.dumps(_text_delta(old_text, text), ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        if len(delta) < len(body):
+            body, base = delta, last[1]
+    cur.execute(ins, (dn, rev, base, saved_at, mood, csv_tags, _crc(text), len(text), body))
+
+@_cached("diary")
+def list_diary_revisions(conn, d: date) -> List[Dict[str, Any]]:
+    # 최신 개정부터. size = 저장된(압축) 바이트, full = 전체본 여부
+    with _reading(conn) as c:
+        rows = c.execute("SELECT rev, base, saved_at, mood, tags, text_len, length(body) AS size FROM diary_revisions "
+                         "WHERE d=? ORDER BY rev DESC", (day_num(d),)).fetchall()
+    return [{"rev": r["rev"], "saved_at": r["saved_at"], "mood": MOODS.get(r["mood"]),
+             "tags": r["tags"].split(",") if r["tags"] else [], "text_len": r["text_len"],
+             "size": r["size"], "full": r["base"] == r["rev"]} for r in rows]
+
+def get_diary_revision(conn, d: date, rev: int) -> Optional[Dict[str, Any]]:
+    # 해당 개정의 본문을 base 전체본부터 변경분을 차례로 적용해 되살린다 (최대 REV_SNAPSHOT_EVERY 줄)
+    dn = day_num(d)
+    with _reading(conn) as c:
+        rows = c.execute(
+            "SELECT rev, base, saved_at, mood, tags, crc, body FROM diary_revisions "
+            "WHERE d=? AND rev BETWEEN (SELECT base FROM diary_revisions WHERE d=? AND rev=?) AND ? ORDER BY rev",
+            (dn, dn, rev, rev)
+        ).fetchall()
+    if not rows:
+        return None
+    text = ""
+    for r in rows:
+        raw = zlib.decompress(r["body"]).decode("utf-8")
+        text = raw if r["base"] == r["rev"] else _apply_delta(text, json.loads(raw))
+    last = rows[-1]
+    if _crc(text) != last["crc"]:
+        raise ValueError(f"{day_iso(dn)} 일기의 {rev}번 개정을 복원할 수 없습니다 (이력 손상)")
+    return {"date": day_iso(dn), "rev": rev, "saved_at": last["saved_at"], "text": text,
+            "mood": MOODS.get(last["mood"]), "tags": last["tags"].split(",") if last["tags"] else []}
+
+def restore_diary_revision(conn, d: date, rev: int) -> bool:
+    # 예전 개정을 현재 일기로 되돌린다. 이력은 지우지 않고 복원도 새 개정으로 쌓인다
+    r = get_diary_revision(conn, d, rev)
+    if r is None:
+        raise ValueError(f"{d} 일기에 {rev}번 개정이 없습니다")
+    return upsert_diary(conn, d, r["text"], r["mood"], r["tags"])
 
 # ---------- 메모 ----------
-def add_memo(conn, text: str, tags: List[str], pinned: bool):
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO memos(text, tags, pinned, created_at) VALUES(?,?,?,?)",
-        (text, ",".join(tags), 1 if pinned else 0, datetime.now().isoformat(timespec="seconds"))
-    )
-    conn.commit()
+def add_memo(conn, text: str, tags: List[str], pinned: bool) -> int:
+    with _writing(conn, "memos", "tags") as c:
+        cur = c.cursor()
+        cur.execute(
+            f"INSERT INTO memos(text, tags, pinned, created_at, updated_at, {', '.join(LIST_COLS)}) "
+            f"VALUES(?1,?2,?3,?4,{_TOUCH_NOW}, {_list_sql('?1')})",
+            (text, ",".join(tags), 1 if pinned else 0, datetime.now().isoformat(timespec="seconds"))
+        )
+        mid = cur.lastrowid  # _set_tags 의 tags INSERT 가 lastrowid 를 바꾸므로 먼저 잡아 둔다
+        _set_tags(cur, "memo", mid, tags)
+    return mid
 
 def update_memo(conn, mid: int, text: str, tags: List[str], pinned: bool):
-    cur = conn.cursor()
-    cur.execute(
-        "UPDATE memos SET text=?, tags=?, pinned=? WHERE id=?",
-        (text, ",".join(tags), 1 if pinned else 0, mid)
-    )
-    conn.commit()
+    with _writing(conn, "memos", "tags") as c:
+        cur = c.cursor()
+        cur.execute(
+            f"UPDATE memos SET text=?1, tags=?2, pinned=?3, updated_at={_TOUCH_NOW}, "
+            f"({', '.join(LIST_COLS)}) = ({_list_sql('?1')}) WHERE id=?4",
+            (text, ",".join(tags), 1 if pinned else 0, mid)
+        )
+        _set_tags(cur, "memo", mid, tags)
 
 def delete_memo(conn, mid: int):
-    cur = conn.cursor()
-    cur.execute("DELETE FROM memos WHERE id=?", (mid,))
-    conn.commit()
+    with _writing(conn, "memos", "tags") as c:
+        cur = c.cursor()
+        cur.execute("DELETE FROM memos WHERE id=?", (mid,))
 
 def list_memos(conn, limit: int = 20) -> List[Dict[str, Any]]:
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM memos ORDER BY pinned DESC, created_at DESC LIMIT ?", (limit,))
-    return [dict(r) for r in cur.fetchall()]
+    return list_memos_page(conn, limit=limit)[0]
+
+@_cached("memos")
+def get_memo(conn, mid: int) -> Optional[Dict[str, Any]]:
+    # 본문 포함 (펼치기/수정)
+    with _reading(conn) as c:
+        row = c.execute("SELECT * FROM memos WHERE id=?", (mid,)).fetchone()
+    return dict(row) if row else None
+
+@_cached("memos")
+def list_memos_page(conn, after: Optional[tuple] = None, limit: int = 20):
+    # 고정 메모 먼저, 최신순 (pinned, created_at, id) 내림차순. 본문은 snippet 만 (전체는 get_memo)
+    sql, params = f"SELECT {_MEMO_LIST} FROM memos", []
+    if after:
+        sql += " WHERE (pinned, created_at, id) < (?, ?, ?)"
+        params += list(after)
+    sql += " ORDER BY pinned DESC, created_at DESC, id DESC LIMIT ?"
+    with _reading(conn) as c:
+        return _page(c.execute(sql, params + [limit + 1]).fetchall(), limit, ("pinned", "created_at", "id"))
 
 # ---------- 할 일 ----------
-def add_todo(conn, title: str, d: date, due: Optional[time], priority: str):
+def add_todo(conn, title: str, d: Optional[date], due: Optional[time], priority: str, tags: Optional[List[str]] = None) -> int:
+    # d=None 이면 날짜 없는 할 일 (일정의 "날짜 없음" 목록)
     due_str = due.strftime("%H:%M") if due else None
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO todos(title, d, due, priority, done, created_at) VALUES(?,?,?,?,0,?)",
-        (title, d.isoformat(), due_str, priority, datetime.now().isoformat(timespec="seconds"))
-    )
-    conn.commit()
+    tags = tags or []
+    with _writing(conn, "todos", "tags") as c:
+        cur = c.cursor()
+        cur.execute(
+            f"INSERT INTO todos(title, d, due, priority, done, created_at, tags, updated_at) VALUES(?,?,?,?,0,?,?,{_TOUCH_NOW})",
+            (title, day_num(d), due_str, priority_code(priority), datetime.now().isoformat(timespec="seconds"), ",".join(tags))
+        )
+        tid = cur.lastrowid  # add_memo 와 같이 태그 쓰기 전에 잡아 둔다
+        _set_tags(cur, "todo", tid, tags)
+    return tid
 
-def update_todo(conn, tid: int, title: str, due: Optional[time], priority: str):
+def update_todo(conn, tid: int, title: str, due: Optional[time], priority: str, tags: Optional[List[str]] = None):
+    # tags=None 이면 기존 태그 유지
     due_str = due.strftime("%H:%M") if due else None
-    cur = conn.cursor()
-    cur.execute(
-        "UPDATE todos SET title=?, due=?, priority=? WHERE id=?",
-        (title, due_str, priority, tid)
-    )
-    conn.commit()
+    with _writing(conn, "todos", "tags") as c:
+        cur = c.cursor()
+        cur.execute(
+            f"UPDATE todos SET title=?, due=?, priority=?, updated_at={_TOUCH_NOW} WHERE id=?",
+            (title, due_str, priority_code(priority), tid)
+        )
+        if tags is not None:
+            cur.execute(f"UPDATE todos SET tags=?, updated_at={_TOUCH_NOW} WHERE id=?", (",".join(tags), tid))
+            _set_tags(cur, "todo", tid, tags)
 
 def set_todo_done(conn, tid: int, val: bool):
-    cur = conn.cursor()
-    cur.execute("UPDATE todos SET done=? WHERE id=?", (1 if val else 0, tid))
-    conn.commit()
+    with _writing(conn, "todos") as c:
+        cur = c.cursor()
+        cur.execute(f"UPDATE todos SET done=?, updated_at={_TOUCH_NOW} WHERE id=?", (1 if val else 0, tid))
 
 def delete_todo(conn, tid: int):
-    cur = conn.cursor()
-    cur.execute("DELETE FROM todos WHERE id=?", (tid,))
-    conn.commit()
+    with _writing(conn, "todos", "tags") as c:
+        cur = c.cursor()
+        cur.execute("DELETE FROM todos WHERE id=?", (tid,))
 
+@_cached("todos")
 def list_todos_for_date(conn, d: date) -> List[Dict[str, Any]]:
-    pri_map = {"긴급":3,"높음":2,"보통":1}
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM todos WHERE d=?",(d.isoformat(),))
-    rows = [dict(r) for r in cur.fetchall()]
-    rows.sort(key=lambda t: (t["done"], -(pri_map.get(t["priority"],1)), t["due"] or "99:99"))
-    return rows
+    # 미완료 → 우선순위 코드 높은 순 → 마감 시각 순 (마감 없음은 맨 뒤). idx_todos_day 순서 그대로 읽힌다 (정렬 없음)
+    with _reading(conn) as c:
+        cur = c.cursor()
+        cur.execute("SELECT * FROM todos WHERE d=? ORDER BY done ASC, priority DESC, due IS NULL, due ASC, id ASC",
+                    (day_num(d),))
+        return [decode_row(r) for r in cur.fetchall()]
+
+# ---------- 일정(agenda) ----------
+# 미완료 할 일을 날짜 구간별로: 지난 것(overdue) / 다가오는 AGENDA_DAYS 일(upcoming) / 날짜 없음(backlog).
+# 구간마다 idx_todos_open 범위 조회 한 번 (d 범위 → 우선순위 → 마감 시각 순, 마감 없음은 날짜별 목록처럼 맨 뒤. 색인에서 바로 읽힌다).
+# 통계(ANALYZE)가 없으면 플래너가 완료 행까지 담은 idx_todos_day 를 고르기도 하므로 INDEXED BY 로 고정한다
+AGENDA_DAYS = 7
+AGENDA_SQL = {
+    "overdue": "d < ?",
+    "upcoming": "d > ? AND d <= ?",
+    "backlog": "d IS NULL",
+}
+
+@_cached("todos")
+def get_agenda(conn, today: date, days: int = AGENDA_DAYS, limit: int = 50) -> Dict[str, List[Dict[str, Any]]]:
+    # today 자체의 할 일은 날짜별 목록(list_todos_for_date)에 있으므로 upcoming 은 내일부터
+    t = day_num(today)
+    params = {"overdue": [t], "upcoming": [t, t + days], "backlog": []}
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    with _reading(conn) as c:
+        for key, where in AGENDA_SQL.items():
+            rows = c.execute(f"SELECT * FROM todos INDEXED BY idx_todos_open WHERE done=0 AND {where} "
+                             f"ORDER BY d ASC, priority DESC, due IS NULL, due ASC, id ASC LIMIT ?", params[key] + [limit]).fetchall()
+            out[key] = [decode_row(r) for r in rows]
+    return out
+
+@_cached("todos")
+def agenda_counts(conn, today: date, days: int = AGENDA_DAYS) -> Dict[str, int]:
+    # 탭/배지용 개수. 세 구간을 색인만으로 센다
+    t = day_num(today)
+    with _reading(conn) as c:
+        row = c.execute("""
+        SELECT (SELECT COUNT(*) FROM todos INDEXED BY idx_todos_open WHERE done=0 AND d < ?) AS overdue,
+               (SELECT COUNT(*) FROM todos INDEXED BY idx_todos_open WHERE done=0 AND d > ? AND d <= ?) AS upcoming,
+               (SELECT COUNT(*) FROM todos INDEXED BY idx_todos_open WHERE done=0 AND d IS NULL) AS backlog""",
+                        (t, t, t + days)).fetchone()
+    return dict(row)
 
+@_cached("todos")
 def get_todo_summary_between(conn, start_d: date, end_d: date) -> List[Dict[str, Any]]:
-    cur = conn.cursor()
-    cur.execute("""
-    SELECT d,
-           SUM(CASE WHEN done=1 THEN 1 ELSE 0 END) AS done_cnt,
-           COUNT(*) AS total_cnt
-    FROM todos
-    WHERE d BETWEEN ? AND ?
-    GROUP BY d ORDER BY d ASC
-    """, (start_d.isoformat(), end_d.isoformat()))
-    return [dict(r) for r in cur.fetchall()]
+    with _reading(conn) as c:
+        cur = c.cursor()
+        cur.execute("""
+        SELECT d, todo_done AS done_cnt, todo_total AS total_cnt
+        FROM daily_stats
+        WHERE d BETWEEN ? AND ? AND todo_total > 0
+        ORDER BY d ASC
+        """, (day_num(start_d), day_num(end_d)))
+        return [decode_row(r) for r in cur.fetchall()]
+
+# ---------- 월간 개요(캘린더) ----------
+def _shift_month(year: int, month: int, delta: int):
+    m = year * 12 + (month - 1) + delta
+    return m // 12, m % 12 + 1
+
+@_cached("diary", "todos")
+def get_month_overview(conn, year: int, month: int) -> Dict[str, Dict[str, Any]]:
+    # 날짜(ISO) → {has_diary, mood, open_cnt, done_cnt}. 일기/할 일 모두 d 색인 범위 조회 한 번.
+    start = day_num(date(year, month, 1))
+    end = day_num(date(year, month, calendar.monthrange(year, month)[1]))
+    sql = """
+    SELECT d, MAX(has_diary) AS has_diary, MAX(mood) AS mood,
+           SUM(open_cnt) AS open_cnt, SUM(done_cnt) AS done_cnt
+    FROM (
+        SELECT d, 1 AS has_diary, mood, 0 AS open_cnt, 0 AS done_cnt
+        FROM diary WHERE d BETWEEN ? AND ?
+        UNION ALL
+        SELECT d, 0, NULL, SUM(done=0), SUM(done=1)
+        FROM todos WHERE d BETWEEN ? AND ? GROUP BY d
+    )
+    GROUP BY d
+    """
+    with _reading(conn) as c:
+        rows = c.execute(sql, (start, end, start, end)).fetchall()
+    return {r["d"]: {"has_diary": bool(r["has_diary"]), "mood": r["mood"],
+                     "open_cnt": r["open_cnt"], "done_cnt": r["done_cnt"]} for r in map(decode_row, rows)}
+
+_prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-prefetch")
+
+def prefetch_month_overview(conn, year: int, month: int):
+    # 앞/뒤 달 개요를 미리 캐시에 올려 ◀/▶ 이동을 즉시 처리. 풀은 백그라운드에서, 단일 연결은 바로 조회.
+    for delta in (-1, 1):
+        y, m = _shift_month(year, month, delta)
+        if isinstance(conn, ConnectionPool):
+            _prefetcher.submit(get_month_overview, conn, y, m)
+        else:
+            get_month_overview(conn, y, m)
+
+# ---------- 기간 통계(타임라인/차트) ----------
+# bucket: day / week(월요일 시작) / month. 구간 시작 날짜를 d 로 돌려준다.
+# 일 번호 0(1970-01-01)은 목요일이므로 (d + 3) % 7 이 월요일 기준 요일 번호.
+STATS_BUCKETS = {
+    "day": "d",
+    "week": "d - (d + 3) % 7",
+    "month": "CAST(strftime('%s', d * 86400, 'unixepoch', 'start of month') AS INTEGER) / 86400",
+}
+
+@_cached("diary", "todos")
+def get_daily_stats(conn, start_d: Optional[date] = None, end_d: Optional[date] = None, bucket: str = "day") -> List[Dict[str, Any]]:
+    # daily_stats 만 읽는다. 기분은 일기가 있는 날의 평균, 나머지는 합계. 기간 생략 시 전체.
+    key = STATS_BUCKETS[bucket]
+    sql = f"""
+    SELECT {key} AS d, SUM(diaries) AS diaries, ROUND(AVG(mood), 2) AS mood,
+           SUM(text_len) AS text_len, SUM(word_cnt) AS word_cnt,
+           SUM(todo_total) AS todo_total, SUM(todo_done) AS todo_done
+    FROM daily_stats WHERE (diaries > 0 OR todo_total > 0)"""
+    params: List[Any] = []
+    if start_d:
+        sql += " AND d >= ?"
+        params.append(day_num(start_d))
+    if end_d:
+        sql += " AND d <= ?"
+        params.append(day_num(end_d))
+    sql += f" GROUP BY {key} ORDER BY 1 ASC"
+    with _reading(conn) as c:
+        return [dict(r, d=day_iso(r["d"])) for r in c.execute(sql, params).fetchall()]
+
+# ---------- 일괄 작업 ----------
+# 여러 행을 executemany 로 한 트랜잭션에서 처리 (행마다 커밋하지 않음)
+def bulk_set_todo_done(conn, ids: List[int], val: bool) -> int:
+    with _writing(conn, "todos") as c:
+        c.executemany(f"UPDATE todos SET done=?, updated_at={_TOUCH_NOW} WHERE id=?", [(1 if val else 0, tid) for tid in ids])
+    return len(ids)
+
+def move_todos(conn, ids: List[int], new_d: date) -> int:
+    with _writing(conn, "todos") as c:
+        c.executemany(f"UPDATE todos SET d=?, updated_at={_TOUCH_NOW} WHERE id=?", [(day_num(new_d), tid) for tid in ids])
+    return len(ids)
+
+def bulk_delete_todos(conn, ids: List[int]) -> int:
+    with _writing(conn, "todos", "tags") as c:
+        c.executemany("DELETE FROM todos WHERE id=?", [(tid,) for tid in ids])
+    return len(ids)
+
+def bulk_delete_memos(conn, ids: List[int]) -> int:
+    with _writing(conn, "memos", "tags") as c:
+        c.executemany("DELETE FROM memos WHERE id=?", [(mid,) for mid in ids])
+    return len(ids)
+
+# 표 편집(apply_edits) 에서 바꿀 수 있는 열 → 표시값을 저장값으로
+def _due_str(due) -> Optional[str]:
+    return due.strftime("%H:%M") if isinstance(due, time) else (due or None)
+
+_EDIT_COLS: Dict[str, Dict[str, Callable[[Any], Any]]] = {
+    "todos": {"title": str, "d": day_num, "due": _due_str, "priority": priority_code,
+              "done": lambda v: 1 if v else 0, "tags": lambda v: _tag_csv(v)},
+    "memos": {"text": str, "pinned": lambda v: 1 if v else 0, "tags": lambda v: _tag_csv(v)},
+}
+
+def apply_edits(conn, kind: str, added: List[Dict[str, Any]], updated: Dict[int, Dict[str, Any]],
+                deleted: List[int]) -> Dict[str, int]:
+    # 표(data_editor) 편집 결과를 한 트랜잭션(커밋 1회)으로 반영. kind: "todos" | "memos"
+    #   added: bulk_add 와 같은 표시값 행 / updated: {id: 바뀐 열만} / deleted: id 목록
+    # 수정은 바뀐 열 조합마다 executemany 한 번 (행마다 UPDATE 문을 새로 만들지 않음)
+    cols = _EDIT_COLS[kind]
+    tag_kind = {"todos": "todo", "memos": "memo"}[kind]
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for eid, changes in updated.items():
+        unknown = set(changes) - set(cols)
+        if unknown:
+            raise ValueError(f"수정할 수 없는 열: {', '.join(sorted(unknown))}")
+        if changes:
+            groups.setdefault(tuple(sorted(changes)), []).append({"id": eid, **{c: cols[c](v) for c, v in changes.items()}})
+    with _writing(conn, kind, "tags") as c:
+        if deleted:
+            (bulk_delete_todos if kind == "todos" else bulk_delete_memos)(conn, deleted)
+        cur = c.cursor()
+        for names, rows in groups.items():
+            sets = [f"{n}=:{n}" for n in names] + [f"updated_at={_TOUCH_NOW}"]
+            if "text" in names:
+                sets.append(f"({', '.join(LIST_COLS)}) = ({_list_sql(':text')})")
+            cur.executemany(f"UPDATE {kind} SET {', '.join(sets)} WHERE id=:id", rows)
+            if "tags" in names:
+                _bulk_set_tags(cur, tag_kind, [(r["id"], r["tags"].split(",") if r["tags"] else []) for r in rows])
+        if added:
+            bulk_add(conn, kind, added)
+    return {"added": len(added), "updated": sum(map(len, groups.values())), "deleted": len(deleted)}
+
+def _next_ids(cur, table: str, n: int) -> List[int]:
+    # AUTOINCREMENT 테이블의 다음 id n개 (쓰기 트랜잭션 안에서 호출)
+    row = cur.execute(
+        f"SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name=?), 0), COALESCE((SELECT MAX(id) FROM {table}), 0))",
+        (table,)
+    ).fetchone()
+    return list(range(row[0] + 1, row[0] + 1 + n))
+
+def _bulk_set_tags(cur, kind: str, pairs: List[tuple], replace: bool = True):
+    # pairs: [(entity_id, [태그,...]), ...] — 기존 연결은 교체 (replace=False: 방금 만든 행이라 지울 연결 없음)
+    pairs = [(eid, _clean_tags(tags or [])) for eid, tags in pairs]
+    if replace:
+        cur.executemany("DELETE FROM entity_tags WHERE kind=? AND entity_id=?", [(kind, eid) for eid, _ in pairs])
+    names = list(dict.fromkeys(t for _, tags in pairs for t in tags))
+    if not names:
+        return
+    cur.executemany("INSERT OR IGNORE INTO tags(name) VALUES(?)", [(t,) for t in names])
+    tag_ids: Dict[str, int] = {}
+    for i in range(0, len(names), 500):
+        chunk = names[i:i + 500]
+        for tid, name in cur.execute(f"SELECT id, name FROM tags WHERE name IN ({','.join(['?']*len(chunk))})", chunk):
+            tag_ids[name] = tid
+    cur.executemany(
+        "INSERT OR IGNORE INTO entity_tags(kind, entity_id, tag_id) VALUES(?,?,?)",
+        [(kind, eid, tag_ids[t]) for eid, tags in pairs for t in tags]
+    )
+
+def bulk_add(conn, kind: str, rows: List[Dict[str, Any]]) -> int:
+    # kind: "diary" | "memos" | "todos". rows 의 키는 단건 함수 인자와 같다.
+    #   diary: d, text, mood, tags (같은 날짜는 덮어씀)  memos: text, tags, pinned  todos: title, d, due, priority, tags, done
+    if not rows:
+        return 0
+    now = datetime.now().isoformat(timespec="seconds")
+    tag_kind = {"diary": "diary", "memos": "memo", "todos": "todo"}[kind]
+    with _writing(conn, kind, "tags") as c:
+        cur = c.cursor()
+        if kind == "diary":
+            # 날짜 유일 색인 업서트 (같은 날짜는 마지막 행). 개정 이력은 남기지 않는다 (다음 upsert_diary 가 전체본으로 시작)
+            last = {day_num(r["d"]): r for r in rows}
+            cur.executemany(
+                f"INSERT INTO diary(d, text, mood, tags, saved_at, updated_at, {', '.join(LIST_COLS)}) "
+                f"VALUES(?1,?2,?3,?4,?5,{_TOUCH_NOW}, {_list_sql('?2')}) "
+                f"ON CONFLICT(d) DO UPDATE SET text=excluded.text, mood=excluded.mood, tags=excluded.tags, saved_at=excluded.saved_at, "
+                f"updated_at=excluded.updated_at, {_LIST_UPSERT}",
+                [(dn, r.get("text", ""), mood_code(r.get("mood", "🙂")), ",".join(r.get("tags") or []), now) for dn, r in last.items()]
+            )
+            days = list(last)
+            for i in range(0, len(days), 500):
+                part = days[i:i + 500]
+                ids = dict(cur.execute(f"SELECT d, id FROM diary WHERE d IN ({','.join(['?'] * len(part))})", part).fetchall())
+                _bulk_set_tags(cur, "diary", [(ids[dn], last[dn].get("tags")) for dn in part])
+            return len(rows)
+        ids = _next_ids(cur, kind, len(rows))
+        if kind == "memos":
+            cur.executemany(
+                f"INSERT INTO memos(id, text, tags, pinned, created_at, updated_at, {', '.join(LIST_COLS)}) "
+                f"VALUES(?1,?2,?3,?4,?5,{_TOUCH_NOW}, {_list_sql('?2')})",
+                [(i, r["text"], ",".join(r.get("tags") or []), 1 if r.get("pinned") else 0, now) for i, r in zip(ids, rows)]
+            )
+        else:
+            cur.executemany(
+                f"INSERT INTO todos(id, title, d, due, priority, done, created_at, tags, updated_at) VALUES(?,?,?,?,?,?,?,?,{_TOUCH_NOW})",
+                [(i, r["title"], day_num(r["d"]), r["due"].strftime("%H:%M") if r.get("due") else None,
+                  priority_code(r.get("priority") or "보통"), 1 if r.get("done") else 0, now, ",".join(r.get("tags") or []))
+                 for i, r in zip(ids, rows)]
+            )
+        _bulk_set_tags(cur, tag_kind, [(i, r.get("tags")) for i, r in zip(ids, rows)])
+    return len(rows)
+
+# ---------- 대량 가져오기(업서트) ----------
+# modules/importer.py 가 사용. 입력 행을 임시 스테이징 표에 executemany 로 쌓은 뒤 집합 연산 몇 번으로 합친다.
+# - 자연 키가 같은 행은 갱신(값이 같으면 건드리지 않음), 없으면 추가 → 같은 파일을 다시 가져와도 결과가 같다
+#   일기: 날짜 / 메모: (created_at, text) / 할 일: (날짜, title, created_at). 파일의 id 는 쓰지 않는다 (다른 DB 와 충돌)
+#   메모/할 일은 키가 같은 행이 여럿일 수 있으므로 "입력의 k번째 ↔ 기존(id 순) k번째" 로 짝짓는다. 일기는 마지막 행만 쓴다
+# - 표 하나의 가져오기 전체가 한 트랜잭션. 행마다 도는 파생 트리거(FTS/집계/의미 검색/outbox)는 시작할 때 한 번 떼어 두고,
+#   끝에 바뀐/새 행 전체를 집합 연산 한 번씩으로 반영한 뒤 다시 붙인다 (떼어 둔 상태는 커밋되지 않으므로 다른 연결에는 안 보인다)
+# - batch 는 메모리에 들고 있는 행 수 (스테이징 단위). 중간에 실패하면 전체가 롤백되고, 다시 가져와도 결과는 같다
+UPSERT_BATCH = 100_000
+_UPSERT = {
+    # kind: (자연 키, 저장 컬럼, 태그 kind)
+    "diary": (["d"], ["d", "text", "mood", "tags", "saved_at"], "diary"),
+    "memos": (["created_at", "text"], ["text", "tags", "pinned", "created_at"], "memo"),
+    "todos": (["d", "title", "created_at"], ["title", "d", "due", "priority", "done", "created_at", "tags"], "todo"),
+}
+
+def _tag_csv(tags) -> str:
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    return ",".join(_clean_tags(tags or []))
+
+def _upsert_values(kind: str, r: Dict[str, Any], now: str) -> tuple:
+    # 표시값 행(bulk_add 와 같은 키) → 저장값 튜플 (_UPSERT 컬럼 순서)
+    if kind == "diary":
+        return (day_num(r["d"]), r.get("text") or "", mood_code(r.get("mood")), _tag_csv(r.get("tags")), r.get("saved_at") or now)
+    if kind == "memos":
+        return (r["text"], _tag_csv(r.get("tags")), 1 if r.get("pinned") else 0, r.get("created_at") or now)
+    due = r.get("due")
+    return (r["title"], day_num(r["d"]), due.strftime("%H:%M") if isinstance(due, time) else (due or None),
+            priority_code(r.get("priority") or "보통"), 1 if r.get("done") else 0, r.get("created_at") or now, _tag_csv(r.get("tags")))
+
+def _derived_triggers(cur, src: str) -> Dict[str, Dict[str, str]]:
+    # 원본 테이블의 파생 트리거를 종류별로 {이름: SQL}
+    fts = next((f for f, s, _ in FTS_SOURCES if s == src), None)
+    prefixes = {"fts": f"{fts}_" if fts else None, "stats": f"{src}_stats_",
+                "semantic": f"{src}_semantic_", "outbox": f"{src}_outbox_", "touch": f"{src}_touch_"}
+    found: Dict[str, Dict[str, str]] = {}
+    for name, sql in cur.execute("SELECT name, sql FROM sqlite_master WHERE type='trigger' AND tbl_name=?", (src,)).fetchall():
+        for fam, prefix in prefixes.items():
+            if prefix and name.startswith(prefix):
+                found.setdefault(fam, {})[name] = sql
+    return found
+
+def _upsert_begin(cur, kind: str) -> Dict[str, Dict[str, str]]:
+    # 파생 트리거를 떼어 두고 (나중에 다시 붙일) 종류별 SQL 을 돌려준다
+    derived = _derived_triggers(cur, kind)
+    for sqls in derived.values():
+        for name in sqls:
+            cur.execute(f"DROP TRIGGER {name}")
+    # 이번 bulk_upsert 에서 이미 짝지었거나 추가한 행 (다음 배치가 다시 짝짓지 않도록) / 바뀌거나 새로 생긴 행 (끝에 파생 반영)
+    cur.execute("CREATE TEMP TABLE IF NOT EXISTS _upsert_claimed(id INTEGER PRIMARY KEY)")
+    cur.execute("CREATE TEMP TABLE IF NOT EXISTS _upsert_changed(id INTEGER PRIMARY KEY)")
+    return derived
+
+def _upsert_batch(cur, kind: str, rows: List[tuple], derived: Dict[str, Dict[str, str]]) -> Dict[str, int]:
+    keys, cols, tag_kind = _UPSERT[kind]
+    key_cols = ", ".join(keys)
+    for t in ("_upsert_stage", "_upsert_rows", "_upsert_existing", "_upsert_touched"):
+        cur.execute(f"DROP TABLE IF EXISTS temp.{t}")
+    # 원본과 같은 선언 타입으로 만들어야 비교 시 색인을 탄다
+    types = {r[1]: r[2] for r in cur.execute(f"PRAGMA table_info({kind})")}
+    cur.execute(f"CREATE TEMP TABLE _upsert_stage(seq INTEGER PRIMARY KEY, {', '.join(f'{c} {types[c]}' for c in cols)})")
+    cur.executemany(f"INSERT INTO _upsert_stage({', '.join(cols)}) VALUES({', '.join(['?'] * len(cols))})", rows)
+    if kind == "diary":
+        cur.execute("DELETE FROM _upsert_stage WHERE seq NOT IN (SELECT MAX(seq) FROM _upsert_stage GROUP BY d)")
+    cur.execute(f"CREATE TEMP TABLE _upsert_rows AS SELECT *, ROW_NUMBER() OVER (PARTITION BY {key_cols} ORDER BY seq) AS occ, "
+                f"CAST(NULL AS INTEGER) AS tid FROM _upsert_stage")
+    # 날짜 없는 할 일(d IS NULL)도 같은 키로 짝짓도록 IN 에 NULL 분기를 더하고 비교는 IS 로
+    in_null = (f" OR {keys[0]} IS NULL" if cur.execute(f"SELECT 1 FROM _upsert_stage WHERE {keys[0]} IS NULL LIMIT 1").fetchone()
+               else "")
+    cur.execute(f"CREATE TEMP TABLE _upsert_existing AS SELECT id, {key_cols}, ROW_NUMBER() OVER (PARTITION BY {key_cols} ORDER BY id) AS occ "
+                f"FROM {kind} WHERE ({keys[0]} IN (SELECT {keys[0]} FROM _upsert_stage){in_null}) "
+                f"AND id NOT IN (SELECT id FROM temp._upsert_claimed)")
+    cur.execute(f"CREATE INDEX temp._upsert_existing_key ON _upsert_existing({key_cols}, occ)")
+    match = " AND ".join(f"e.{k} IS _upsert_rows.{k}" for k in keys)
+    cur.execute(f"UPDATE _upsert_rows SET tid=(SELECT e.id FROM _upsert_existing e WHERE {match} AND e.occ = _upsert_rows.occ)")
+    cur.execute("CREATE INDEX temp._upsert_rows_tid ON _upsert_rows(tid)")
+    cur.execute("INSERT OR IGNORE INTO temp._upsert_claimed(id) SELECT tid FROM _upsert_rows WHERE tid IS NOT NULL")
+    vals = [c for c in cols if c not in keys]
+    changed = " OR ".join(f"t.{c} IS NOT s.{c}" for c in vals)
+    cur.execute("CREATE TEMP TABLE _upsert_touched(id INTEGER PRIMARY KEY)")
+    cur.execute(f"INSERT INTO _upsert_touched(id) SELECT t.id FROM {kind} t JOIN _upsert_rows s ON s.tid = t.id WHERE {changed}")
+    updated = cur.execute("SELECT COUNT(*) FROM temp._upsert_touched").fetchone()[0]
+
+    fts = next((f for f, s, _ in FTS_SOURCES if s == kind), None) if "fts" in derived else None
+    if fts and updated:
+        # 외부 콘텐츠 FTS 는 지울 때 이전 값이 필요하므로 갱신 전에 제거 (다시 넣는 것은 _upsert_finish 에서 한 번에)
+        fts_cols = next(c for f, _, c in FTS_SOURCES if f == fts)
+        cur.execute(f"INSERT INTO {fts}({fts}, rowid, {', '.join(fts_cols)}) SELECT 'delete', t.id, "
+                    f"{', '.join('t.' + c for c in fts_cols)} FROM {kind} t WHERE t.id IN (SELECT id FROM temp._upsert_touched)")
+    # 본문이 있는 표는 목록용 열도 같은 문장에서 채운다
+    list_cols, list_vals = ((f", {', '.join(LIST_COLS)}", f", {_list_sql('text')}") if "text" in cols else ("", ""))
+    if updated:
+        sets = ", ".join(f"{c}=(SELECT s.{c} FROM _upsert_rows s WHERE s.tid = {kind}.id)" for c in vals)
+        sets += f", updated_at={_TOUCH_NOW}"  # touch 트리거는 떼어 둔 상태라 직접 채운다
+        if list_cols:
+            sets += f", ({', '.join(LIST_COLS)}) = (SELECT {_list_sql('s.text')} FROM _upsert_rows s WHERE s.tid = {kind}.id)"
+        cur.execute(f"UPDATE {kind} SET {sets} WHERE id IN (SELECT id FROM temp._upsert_touched)")
+    before = cur.execute(f"SELECT COALESCE(MAX(id), 0) FROM {kind}").fetchone()[0]
+    cur.execute(f"INSERT INTO {kind}({', '.join(cols)}{list_cols}, updated_at) SELECT {', '.join(cols)}{list_vals}, {_TOUCH_NOW} "
+                f"FROM _upsert_rows WHERE tid IS NULL ORDER BY seq")
+    inserted = cur.execute(f"SELECT COUNT(*) FROM {kind} WHERE id > ?", (before,)).fetchone()[0]
+    cur.execute(f"INSERT INTO temp._upsert_touched(id) SELECT id FROM {kind} WHERE id > ?", (before,))
+    cur.execute(f"INSERT OR IGNORE INTO temp._upsert_claimed(id) SELECT id FROM {kind} WHERE id > ?", (before,))
+    cur.execute("INSERT OR IGNORE INTO temp._upsert_changed(id) SELECT id FROM temp._upsert_touched")
+
+    # 태그 연결: 바뀐/새 행만, 저장된 CSV 기준 (새 행은 지울 기존 연결이 없다)
+    rd = cur.connection.cursor()
+    rd.execute(f"SELECT t.id, t.tags, t.id > ? FROM temp._upsert_touched u JOIN {kind} t ON t.id = u.id ORDER BY u.id", (before,))
+    while True:
+        part = rd.fetchmany(5000)
+        if not part:
+            break
+        _bulk_set_tags(cur, tag_kind, [(r[0], (r[1] or "").split(",")) for r in part if not r[2]])
+        _bulk_set_tags(cur, tag_kind, [(r[0], (r[1] or "").split(",")) for r in part if r[2]], replace=False)
+    for t in ("_upsert_stage", "_upsert_rows", "_upsert_existing", "_upsert_touched"):
+        cur.execute(f"DROP TABLE temp.{t}")
+    return {"inserted": inserted, "updated": updated, "unchanged": len(rows) - inserted - updated}
+
+def _upsert_finish(cur, kind: str, derived: Dict[str, Dict[str, str]]):
+    # 가져오기 동안 바뀌거나 새로 생긴 행 전체의 파생 데이터를 한 번씩 반영하고 트리거를 다시 붙인다
+    touched = "(SELECT id FROM temp._upsert_changed)"
+    fts = next((f for f, s, _ in FTS_SOURCES if s == kind), None) if "fts" in derived else None
+    if fts:
+        fts_cols = next(c for f, _, c in FTS_SOURCES if f == fts)
+        cur.execute(f"INSERT INTO {fts}(rowid, {', '.join(fts_cols)}) SELECT id, {', '.join(fts_cols)} FROM {kind} WHERE id IN {touched}")
+    if "stats" in derived:
+        stats, cols_set = ((_DIARY_STATS, "diaries, mood, text_len, word_cnt") if kind == "diary"
+                           else (_TODO_STATS, "todo_total, todo_done"))
+        cur.execute(f"INSERT INTO daily_stats(d, {cols_set}) SELECT d, {stats} FROM {kind} "
+                    f"WHERE d IN (SELECT DISTINCT d FROM {kind} WHERE id IN {touched}) GROUP BY d "
+                    f"ON CONFLICT(d) DO UPDATE SET " + ", ".join(f"{c}=excluded.{c}" for c in cols_set.split(", ")))
+    if "semantic" in derived:
+        sem_kind = next(k for k, s in SEMANTIC_SOURCES if s == kind)
+        cur.execute(f"INSERT INTO semantic_queue(kind, key) SELECT '{sem_kind}', id FROM temp._upsert_changed WHERE true "
+                    f"ON CONFLICT(kind, key) DO UPDATE SET ver=semantic_queue.ver+1")
+    if "outbox" in derived:
+        ob_kind, _, ob_key = next(x for x in OUTBOX_SOURCES if x[1] == kind)
+        cur.execute(f"INSERT INTO sync_outbox(kind, key, op, queued_at) SELECT '{ob_kind}', {_outbox_key(ob_key, kind)}, "
+                    f"'upsert', {_OUTBOX_NOW} FROM {kind} WHERE id IN {touched} "
+                    f"ON CONFLICT(kind, key) DO UPDATE SET op=excluded.op, queued_at=excluded.queued_at, "
+                    f"ver=sync_outbox.ver+1, attempts=0")
+    for sqls in derived.values():
+        for sql in sqls.values():
+            cur.execute(sql)
+
+def bulk_upsert(conn, kind: str, rows: Iterable[Dict[str, Any]], batch: int = UPSERT_BATCH,
+                progress: Optional[Callable[[Dict[str, int]], None]] = None) -> Dict[str, int]:
+    # rows: bulk_add 와 같은 표시값 dict (+ saved_at/created_at/done). 스트림으로 받아 batch 행씩 스테이징, 전체를 한 트랜잭션에 반영.
+    # 반환/progress: {"rows", "inserted", "updated", "unchanged"} 누계 (unchanged 에는 입력 안의 중복도 포함)
+    if kind not in _UPSERT:
+        raise ValueError(f"알 수 없는 종류: {kind}")
+    total = {"rows": 0, "inserted": 0, "updated": 0, "unchanged": 0}
+    now = datetime.now().isoformat(timespec="seconds")
+    it = iter(rows)
+    try:
+        with _writing(conn, kind, "tags") as c:
+            cur = c.cursor()
+            derived = _upsert_begin(cur, kind)
+            while True:
+                chunk = [_upsert_values(kind, r, now) for r in itertools.islice(it, batch)]
+                if not chunk:
+                    break
+                res = _upsert_batch(cur, kind, chunk, derived)
+                total["rows"] += len(chunk)
+                for k, v in res.items():
+                    total[k] += v
+                if progress:
+                    progress(dict(total))
+            _upsert_finish(cur, kind, derived)
+    finally:
+        with _writing(conn) as c:
+            c.execute("DROP TABLE IF EXISTS temp._upsert_claimed")
+            c.execute("DROP TABLE IF EXISTS temp._upsert_changed")
+    return total
+
+def apply_tombstones(conn, rows: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+    # 내보내기 deleted 멤버({"source", "key", "deleted_at"}) 적용. 반환: {"rows", "deleted", "unchanged"}
+    # - 일기: 키가 날짜라 어느 DB 에서나 같으므로, 그 날짜 일기가 지운 시각 이전에 저장된 것이면 지운다
+    # - 메모/할 일: 키가 원본 DB 의 id 라 가져온 DB 에서는 다른 행을 가리키므로 적용하지 않는다 (unchanged)
+    total = {"rows": 0, "deleted": 0, "unchanged": 0}
+    with _writing(conn, "diary", "tags") as c:
+        cur = c.cursor()
+        for r in rows:
+            total["rows"] += 1
+            if r["source"] == "diary":
+                cur.execute("DELETE FROM diary WHERE d=? AND saved_at <= ?", (day_num(r["key"]), r["deleted_at"]))
+                if cur.rowcount:
+                    total["deleted"] += cur.rowcount
+                    continue
+            total["unchanged"] += 1
+    return total
 
 # ---------- 검색 ----------
-def search_all(conn, q: str, kinds: List[str], moods: List[str], done: str, tags: List[str]) -> Dict[str, Any]:
-    result = {"일기":[], "메모":[], "할 일":[]}
-    q_like = f"%{q.strip()}%" if q else None
-    tag_like = [t.strip() for t in tags if t.strip()]
-
-    cur = conn.cursor()
-    # 일기
-    if "일기" in kinds:
-        sql = "SELECT * FROM diary WHERE 1=1"
-        params: List[Any] = []
-        if q_like:
-            sql += " AND (text LIKE ? OR tags LIKE ? OR mood LIKE ?)"
-            params += [q_like, q_like, q_like]
-        if moods:
-            sql += f" AND mood IN ({','.join(['?']*len(moods))})"
-            params += moods
-        for t in tag_like:
-            sql += " AND tags LIKE ?"
-            params += [f"%{t}%"]
-        sql += " ORDER BY d DESC LIMIT 100"
-        cur.execute(sql, params)
-        result["일기"] = [dict(r) for r in cur.fetchall()]
-
-    # 메모
-    if "메모" in kinds:
-        sql = "SELECT * FROM memos WHERE 1=1"
-        params = []
-        if q_like:
-            sql += " AND (text LIKE ? OR tags LIKE ?)"
-            params += [q_like, q_like]
-        for t in tag_like:
-            sql += " AND tags LIKE ?"
-            params += [f"%{t}%"]
-        sql += " ORDER BY pinned DESC, created_at DESC LIMIT 100"
-        cur.execute(sql, params)
-        result["메모"] = [dict(r) for r in cur.fetchall()]
-
-    # 할 일
-    if "할 일" in kinds:
-        sql = "SELECT * FROM todos WHERE 1=1"
+# 3글자 이상 검색어는 FTS5 색인(bm25 순위 + 강조 snippet)으로 찾고,
+# trigram 으로 찾을 수 없는 1~2글자 검색어만 LIKE 조건으로 덧붙인다.
+def _fts_phrase(terms: List[str]) -> str:
+    return " ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+def _like_snippet(text: str, terms: List[str], width: int = 40) -> str:
+    text = text or ""
+    low = text.lower()
+    for t in terms:
+        i = low.find(t.lower())
+        if i >= 0:
+            s, e = max(0, i - width // 2), i + len(t)
+            return ("…" if s else "") + text[s:i] + HL_START + text[i:e] + HL_END + text[e:e + width // 2] + ("…" if e + width // 2 < len(text) else "")
+    return text[:width * 2]
+
+def _search_sql(src: str, fts: str, use_fts: bool, fts_terms: List[str], like_terms: List[str],
+                like_cols: List[str], snippet_col: int, select: str, like_read: str = ""):
+    # select: 결과 열. FTS 는 강조 snippet 을 색인이 만들어 주므로 본문을 읽지 않는다.
+    # like_read: LIKE 검색일 때만 더 읽는 열 (_like_snippet 으로 snippet 을 만들 본문)
+    if use_fts:
+        sql = (f"SELECT {select}, snippet({fts}, {snippet_col}, ?, ?, '…', 16) AS snippet, bm25({fts}) AS rank "
+               f"FROM {fts} JOIN {src} ON {src}.id = {fts}.rowid WHERE {fts} MATCH ?")
+        params: List[Any] = [HL_START, HL_END, _fts_phrase(fts_terms)]
+    else:
+        sql = f"SELECT {select}{like_read}, NULL AS snippet, NULL AS rank FROM {src} WHERE 1=1"
         params = []
-        if q_like:
-            sql += " AND (title LIKE ? OR priority LIKE ?)"
-            params += [q_like, q_like]
-        if done != "전체":
-            sql += " AND done=?"
-            params += [1 if done=="완료" else 0]
-        for t in tag_like:
-            sql += " AND title LIKE ?" # 할 일은 태그 필드가 없으므로 title에서 검색
-            params += [f"%{t}%"]
-        sql += " ORDER BY d DESC, done ASC, priority DESC LIMIT 100"
-        cur.execute(sql, params)
-        result["할 일"] = [dict(r) for r in cur.fetchall()]
-
-    return result
+    for t in like_terms:
+        sql += " AND (" + " OR ".join(f"{c} LIKE ?" for c in like_cols) + ")"
+        params += [f"%{t}%"] * len(like_cols)
+    return sql, params
+
+def _with_snippets(rows, col: str, terms: List[str]) -> List[Dict[str, Any]]:
+    out = []
+    for r in rows:
+        r = dict(r)
+        if r.get("snippet") is None:
+            r["snippet"] = _like_snippet(r.get(col), terms)
+        if col == "text":
+            r.pop("text", None)  # LIKE 로 찾은 경우에만 읽은 본문. 결과에는 넣지 않는다 (FTS 결과와 같은 모양)
+        out.append(decode_row(r))
+    return out
+
+# 종류별 (원본 테이블, FTS 테이블, LIKE 대상 식, snippet 열, 키셋 정렬 열, 결과 열). 기분/우선순위는 표시값으로 찾는다.
+# 결과 열에는 본문/저장된 snippet 을 넣지 않는다 (검색 결과의 snippet 은 강조 표시가 들어간 것)
+SEARCH_KINDS = {
+    "일기": ("diary", "diary_fts", ["diary.text", "diary.tags", display_sql("mood", "diary")], "text", ("d", "id"),
+             "diary.id, diary.d, diary.mood, diary.tags, diary.saved_at, diary.body_len, diary.has_more"),
+    "메모": ("memos", "memos_fts", ["memos.text", "memos.tags"], "text", ("pinned", "created_at", "id"),
+             "memos.id, memos.pinned, memos.created_at, memos.tags, memos.body_len, memos.has_more"),
+    "할 일": ("todos", "todos_fts", ["todos.title", display_sql("priority", "todos")], "title", ("d", "id"), "todos.*"),
+}
+
+def _search_kind(cur, kind: str, terms: List[str], moods: List[str], done: str, tags: List[str], tag_mode: str,
+                 after: Optional[tuple], limit: int):
+    src, fts, like_cols, snip_col, keys, select = SEARCH_KINDS[kind]
+    fts_terms = [t for t in terms if len(t) >= 3]
+    use_fts = bool(fts_terms) and _has_fts(cur)
+    like_terms = [t for t in terms if len(t) < 3] if use_fts else terms
+    sql, params = _search_sql(src, fts, use_fts, fts_terms, like_terms, like_cols, 0, select,
+                              f", {src}.text" if snip_col == "text" else "")
+    if kind == "일기" and moods:
+        sql += f" AND diary.mood IN ({','.join(['?']*len(moods))})"
+        params += [mood_code(m) for m in moods]
+    if kind == "할 일" and done != "전체":
+        sql += " AND todos.done=?"
+        params += [1 if done=="완료" else 0]
+    tag_sql, tag_params = _tag_filter(src, {"일기": "diary", "메모": "memo", "할 일": "todo"}[kind], tags, tag_mode)
+    sql += tag_sql
+    params += tag_params
+    # FTS 는 관련도(bm25 오름차순) → id, 그 외는 정렬 열 내림차순으로 키셋 이동
+    if use_fts:
+        order = [f"bm25({fts})", f"{src}.id"]
+        keys, op, direction = ("rank", "id"), ">", "ASC"
+    else:
+        order = [f"{src}.{k}" for k in keys]
+        op, direction = "<", "DESC"
+    if after and not use_fts and src == "todos":
+        # 날짜 없는 할 일(d IS NULL)은 DESC 정렬에서 맨 뒤. 행 값 비교는 NULL 이면 참이 아니므로 따로 이어 간다
+        if after[0] is None:
+            sql += " AND todos.d IS NULL AND todos.id < ?"
+            params += [after[1]]
+        else:
+            sql += " AND ((todos.d, todos.id) < (?, ?) OR todos.d IS NULL)"
+            params += list(after)
+    elif after:
+        sql += f" AND ({', '.join(order)}) {op} ({', '.join(['?'] * len(order))})"
+        params += list(after)
+    sql += " ORDER BY " + ", ".join(f"{o} {direction}" for o in order) + " LIMIT ?"
+    rows, nxt = _page(cur.execute(sql, params + [limit + 1]).fetchall(), limit, keys)
+    return _with_snippets(rows, snip_col, terms), nxt
+
+@_cached("diary", "memos", "todos", "tags")
+def search_page(conn, kind: str, q: str, moods: List[str], done: str, tags: List[str], tag_mode: str = "AND",
+                after: Optional[tuple] = None, limit: int = PAGE_SIZE):
+    # kind("일기"/"메모"/"할 일") 하나의 검색 결과 한 페이지와 다음 커서
+    with _reading(conn) as c:
+        return _search_kind(c.cursor(), kind, q.split() if q else [], moods, done, tags, tag_mode, after, limit)
+
+@_cached("diary", "memos", "todos", "tags")
+def search_all(conn, q: str, kinds: List[str], moods: List[str], done: str, tags: List[str], tag_mode: str = "AND") -> Dict[str, Any]:
+    # tag_mode: "AND"(모든 태그 포함) / "OR"(하나 이상 포함). 종류별 첫 100건
+    result = {"일기":[], "메모":[], "할 일":[]}
+    terms = q.split() if q else []
+    with _reading(conn) as c:
+        cur = c.cursor()
+        for kind in result:
+            if kind in kinds:
+                result[kind] = _search_kind(cur, kind, terms, moods, done, tags, tag_mode, None, 100)[0]
+        return result
 
 # ---------- 내보내기 ----------
-def export_csv_bundle(conn, out_dir: str):
+# 스트리밍/증분 아카이브는 modules/export.py, 여기서는 기준 시각(watermark) 저장만 담당
+def get_export_marks(conn, name: str = "default") -> Dict[str, str]:
+    with _reading(conn) as c:
+        row = c.execute("SELECT marks FROM export_state WHERE name=?", (name,)).fetchone()
+    return json.loads(row["marks"]) if row and row["marks"] else {}
+
+def set_export_marks(conn, marks: Dict[str, str], name: str = "default"):
+    with _writing(conn) as c:
+        c.execute(
+            "INSERT INTO export_state(name, marks, exported_at) VALUES(?,?,?) "
+            "ON CONFLICT(name) DO UPDATE SET marks=excluded.marks, exported_at=excluded.exported_at",
+            (name, json.dumps(marks), datetime.now().isoformat(timespec="seconds"))
+        )
+
+def export_csv_bundle(conn, out_dir: str, progress: Optional[Callable[[int, int], None]] = None):
+    # progress(끝난 파일 수, 3): 백그라운드 작업의 진행 보고/취소 지점
+    with _reading(conn) as c:
+        return _export_csv_bundle(c, out_dir, progress)
+
+def _export_csv_bundle(conn, out_dir: str, progress: Optional[Callable[[int, int], None]] = None):
     os.makedirs(out_dir, exist_ok=True)
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     paths = []
@@ -219,24 +1803,65 @@ def export_csv_bundle(conn, out_dir: str):
     p1 = os.path.join(out_dir, f"diary_{ts}.csv")
     with open(p1, "w", newline="", encoding="utf-8") as f:
         w = csv.writer(f); w.writerow(["date","mood","tags","text","saved_at"])
-        for r in conn.execute("SELECT d,mood,tags,text,saved_at FROM diary ORDER BY d ASC"):
+        for r in conn.execute(f"SELECT {display_sql('d')},{display_sql('mood')},tags,text,saved_at FROM diary ORDER BY d ASC"):
             w.writerow([r[0], r[1], r[2], r[3], r[4]])
     paths.append(p1)
+    if progress: progress(1, 3)
     # memos
     p2 = os.path.join(out_dir, f"memos_{ts}.csv")
     with open(p2, "w", newline="", encoding="utf-8") as f:
         w = csv.writer(f); w.writerow(["id","created_at","pinned","tags","text"])
-        for r in conn.execute("SELECT id,created_at,pinned,tags,text FROM memos ORDER BY created_at ASC"):
+        for r in conn.execute("SELECT id,created_at,pinned,tags,text FROM memos ORDER BY created_at ASC, id ASC"):
             w.writerow([r[0], r[1], r[2], r[3], r[4]])
     paths.append(p2)
+    if progress: progress(2, 3)
     # todos
     p3 = os.path.join(out_dir, f"todos_{ts}.csv")
     with open(p3, "w", newline="", encoding="utf-8") as f:
         w = csv.writer(f); w.writerow(["id","date","due","priority","done","title","created_at"])
-        for r in conn.execute("SELECT id,d,due,priority,done,title,created_at FROM todos ORDER BY d ASC"):
+        for r in conn.execute(f"SELECT id,{display_sql('d')},due,{display_sql('priority')},done,title,created_at FROM todos ORDER BY d ASC, id ASC"):
             w.writerow([r[0], r[1], r[2], r[3], r[4], r[5], r[6]])
     paths.append(p3)
+    if progress: progress(3, 3)
     return paths
 
-def vacuum(conn):
-    conn.execute("VACUUM")
\ No newline at end of file
+# ---------- 유지보수 ----------
+# 전체 VACUUM 은 DB 를 통째로 다시 써서 그동안 모든 쓰기가 막힌다. 그래서 auto_vacuum=INCREMENTAL 로 두고
+# 빈 페이지를 VACUUM_CHUNK 쪽씩 돌려준다. 조각 사이에는 쓰기 잠금을 놓으므로 다른 쓰기가 끼어들 수 있다.
+# (INCREMENTAL 이전에 만든 DB 는 첫 실행 때 전체 VACUUM 한 번으로 전환)
+VACUUM_CHUNK = 256
+AUTO_VACUUM = {0: "none", 1: "full", 2: "incremental"}
+
+@contextmanager
+def _maintenance(conn):
+    with conn.writer() if isinstance(conn, ConnectionPool) else nullcontext(conn) as c:
+        if id(c) in _tx_state:
+            raise RuntimeError("VACUUM 은 트랜잭션 안에서 실행할 수 없습니다")
+        yield c
+
+def maintenance_info(conn) -> Dict[str, Any]:
+    with _maintenance(conn) as c:
+        info = {k: c.execute(f"PRAGMA {k}").fetchone()[0] for k in ("auto_vacuum", "page_count", "freelist_count", "page_size")}
+    info["auto_vacuum"] = AUTO_VACUUM.get(info["auto_vacuum"], str(info["auto_vacuum"]))
+    return info
+
+def vacuum(conn, progress: Optional[Callable[[int, int], None]] = None, chunk: int = VACUUM_CHUNK) -> Dict[str, Any]:
+    # progress(정리한 쪽 수, 전체 빈 쪽 수). progress 가 예외를 던지면 그 조각까지만 반영하고 멈춘다
+    info = maintenance_info(conn)
+    if info["auto_vacuum"] != "incremental":
+        with _maintenance(conn) as c:
+            c.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            c.execute("VACUUM")
+        if progress: progress(1, 1)
+        return {"mode": "full", "freed": info["freelist_count"]}
+    total, freed = info["freelist_count"], 0
+    while freed < total:
+        with _maintenance(conn) as c:
+            before = c.execute("PRAGMA freelist_count").fetchone()[0]
+            if not before:
+                break
+            # incremental_vacuum 은 한 쪽마다 결과 행을 내므로 executescript 로 끝까지 실행
+            c.executescript(f"PRAGMA incremental_vacuum({chunk})")
+            freed += before - c.execute("PRAGMA freelist_count").fetchone()[0]
+        if progress: progress(min(freed, total), total)
+    return {"mode": "incremental", "freed": freed}
@@ -0,0 +1,171 @@
+# modules/export.py
+# 역할: 스트리밍 내보내기 엔진. 행을 fetchmany 로 읽어 곧바로 하나의 아카이브(zip/CSV 또는 gzip/JSONL)에 쓴다.
+# - 각 테이블은 각자 스레드(풀이면 각자 읽기 연결)에서 읽고 인코딩하며, 작성기는 크기 제한 큐로 차례대로 받는다.
+#   → DB 크기와 무관하게 메모리는 (큐 길이 × 청크 크기) 수준으로 일정.
+# - since(watermark) 이후 바뀐 행(updated_at)만 내보내는 증분 모드 지원. watermark 는 지난번에 내보낸 행의 최대 updated_at 이라
+#   그보다 큰 행만 담는다 (바뀐 게 없으면 다음 증분은 비어 있다).
+#   지운 항목은 deleted(source, key, deleted_at) 로 내보낸다. 받는 쪽은 deleted 를 먼저 적용한 뒤 나머지를 덮어쓴다
+#   (키: 일기는 날짜, 메모/할 일은 id. 같은 날짜의 일기를 지웠다가 다시 쓴 경우 두 쪽 모두에 나온다)
+
+import csv, gzip, io, json, queue, tempfile, threading, zipfile
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterator, List, Optional
+
+from modules import db
+
+# 테이블 → (SELECT, 헤더, watermark 컬럼). 헤더는 export_csv_bundle 에 updated_at 을 더한 것,
+# 날짜/기분/우선순위는 표시값으로 내보낸다. deleted 가 맨 앞 (받는 쪽이 먼저 적용)
+_D, _MOOD, _PRI = db.display_sql("d"), db.display_sql("mood"), db.display_sql("priority")
+EXPORT_TABLES = {
+    "deleted": ("SELECT source,key,deleted_at FROM export_tombstones {where} ORDER BY deleted_at ASC",
+                ["source","key","deleted_at"], "deleted_at"),
+    "diary": (f"SELECT {_D},{_MOOD},tags,text,saved_at,updated_at FROM diary {{where}} ORDER BY d ASC",
+              ["date","mood","tags","text","saved_at","updated_at"], "updated_at"),
+    "memos": ("SELECT id,created_at,pinned,tags,text,updated_at FROM memos {where} ORDER BY created_at ASC, id ASC",
+              ["id","created_at","pinned","tags","text","updated_at"], "updated_at"),
+    "todos": (f"SELECT id,{_D},due,{_PRI},done,title,created_at,tags,updated_at FROM todos {{where}} ORDER BY d ASC, id ASC",
+              ["id","date","due","priority","done","title","created_at","tags","updated_at"], "updated_at"),
+}
+FORMATS = {"zip": ("application/zip", ".zip"), "jsonl.gz": ("application/gzip", ".jsonl.gz")}
+FETCH_ROWS = 1000   # 한 번에 읽고 인코딩하는 행 수
+QUEUE_CHUNKS = 4    # 테이블별로 미리 만들어 둘 수 있는 청크 수
+
+def _encode(fmt: str, table: str, header: List[str], rows, with_header: bool) -> bytes:
+    if fmt == "zip":
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        if with_header:
+            w.writerow(header)
+        w.writerows(rows)
+        return buf.getvalue().encode("utf-8")
+    return "".join(json.dumps({"table": table, **dict(zip(header, r))}, ensure_ascii=False) + "\n" for r in rows).encode("utf-8")
+
+def _table_chunks(c, fmt: str, table: str, since: Optional[str], marks: Dict[str, str]) -> Iterator[bytes]:
+    sql, header, mark_col = EXPORT_TABLES[table]
+    mark_idx = header.index(mark_col)
+    if since:
+        cur = c.execute(sql.format(where=f"WHERE {mark_col} > ?"), (since,))
+    else:
+        cur = c.execute(sql.format(where=""))
+    first = True
+    while True:
+        rows = [tuple(r) for r in cur.fetchmany(FETCH_ROWS)]
+        if not rows and not first:
+            return
+        for r in rows:
+            if r[mark_idx] and r[mark_idx] > marks.get(table, ""):
+                marks[table] = r[mark_idx]
+        yield _encode(fmt, table, header, rows, first)  # 빈 테이블도 헤더는 쓴다
+        first = False
+        if len(rows) < FETCH_ROWS:
+            return
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.2)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def _produce(conn, fmt: str, table: str, since: Optional[str], marks: Dict[str, str],
+             out: queue.Queue, stop: threading.Event):
+    try:
+        with db.reading(conn) as c:
+            for chunk in _table_chunks(c, fmt, table, since, marks):
+                if not _put(out, chunk, stop):
+                    return
+        _put(out, None, stop)
+    except BaseException as e:
+        _put(out, e, stop)
+
+def write_archive(conn, fileobj: BinaryIO, fmt: str = "zip", since: Optional[Dict[str, str]] = None,
+                  tables: Optional[List[str]] = None) -> Dict[str, str]:
+    # fileobj 에 아카이브를 스트리밍으로 쓰고, 테이블별 새 watermark 를 반환한다.
+    # since: {"diary": "2024-01-01T00:00:00", ...} (없으면 전체)
+    if fmt not in FORMATS:
+        raise ValueError(f"지원하지 않는 형식: {fmt}")
+    tables = tables or list(EXPORT_TABLES)
+    since = since or {}
+    marks: Dict[str, str] = dict(since)
+    stop = threading.Event()
+    queues: Dict[str, queue.Queue] = {}
+    # 단일 sqlite3 연결은 여러 스레드가 동시에 쓸 수 없으므로, 풀일 때만 테이블별 병렬 읽기
+    if isinstance(conn, db.ConnectionPool):
+        for t in tables:
+            queues[t] = queue.Queue(maxsize=QUEUE_CHUNKS)
+            threading.Thread(target=_produce, args=(conn, fmt, t, since.get(t), marks, queues[t], stop),
+                             name=f"export-{t}", daemon=True).start()
+
+    def chunks(t: str) -> Iterator[bytes]:
+        if t not in queues:
+            with db.reading(conn) as c:
+                yield from _table_chunks(c, fmt, t, since.get(t), marks)
+            return
+        while True:
+            item = queues[t].get()
+            if item is None:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    try:
+        if fmt == "zip":
+            with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+                for t in tables:
+                    with zf.open(f"{t}.csv", "w", force_zip64=True) as member:
+                        for chunk in chunks(t):
+                            member.write(chunk)
+        else:
+            with gzip.GzipFile(fileobj=fileobj, mode="wb") as gz:
+                for t in tables:
+                    for chunk in chunks(t):
+                        gz.write(chunk)
+    finally:
+        stop.set()  # 중간에 실패해도 생산 스레드가 큐에서 멈춰 있지 않도록
+    return marks
+
+def build_archive(conn, fmt: str = "zip", incremental: bool = False, name: str = "default"):
+    # 아카이브를 임시 파일(16MB 까지는 메모리)에 만들고 (파일객체, 파일명, MIME) 을 반환.
+    # incremental 이면 저장된 watermark 이후 행만 담고, 성공 시 watermark 를 갱신한다.
+    # 전체 내보내기(백업)는 watermark 를 건드리지 않는다 (증분 내보내기의 받는 쪽이 중간 변경분을 놓치지 않도록)
+    since = db.get_export_marks(conn, name) if incremental else {}
+    f = tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+    marks = write_archive(conn, f, fmt=fmt, since=since)
+    if incremental:
+        db.set_export_marks(conn, marks, name)
+    f.seek(0)
+    mime, ext = FORMATS[fmt]
+    kind = "incremental" if incremental and since else "full"
+    return f, f"diary_export_{kind}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{ext}", mime
+
+class _QueueWriter(io.RawIOBase):
+    # write() 된 바이트를 큐로 넘기는 파일객체 (iter_archive 용)
+    def __init__(self, q: queue.Queue):
+        self.q = q
+    def writable(self):
+        return True
+    def write(self, b):
+        self.q.put(bytes(b))
+        return len(b)
+
+def iter_archive(conn, fmt: str = "zip", since: Optional[Dict[str, str]] = None) -> Iterator[bytes]:
+    # HTTP 응답처럼 바이트 청크를 순서대로 흘려보내야 하는 곳에서 사용
+    q: queue.Queue = queue.Queue(maxsize=QUEUE_CHUNKS * 4)
+    done = object()
+    def run():
+        try:
+            write_archive(conn, _QueueWriter(q), fmt=fmt, since=since)
+            q.put(done)
+        except BaseException as e:
+            q.put(e)
+    threading.Thread(target=run, name="export-stream", daemon=True).start()
+    while True:
+        item = q.get()
+        if item is done:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
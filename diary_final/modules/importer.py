@@ -0,0 +1,256 @@
+# modules/importer.py
+# 역할: 대량 가져오기 (export_csv_bundle / 내보내기 아카이브의 역방향). CSV·JSONL(.gz)·ZIP·폴더를 스트림으로 읽어
+#       행을 검증한 뒤 db.bulk_upsert 로 넣는다. 같은 파일을 다시 가져와도 결과가 같다(자연 키 업서트).
+# 사용 (diary_final/ 에서):
+#   python -m modules.importer data/exports/                       # export_csv_bundle 결과 폴더
+#   python -m modules.importer backup.zip notes.jsonl.gz           # 아카이브 / JSONL
+#   python -m modules.importer other_app.csv --table memos --dry-run
+# - 표 이름: --table > JSONL 의 "table" 값 > 파일 이름(diary_*.csv, memos.csv …)
+# - 잘못된 행은 건너뛰고 (파일, 줄, 이유)를 보고. --max-errors 를 넘으면 중단 (그 표의 가져오기는 롤백, 앞서 끝난 표는 남는다)
+# - 메모리: 한 번에 db.UPSERT_BATCH 행까지만 들고 있다
+# - 내보내기 아카이브의 deleted(삭제 기록)는 db.apply_tombstones 로 적용 (일기만 날짜로 지운다. 메모/할 일 id 는 DB 마다 달라 건너뜀)
+
+import argparse, csv, functools, gzip, io, itertools, json, os, sys, time, zipfile
+from datetime import date, time as dtime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from modules import db
+
+TABLES = ("diary", "memos", "todos")
+TOMBSTONES = "deleted"  # 내보내기의 삭제 기록 멤버 (modules/export.py) → db.apply_tombstones
+# 다른 도구에서 흔한 컬럼 이름 → 우리 키
+ALIASES = {
+    "date": "d", "day": "d", "content": "text", "body": "text", "note": "text",
+    "name": "title", "task": "title", "time": "due", "completed": "done", "created": "created_at",
+}
+TRUE = {"1", "true", "yes", "y", "t", "o", "완료", "done", "x"}
+
+class RowError(ValueError):
+    pass
+
+class TooManyErrors(Exception):
+    pass
+
+# ---------- 입력 읽기 ----------
+# 읽는 단계에서 컬럼 이름을 우리 키로 바꿔 둔다 (CSV 는 머리글 한 번만)
+@functools.lru_cache(maxsize=512)
+def _key(name: str) -> str:
+    k = name.strip().lower()
+    return ALIASES.get(k, k)
+
+def _table_from_name(name: str) -> Optional[str]:
+    base = os.path.basename(name).lower()
+    return next((t for t in TABLES + (TOMBSTONES,) if base.startswith(t)), None)
+
+def _csv_rows(f, source: str, table: Optional[str]) -> Iterator[Tuple[str, str, int, Dict[str, Any]]]:
+    text = io.TextIOWrapper(f, encoding="utf-8-sig", newline="")
+    table = table or _table_from_name(source)
+    if table is None:
+        yield "", source, 1, {"__error__": "표 이름을 알 수 없습니다 (--table 지정)"}
+        return
+    reader = csv.reader(text)
+    header = [_key(h) for h in next(reader, [])]
+    for i, row in enumerate(reader, start=2):
+        yield table, source, i, dict(zip(header, row))
+
+def _jsonl_rows(f, source: str, table: Optional[str]) -> Iterator[Tuple[str, str, int, Dict[str, Any]]]:
+    default = table or _table_from_name(source)
+    for i, line in enumerate(io.TextIOWrapper(f, encoding="utf-8"), start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield "", source, i, {"__error__": f"JSON 오류: {e.msg}"}
+            continue
+        t = row.pop("table", None)
+        yield table or t or default or "", source, i, {_key(k): v for k, v in row.items()}
+
+def _zip_rows(path: str, table: Optional[str]):
+    with zipfile.ZipFile(path) as zf:
+        for name in zf.namelist():
+            with zf.open(name) as f:
+                src = f"{path}:{name}"
+                if name.endswith(".csv"):
+                    yield from _csv_rows(f, src, table or _table_from_name(name))
+                elif name.endswith((".jsonl", ".jsonl.gz")):
+                    yield from _jsonl_rows(gzip.GzipFile(fileobj=f) if name.endswith(".gz") else f, src, table)
+
+def read_rows(paths: List[str], table: Optional[str] = None) -> Iterator[Tuple[str, str, int, Dict[str, Any]]]:
+    # (표, 출처, 줄 번호, 원본 dict) 를 파일 순서대로 흘려보낸다
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, n) for n in os.listdir(path)
+                           if n.endswith((".csv", ".jsonl", ".jsonl.gz", ".zip")))
+            yield from read_rows(files, table)
+        elif path.endswith(".zip"):
+            yield from _zip_rows(path, table)
+        elif path.endswith(".jsonl.gz"):
+            with gzip.open(path, "rb") as f:
+                yield from _jsonl_rows(f, path, table)
+        elif path.endswith(".jsonl"):
+            with open(path, "rb") as f:
+                yield from _jsonl_rows(f, path, table)
+        else:
+            with open(path, "rb") as f:
+                yield from _csv_rows(f, path, table)
+
+# ---------- 검증 ----------
+def _s(v) -> str:
+    return "" if v is None else str(v).strip()
+
+def _date(v) -> date:
+    s = _s(v)
+    if not s:
+        raise RowError("날짜 없음")
+    try:
+        return date.fromisoformat(s[:10])
+    except ValueError:
+        raise RowError(f"날짜 형식 오류: {s!r}")
+
+def _due(v) -> Optional[dtime]:
+    s = _s(v)
+    if not s:
+        return None
+    try:
+        return dtime.fromisoformat(s)
+    except ValueError:
+        raise RowError(f"시간 형식 오류: {s!r}")
+
+def _mood(v):
+    s = _s(v)
+    if not s:
+        return None
+    if s.isdigit() and int(s) in db.MOODS:
+        return int(s)
+    if s in db.MOOD_CODES:
+        return s
+    raise RowError(f"알 수 없는 기분: {s!r}")
+
+def _priority(v):
+    s = _s(v)
+    if not s:
+        return "보통"
+    if s.isdigit() and int(s) in db.PRIORITIES:
+        return int(s)
+    if s in db.PRIORITY_CODES:
+        return s
+    raise RowError(f"알 수 없는 우선순위: {s!r}")
+
+def _flag(v) -> bool:
+    return v is True or _s(v).lower() in TRUE
+
+def _tags(v):
+    # 목록 또는 "a,b" / "a;b" / "#a #b"(쉼표 없이 공백) 문자열. 정리(공백/중복 제거)는 db 가 한다
+    if isinstance(v, list):
+        return [str(t) for t in v]
+    s = _s(v)
+    if "#" in s:
+        s = s.replace(",", " ").replace("#", ",")
+    return s.replace(";", ",")
+
+def validate(table: str, r: Dict[str, Any]) -> Dict[str, Any]:
+    # 원본 dict(키는 _key 로 정리됨) → db.bulk_upsert 행. 문제가 있으면 RowError
+    if "__error__" in r:
+        raise RowError(r["__error__"])
+    if table == TOMBSTONES:
+        if _s(r.get("source")) not in TABLES or not _s(r.get("key")) or not _s(r.get("deleted_at")):
+            raise RowError("삭제 기록 형식 오류 (source/key/deleted_at)")
+        return {"source": _s(r.get("source")), "key": _s(r.get("key")), "deleted_at": _s(r.get("deleted_at"))}
+    if table not in TABLES:
+        raise RowError(f"알 수 없는 표: {table!r}")
+    if table == "diary":
+        return {"d": _date(r.get("d")), "text": _s(r.get("text")), "mood": _mood(r.get("mood")),
+                "tags": _tags(r.get("tags")), "saved_at": _s(r.get("saved_at")) or None}
+    if table == "memos":
+        text = _s(r.get("text"))
+        if not text:
+            raise RowError("내용 없음")
+        return {"text": text, "tags": _tags(r.get("tags")), "pinned": _flag(r.get("pinned")),
+                "created_at": _s(r.get("created_at")) or None}
+    title = _s(r.get("title"))
+    if not title:
+        raise RowError("할 일 제목 없음")
+    # 할 일은 날짜 없이도 둘 수 있다 (빈 값 → 날짜 없음)
+    return {"title": title, "d": _date(r.get("d")) if _s(r.get("d")) else None, "due": _due(r.get("due")), "priority": _priority(r.get("priority")),
+            "done": _flag(r.get("done")), "tags": _tags(r.get("tags")), "created_at": _s(r.get("created_at")) or None}
+
+# ---------- 가져오기 ----------
+def import_paths(conn, paths: List[str], table: Optional[str] = None, batch: int = db.UPSERT_BATCH,
+                 max_errors: int = 100, dry_run: bool = False, progress=None) -> Dict[str, Any]:
+    # 반환: {"tables": {표: bulk_upsert 누계}, "errors": [(출처, 줄, 이유)], "skipped": n}
+    errors: List[Tuple[str, int, str]] = []
+    skipped = 0
+    report: Dict[str, Dict[str, int]] = {}
+
+    def valid(group) -> Iterator[Dict[str, Any]]:
+        nonlocal skipped
+        for t, source, line, raw in group:
+            try:
+                yield validate(t, raw)
+            except RowError as e:
+                skipped += 1
+                if len(errors) < max_errors:
+                    errors.append((source, line, str(e)))
+                else:
+                    raise TooManyErrors(f"오류가 {max_errors}건을 넘어 중단합니다 ({source}:{line} {e})")
+
+    # 같은 표가 이어지는 구간마다 스트림으로 업서트 (JSONL 아카이브는 표 순서대로 들어 있다)
+    for t, group in itertools.groupby(read_rows(paths, table), key=lambda x: x[0]):
+        if t not in TABLES and t != TOMBSTONES:
+            list(valid(group))  # 오류로 기록만
+            continue
+        if dry_run:
+            n = sum(1 for _ in valid(group))
+            acc = report.setdefault(t, {"rows": 0})
+            acc["rows"] += n
+            continue
+        if t == TOMBSTONES:
+            # 아카이브에서 deleted 는 맨 앞이므로, 지웠다가 다시 쓴 일기는 뒤의 diary 멤버가 되살린다
+            res = db.apply_tombstones(conn, valid(group))
+        else:
+                res = db.bulk_upsert(conn, t, valid(group), batch=batch,
+                                 progress=(lambda tot, t=t: progress(t, tot)) if progress else None)
+        acc = report.setdefault(t, {k: 0 for k in res})
+        for k, v in res.items():
+            acc[k] += v
+    return {"tables": report, "errors": errors, "skipped": skipped}
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m modules.importer", description="CSV/JSONL/ZIP 대량 가져오기")
+    ap.add_argument("paths", nargs="+", help="파일 또는 폴더 (.csv .jsonl .jsonl.gz .zip)")
+    ap.add_argument("--db", default=os.path.join("data", "app.db"))
+    ap.add_argument("--table", choices=TABLES, help="모든 입력을 이 표로 가져오기")
+    ap.add_argument("--batch", type=int, default=db.UPSERT_BATCH, help="한 번에 스테이징할 행 수 (메모리 상한)")
+    ap.add_argument("--max-errors", type=int, default=100)
+    ap.add_argument("--dry-run", action="store_true", help="검증만 하고 쓰지 않음")
+    args = ap.parse_args(argv)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+    conn = db.get_conn(args.db)
+    db.init_schema(conn)
+    t0 = time.perf_counter()
+    try:
+        res = import_paths(conn, args.paths, table=args.table, batch=args.batch, max_errors=args.max_errors,
+                           dry_run=args.dry_run,
+                           progress=lambda t, tot: print(f"  {t}: {tot['rows']:,}행 처리", file=sys.stderr))
+    except TooManyErrors as e:
+        print(e, file=sys.stderr)
+        return 2
+    finally:
+        conn.close()
+    secs = time.perf_counter() - t0
+    for t, r in res["tables"].items():
+        if "inserted" in r:
+            print(f"{t}: {r['rows']:,}행 · 추가 {r['inserted']:,} · 갱신 {r['updated']:,} · 변경 없음 {r['unchanged']:,}")
+        elif "deleted" in r:
+            print(f"{t}: {r['rows']:,}행 · 삭제 {r['deleted']:,} · 변경 없음 {r['unchanged']:,}")
+        else:
+            print(f"{t}: {r['rows']:,}행")
+    for source, line, msg in res["errors"]:
+        print(f"  건너뜀 {source}:{line} {msg}", file=sys.stderr)
+    print(f"{'검증' if args.dry_run else '가져오기'} 완료: {secs:.1f}초, 건너뛴 행 {res['skipped']:,}")
+    return 1 if res["skipped"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
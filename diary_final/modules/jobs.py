@@ -0,0 +1,243 @@
+# modules/jobs.py
+# 역할: 오래 걸리는 작업(VACUUM/CSV·일기책 내보내기/노션 동기화/의미 색인 갱신)을 백그라운드에서 실행.
+# - 작업은 jobs 테이블에 기록되고, DB(연결 풀)마다 워커 스레드 1개가 들어온 순서대로 실행한다
+# - 워커는 서버 프로세스에 있으므로 화면이 다시 그려지거나 탭을 닫아도 작업은 계속된다. main.py 는 상태만 읽는다
+# - 진행률은 PROGRESS_EVERY 초 간격으로 기록. 취소는 cancel 표시 → 작업이 다음 진행 보고 때 JobCancelled 로 멈춘다
+# - 앱이 재시작되면 running 으로 남은 작업을 다시 queued 로 돌려 처음부터 실행 (모든 작업이 다시 실행해도 안전)
+# 프로세스 대신 스레드: 작업 대부분이 SQLite/네트워크 대기라 GIL 을 놓고, 같은 연결 풀·조회 캐시를 써야 무효화가 맞는다.
+
+import json, os, threading, time, traceback
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from modules import book, db, semantic
+from modules.notion_client import NotionSync
+
+PROGRESS_EVERY = 0.5   # 진행률 기록 최소 간격(초)
+IDLE_WAIT = 5.0        # 대기열이 비었을 때 다시 확인하는 간격(초). 새 작업은 submit 이 바로 깨운다
+EXPORT_DIR = os.path.join("data", "exports")
+LABELS = {"vacuum": "DB 정리 (VACUUM)", "export_csv": "CSV 내보내기", "notion_sync": "노션 동기화",
+          "book": "일기책 내보내기", "semantic": "의미 색인 갱신"}
+
+class JobCancelled(Exception):
+    pass
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+# ---------- 작업 종류 ----------
+# handler(conn, params, ctx) -> 결과(dict). ctx.progress(done, total, message) 가 진행 보고이자 취소 지점.
+HANDLERS: Dict[str, Callable[[Any, Dict[str, Any], "JobContext"], Any]] = {}
+
+def handler(kind: str):
+    def deco(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return deco
+
+@handler("vacuum")
+def _run_vacuum(conn, params, ctx):
+    return db.vacuum(conn, progress=lambda done, total: ctx.progress(done, total, "빈 페이지 정리"))
+
+@handler("export_csv")
+def _run_export_csv(conn, params, ctx):
+    paths = db.export_csv_bundle(conn, params.get("out_dir") or EXPORT_DIR,
+                                 progress=lambda done, total: ctx.progress(done, total, "CSV 파일 쓰기"))
+    return {"paths": paths}
+
+@handler("book")
+def _run_book(conn, params, ctx):
+    start, end = date.fromisoformat(params["start"]), date.fromisoformat(params["end"])
+    fmt = params.get("fmt") or "docx"
+    path = params.get("path") or os.path.join(params.get("out_dir") or EXPORT_DIR, book.book_filename(start, end, fmt))
+    return book.export_book(conn, path, start, end, fmt,
+                            progress=lambda done, total: ctx.progress(done, total, "달별로 엮는 중"))
+
+@handler("semantic")
+def _run_semantic(conn, params, ctx):
+    # 대기열을 batch 단위로 반영. 배치 사이가 진행 보고이자 취소 지점 (반영된 배치는 남는다)
+    idx = semantic.get_index(conn, params["db_path"])
+    total, done = idx.pending(), 0
+    while True:
+        ctx.progress(done, max(total, done), "바뀐 일기·메모 임베딩")
+        n = idx.refresh()
+        if not n:
+            return {"embedded": done}
+        done += n
+
+@handler("notion_sync")
+def _run_notion_sync(conn, params, ctx):
+    return NotionSync().sync_pending(conn, limit=params.get("limit"),
+                                     progress=lambda done, total: ctx.progress(done, total, "노션에 반영"))
+
+class JobContext:
+    def __init__(self, conn, job_id: int):
+        self.conn = conn
+        self.job_id = job_id
+        self._last = 0.0
+
+    def cancelled(self) -> bool:
+        with db.reading(self.conn) as c:
+            row = c.execute("SELECT cancel FROM jobs WHERE id=?", (self.job_id,)).fetchone()
+        return bool(row and row["cancel"])
+
+    def progress(self, done: int, total: int, message: str = ""):
+        now = time.monotonic()
+        if now - self._last < PROGRESS_EVERY and done < total:
+            return
+        self._last = now
+        with db.writing(self.conn) as c:
+            c.execute("UPDATE jobs SET done=?, total=?, message=? WHERE id=?", (done, total, message, self.job_id))
+            cancel = c.execute("SELECT cancel FROM jobs WHERE id=?", (self.job_id,)).fetchone()["cancel"]
+        if cancel:
+            raise JobCancelled()
+
+# ---------- 워커 ----------
+class Runner:
+    """DB 하나의 작업 대기열을 처리하는 워커 스레드."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self.current: Optional[int] = None
+        # 이전 프로세스에서 실행 중이던 작업은 다시 대기열로
+        with db.writing(conn) as c:
+            c.execute("UPDATE jobs SET status='queued', message='재시작 후 다시 실행' WHERE status='running'")
+        self._thread = threading.Thread(target=self._loop, name="jobs-worker", daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+
+    def alive(self) -> bool:
+        return self._thread.is_alive() and not self._stop.is_set()
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        with db.writing(self.conn) as c:
+            row = c.execute("SELECT * FROM jobs WHERE status='queued' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            if row["cancel"]:
+                c.execute("UPDATE jobs SET status='cancelled', finished_at=? WHERE id=?", (_now(), row["id"]))
+                return {}
+            c.execute("UPDATE jobs SET status='running', started_at=?, done=0, total=0 WHERE id=?", (_now(), row["id"]))
+        return dict(row)
+
+    def _finish(self, job_id: int, status: str, message: str = "", result: Any = None):
+        with db.writing(self.conn) as c:
+            c.execute("UPDATE jobs SET status=?, message=?, result=?, finished_at=? WHERE id=?",
+                      (status, message, json.dumps(result, ensure_ascii=False) if result is not None else None, _now(), job_id))
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                job = self._claim()
+            except Exception:
+                traceback.print_exc()
+                job = None
+            if job is None:
+                self._wake.wait(IDLE_WAIT)
+                self._wake.clear()
+                continue
+            if not job:
+                continue  # 시작 전에 취소된 작업
+            self.current = job["id"]
+            fn = HANDLERS.get(job["kind"])
+            try:
+                if fn is None:
+                    raise ValueError(f"알 수 없는 작업 종류: {job['kind']}")
+                result = fn(self.conn, json.loads(job["params"] or "{}"), JobContext(self.conn, job["id"]))
+                self._finish(job["id"], "done", "완료", result)
+            except JobCancelled:
+                self._finish(job["id"], "cancelled", "취소됨")
+            except Exception as e:
+                traceback.print_exc()
+                self._finish(job["id"], "failed", f"{type(e).__name__}: {e}"[:500])
+            finally:
+                self.current = None
+
+_RUNNERS: Dict[Any, Runner] = {}
+_RUNNERS_LOCK = threading.Lock()
+
+def start(conn) -> Runner:
+    # DB 당 워커 1개. main.py 가 시작 시 호출해 중단된 작업을 이어서 실행한다
+    with _RUNNERS_LOCK:
+        runner = _RUNNERS.get(id(conn))
+        if runner is None or not runner.alive():
+            prune(conn)
+            runner = _RUNNERS[id(conn)] = Runner(conn)
+        return runner
+
+def stop(conn) -> bool:
+    # 워커를 멈추고 목록에서 뺀다. 실행 중인 작업이 있으면 멈추지 않고 False (DB 를 닫기 전에 호출)
+    with _RUNNERS_LOCK:
+        runner = _RUNNERS.get(id(conn))
+        if runner is None:
+            return True
+        if runner.current is not None:
+            return False
+        del _RUNNERS[id(conn)]
+    runner.stop()
+    # 멈추는 사이에 작업을 집어 갔으면 그 작업이 끝날 때까지 닫으면 안 된다 (다음 start 가 새 워커를 만든다)
+    return not runner._thread.is_alive()
+
+# ---------- 작업 요청/조회 ----------
+def submit(conn, kind: str, params: Optional[Dict[str, Any]] = None) -> int:
+    # 같은 종류·같은 인자의 작업이 이미 대기/실행 중이면 그 id 를 반환 (중복 실행 방지).
+    # 인자가 다르면 (다른 기간/형식의 일기책 등) 따로 대기열에 넣는다
+    if kind not in HANDLERS:
+        raise ValueError(f"알 수 없는 작업 종류: {kind}")
+    params_json = json.dumps(params or {}, ensure_ascii=False, sort_keys=True)
+    with db.writing(conn) as c:
+        row = c.execute("SELECT id FROM jobs WHERE kind=? AND params=? AND status IN ('queued','running') AND cancel=0 "
+                        "ORDER BY id LIMIT 1", (kind, params_json)).fetchone()
+        if row:
+            job_id = row["id"]
+        else:
+            job_id = c.execute("INSERT INTO jobs(kind, params, created_at) VALUES(?,?,?)",
+                               (kind, params_json, _now())).lastrowid
+    start(conn).wake()
+    return job_id
+
+def cancel(conn, job_id: int):
+    # 대기 중이면 바로 취소, 실행 중이면 다음 진행 보고 때 멈춘다
+    with db.writing(conn) as c:
+        c.execute("UPDATE jobs SET cancel=1 WHERE id=? AND status IN ('queued','running')", (job_id,))
+        c.execute("UPDATE jobs SET status='cancelled', message='취소됨', finished_at=? WHERE id=? AND status='queued'",
+                  (_now(), job_id))
+
+def _decode(row) -> Dict[str, Any]:
+    r = dict(row)
+    r["params"] = json.loads(r["params"] or "{}")
+    r["result"] = json.loads(r["result"]) if r["result"] else None
+    r["label"] = LABELS.get(r["kind"], r["kind"])
+    return r
+
+def get_job(conn, job_id: int) -> Optional[Dict[str, Any]]:
+    with db.reading(conn) as c:
+        row = c.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+    return _decode(row) if row else None
+
+def list_jobs(conn, limit: int = 10) -> List[Dict[str, Any]]:
+    # 대기/실행 중인 작업을 먼저, 나머지는 최근 순
+    with db.reading(conn) as c:
+        rows = c.execute("SELECT * FROM jobs ORDER BY status IN ('queued','running') DESC, id DESC LIMIT ?", (limit,)).fetchall()
+    return [_decode(r) for r in rows]
+
+def active_jobs(conn, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+    with db.reading(conn) as c:
+        rows = c.execute("SELECT * FROM jobs WHERE status IN ('queued','running') AND (? IS NULL OR kind=?) ORDER BY id",
+                         (kind, kind)).fetchall()
+    return [_decode(r) for r in rows]
+
+def prune(conn, keep: int = 200) -> int:
+    # 끝난 작업 기록은 최근 keep 건만 남긴다
+    with db.writing(conn) as c:
+        return c.execute("DELETE FROM jobs WHERE status NOT IN ('queued','running') AND id NOT IN "
+                         "(SELECT id FROM jobs ORDER BY id DESC LIMIT ?)", (keep,)).rowcount
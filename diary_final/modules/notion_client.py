@@ -1,32 +1,225 @@
-
 # modules/notion_client.py
-# 역할: .env에 NOTION_TOKEN/NOTION_DB_* 세팅 시 동기화 버튼 활성화.
-# 실제 업로드 구현은 Notion SDK 연결이 필요하며, 본 클래스는 안전한 스텁 형태입니다.
+# 역할: .env에 NOTION_TOKEN/NOTION_DB_* 세팅 시 노션 증분 동기화.
+# - 로컬 변경분은 db 트리거가 sync_outbox 에 기록 → 대기 중인 변경분만 전송 (전체 행 재전송 없음)
+# - 한 번에 batch_size 건씩 asyncio 로 동시 전송, 노션 요청 한도(평균 초당 3회)를 토큰 버킷으로 지킴
+# - 429/5xx/네트워크 오류는 지수 백오프로 재시도, 로컬 항목 ↔ 노션 페이지 id 는 notion_pages 에 보관
+# 노션 DB에는 아래 PROPS 이름의 속성이 있어야 합니다. (NOTION_API_URL 로 목 서버 지정 가능)
 
-import os
-from typing import Any, Dict, List
-from datetime import date
+import os, json, time, random, asyncio
+import urllib.request, urllib.error
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from datetime import datetime
 from dotenv import load_dotenv
 
+from modules import db
+
 load_dotenv()
 
+NOTION_API = "https://api.notion.com/v1"
+NOTION_VERSION = "2022-06-28"
+RICH_TEXT_MAX = 2000  # 노션 rich_text 조각 하나의 최대 길이
+
+# 노션 DB 속성 이름
+PROPS = {
+    "title": "Name", "date": "Date", "tags": "Tags", "text": "Text",
+    "mood": "Mood", "priority": "Priority", "done": "Done", "due": "Due",
+}
+
+class NotionError(Exception):
+    def __init__(self, status: int, body: str):
+        super().__init__(f"Notion API {status}: {body[:200]}")
+        self.status = status
+
+class RateLimiter:
+    """토큰 버킷: 평균 rate 회/초, 순간 burst 회까지 허용."""
+
+    def __init__(self, rate: float, burst: int = 3):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+def _rich_text(s: str) -> List[Dict[str, Any]]:
+    s = s or ""
+    return [{"text": {"content": s[i:i + RICH_TEXT_MAX]}} for i in range(0, min(len(s), RICH_TEXT_MAX * 100), RICH_TEXT_MAX)]
+
+def _tags(csv_tags: str) -> List[Dict[str, str]]:
+    return [{"name": t.replace(",", " ")} for t in (csv_tags or "").split(",") if t.strip()]
+
+def _properties(kind: str, row: Dict[str, Any]) -> Dict[str, Any]:
+    if kind == "diary":
+        return {
+            PROPS["title"]: {"title": _rich_text(f"{row['d']} 일기")},
+            PROPS["date"]: {"date": {"start": row["d"]}},
+            PROPS["mood"]: {"rich_text": _rich_text(row.get("mood") or "")},
+            PROPS["tags"]: {"multi_select": _tags(row.get("tags"))},
+            PROPS["text"]: {"rich_text": _rich_text(row.get("text") or "")},
+        }
+    if kind == "memo":
+        return {
+            PROPS["title"]: {"title": _rich_text((row.get("text") or "").split("\n")[0][:100] or "메모")},
+            PROPS["date"]: {"date": {"start": row["created_at"]}} if row.get("created_at") else {"date": None},
+            PROPS["tags"]: {"multi_select": _tags(row.get("tags"))},
+            PROPS["text"]: {"rich_text": _rich_text(row.get("text") or "")},
+        }
+    return {
+        PROPS["title"]: {"title": _rich_text(row.get("title") or "")},
+        PROPS["date"]: {"date": {"start": row["d"]}} if row.get("d") else {"date": None},
+        PROPS["due"]: {"rich_text": _rich_text(row.get("due") or "")},
+        PROPS["priority"]: {"select": {"name": row.get("priority") or "보통"}},
+        PROPS["done"]: {"checkbox": bool(row.get("done"))},
+        PROPS["tags"]: {"multi_select": _tags(row.get("tags"))},
+    }
+
 class NotionSync:
-    def __init__(self):
+    def __init__(self, base_url: Optional[str] = None, rate: float = 3.0, concurrency: int = 3,
+                 batch_size: int = 50, max_retries: int = 5, timeout: float = 30.0):
         self.token = os.getenv("NOTION_TOKEN","")
         self.db_todos = os.getenv("NOTION_DB_TODOS","")
         self.db_diary = os.getenv("NOTION_DB_DIARY","")
         self.db_memos = os.getenv("NOTION_DB_MEMOS","")
         self.enabled = all([self.token, self.db_todos, self.db_diary, self.db_memos])
+        self.base_url = (base_url or os.getenv("NOTION_API_URL", NOTION_API)).rstrip("/")
+        self.rate = rate
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+    def _database_id(self, kind: str) -> str:
+        return {"diary": self.db_diary, "memo": self.db_memos, "todo": self.db_todos}[kind]
+
+    # ---------- HTTP ----------
+    def _request_sync(self, method: str, path: str, body: Optional[Dict[str, Any]]) -> Tuple[int, Dict[str, str], str]:
+        req = urllib.request.Request(
+            self.base_url + path, method=method,
+            data=json.dumps(body).encode("utf-8") if body is not None else None,
+            headers={"Authorization": f"Bearer {self.token}", "Notion-Version": NOTION_VERSION,
+                     "Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return resp.status, dict(resp.headers), resp.read().decode("utf-8")
+        except urllib.error.HTTPError as e:
+            return e.code, dict(e.headers or {}), e.read().decode("utf-8", "replace")
+
+    async def _request(self, limiter: RateLimiter, method: str, path: str, body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire()
+            try:
+                status, headers, text = await asyncio.to_thread(self._request_sync, method, path, body)
+            except (urllib.error.URLError, OSError) as e:
+                status, headers, text = 0, {}, str(e)
+            if 200 <= status < 300:
+                return json.loads(text) if text else {}
+            if (status in (0, 409, 429) or status >= 500) and attempt < self.max_retries:
+                retry_after = headers.get("Retry-After") or headers.get("retry-after")
+                delay = float(retry_after) if retry_after else 0.5 * (2 ** attempt)
+                await asyncio.sleep(delay + random.uniform(0, 0.25))
+                continue
+            raise NotionError(status, text)
+        raise NotionError(0, "재시도 횟수 초과")
+
+    # ---------- 동기화 ----------
+    def pending_count(self, conn) -> int:
+        return db.outbox_count(conn)
+
+    def _load_batch(self, conn, limit: int):
+        with db.reading(conn) as c:
+            changes = [dict(r) for r in c.execute(
+                "SELECT o.kind, o.key, o.op, o.ver, p.page_id FROM sync_outbox o "
+                "LEFT JOIN notion_pages p ON p.kind = o.kind AND p.key = o.key "
+                "ORDER BY o.attempts ASC, o.queued_at ASC LIMIT ?", (limit,))]
+            rows: Dict[Tuple[str, str], Dict[str, Any]] = {}
+            for kind, _, _ in db.OUTBOX_SOURCES:
+                keys = [ch["key"] for ch in changes if ch["kind"] == kind and ch["op"] == "upsert"]
+                if keys:
+                    for key, row in db.outbox_rows(c, kind, keys).items():
+                        rows[(kind, key)] = row
+        return changes, rows
 
-    def sync_diary(self, diary_row: Dict[str,Any], d: date) -> int:
-        if not self.enabled or not diary_row: return 0
-        # TODO: notion_client.Client 로 pages.create/upsert 구현
-        return 1
+    async def _push_one(self, limiter, sem, ch, row) -> Tuple[str, Optional[str]]:
+        # 반환: ("ok", page_id) / ("deleted", None) / ("failed", 오류)
+        async with sem:
+            try:
+                if ch["op"] == "delete" or row is None:
+                    if ch["page_id"]:
+                        try:
+                            await self._request(limiter, "PATCH", f"/pages/{ch['page_id']}", {"archived": True})
+                        except NotionError as e:
+                            if e.status != 404:
+                                raise
+                    return "deleted", None
+                props = _properties(ch["kind"], row)
+                if ch["page_id"]:
+                    try:
+                        await self._request(limiter, "PATCH", f"/pages/{ch['page_id']}", {"properties": props})
+                        return "ok", ch["page_id"]
+                    except NotionError as e:
+                        if e.status != 404:  # 노션에서 지워진 페이지면 새로 만든다
+                            raise
+                page = await self._request(limiter, "POST", "/pages", {
+                    "parent": {"database_id": self._database_id(ch["kind"])}, "properties": props})
+                return "ok", page["id"]
+            except Exception as e:
+                return "failed", str(e)
 
-    def sync_memos(self, memos: List[Dict[str,Any]]) -> int:
-        if not self.enabled: return 0
-        return len(memos)
+    async def _sync(self, conn, limit: Optional[int], progress: Optional[Callable[[int, int], None]]) -> Dict[str, int]:
+        limiter = RateLimiter(self.rate)
+        sem = asyncio.Semaphore(self.concurrency)
+        res = {"synced": 0, "deleted": 0, "failed": 0}
+        total = self.pending_count(conn) if limit is None else min(limit, self.pending_count(conn))
+        attempted = set()
+        while limit is None or sum(res.values()) < limit:
+            size = self.batch_size if limit is None else min(self.batch_size, limit - sum(res.values()))
+            changes, rows = self._load_batch(conn, size + len(attempted))
+            # 이번 실행에서 이미 실패한 항목은 건너뛴다 (다음 동기화 때 재시도)
+            changes = [ch for ch in changes if (ch["kind"], ch["key"], ch["ver"]) not in attempted][:size]
+            if not changes:
+                break
+            results = await asyncio.gather(*[
+                self._push_one(limiter, sem, ch, rows.get((ch["kind"], ch["key"]))) for ch in changes])
+            now = datetime.now().isoformat(timespec="seconds")
+            mapped, unmapped, done, failed = [], [], [], []
+            for ch, (status, val) in zip(changes, results):
+                attempted.add((ch["kind"], ch["key"], ch["ver"]))
+                if status == "ok":
+                    mapped.append((ch["kind"], ch["key"], val, now))
+                    done.append((ch["kind"], ch["key"], ch["ver"]))
+                    res["synced"] += 1
+                elif status == "deleted":
+                    unmapped.append((ch["kind"], ch["key"]))
+                    done.append((ch["kind"], ch["key"], ch["ver"]))
+                    res["deleted"] += 1
+                else:
+                    failed.append((ch["kind"], ch["key"], ch["ver"]))
+                    res["failed"] += 1
+            # 배치 결과를 한 트랜잭션으로 반영. 전송 중 다시 바뀐 항목(ver 증가)은 대기열에 남긴다.
+            with db.writing(conn) as c:
+                c.executemany("INSERT INTO notion_pages(kind, key, page_id, synced_at) VALUES(?,?,?,?) "
+                              "ON CONFLICT(kind, key) DO UPDATE SET page_id=excluded.page_id, synced_at=excluded.synced_at", mapped)
+                c.executemany("DELETE FROM notion_pages WHERE kind=? AND key=?", unmapped)
+                c.executemany("DELETE FROM sync_outbox WHERE kind=? AND key=? AND ver=?", done)
+                c.executemany("UPDATE sync_outbox SET attempts=attempts+1 WHERE kind=? AND key=? AND ver=?", failed)
+            if progress:
+                progress(sum(res.values()), total)
+        return res
 
-    def sync_todos(self, todos: List[Dict[str,Any]]) -> int:
-        if not self.enabled: return 0
-        return len(todos)
+    def sync_pending(self, conn, limit: Optional[int] = None,
+                     progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+        # 대기 중인 변경분을 노션에 반영하고 {"synced", "deleted", "failed"} 건수를 반환
+        if not self.enabled:
+            return {"synced": 0, "deleted": 0, "failed": 0}
+        return asyncio.run(self._sync(conn, limit, progress))
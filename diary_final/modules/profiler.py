@@ -0,0 +1,290 @@
+# modules/profiler.py
+# 역할: 쿼리 프로파일링. 켜져 있을 때만 동작하고, 끄면 콜백/래퍼를 모두 떼어 내 비용이 0 이 된다.
+# - SQL 문장별 시간: trace 콜백이 문장 시작 시각을 기록하고, 같은 스레드의 다음 문장 또는
+#   db.reading/writing 블록 종료 시점에 끝난 것으로 본다 (결과를 다 읽는 시간까지 포함)
+# - db.py 공개 함수(첫 인자 conn)별 지연 시간 히스토그램, 반환 행 수
+# - 읽은 양: Python sqlite3 에는 문장별 스캔 행 수(sqlite3_stmt_status)가 없으므로
+#   progress handler 로 센 VM 명령 수를 근사치로 쓴다 (반환 행 대비 많으면 풀 스캔을 의심)
+# - 느린 쿼리 로그: SLOW_MS 이상 걸린 문장. EXPLAIN QUERY PLAN 은 패널에서 볼 때 읽기 전용 연결로 뽑는다
+# 사용: profiler.enable() / profiler.disable() / profiler.report() / profiler.slow_queries()
+
+import functools, inspect, re, sqlite3, sys, threading, time, weakref
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+SLOW_MS = 50.0
+SLOW_MAX = 100              # 느린 쿼리 로그 보관 건수
+STEP = 100                  # progress handler 호출 간격 (VM 명령 수)
+HIST_MS = (1, 5, 10, 50, 100, 500, 1000)  # 히스토그램 구간 상한(ms). 마지막 구간은 1000ms 초과
+
+_enabled = False
+_lock = threading.Lock()
+_local = threading.local()
+_conns: "weakref.WeakSet[sqlite3.Connection]" = weakref.WeakSet()
+_originals: List[Tuple[Any, str, Any]] = []   # (모듈, 이름, 원래 함수)
+_funcs: Dict[str, Dict[str, Any]] = {}
+_stmts: Dict[str, Dict[str, Any]] = {}
+_slow: "deque[Dict[str, Any]]" = deque(maxlen=SLOW_MAX)
+_since: Optional[str] = None
+
+# ---------- 연결 콜백 ----------
+def _tl():
+    tl = _local
+    if not hasattr(tl, "steps"):
+        tl.steps = 0
+        tl.pending = None   # (sql, 시작 시각, 시작 시 steps, api, path)
+        tl.api = []
+    return tl
+
+def _on_progress() -> int:
+    _tl().steps += 1
+    return 0
+
+def _on_trace(path: str, sql: str):
+    tl = _tl()
+    if sql.startswith("--"):
+        return  # 트리거 안의 문장: 바깥 문장 시간에 포함
+    _finish(tl)
+    tl.pending = (sql, time.perf_counter(), tl.steps, tl.api[-1] if tl.api else "", path)
+
+def _attach(conn):
+    path = getattr(conn, "path", "")
+    try:
+        conn.set_trace_callback(functools.partial(_on_trace, path))
+        conn.set_progress_handler(_on_progress, STEP)
+    except sqlite3.ProgrammingError:
+        pass  # 이미 닫힌 연결
+
+def _detach(conn):
+    try:
+        conn.set_trace_callback(None)
+        conn.set_progress_handler(None, 0)
+    except sqlite3.ProgrammingError:
+        pass
+
+def track(conn):
+    # db._configure 가 새 연결마다 호출. 켜져 있으면 바로 콜백을 붙인다
+    _conns.add(conn)
+    if _enabled:
+        _attach(conn)
+
+# ---------- 집계 ----------
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+def normalize(sql: str) -> str:
+    # 값만 다른 문장을 한 항목으로 모은다: 리터럴 → ?, (?,?,…) → (…)
+    s = _LITERALS.sub("?", " ".join(sql.split()))
+    return _LISTS.sub("(…)", s)[:400]
+
+def _bucket(ms: float) -> int:
+    for i, hi in enumerate(HIST_MS):
+        if ms <= hi:
+            return i
+    return len(HIST_MS)
+
+def _finish(tl):
+    p = tl.pending
+    if p is None:
+        return
+    tl.pending = None
+    sql, t0, s0, api, path = p
+    ms = (time.perf_counter() - t0) * 1000
+    steps = (tl.steps - s0) * STEP
+    key = normalize(sql)
+    with _lock:
+        st = _stmts.get(key)
+        if st is None:
+            st = _stmts[key] = {"sql": key, "count": 0, "total_ms": 0.0, "max_ms": 0.0, "steps": 0}
+        st["count"] += 1
+        st["total_ms"] += ms
+        st["max_ms"] = max(st["max_ms"], ms)
+        st["steps"] += steps
+        if ms >= SLOW_MS:
+            _slow.append({"at": datetime.now().isoformat(timespec="seconds"), "ms": round(ms, 2), "steps": steps,
+                          "api": api, "sql": sql[:2000], "path": path, "plan": None})
+
+def flush():
+    # 현재 스레드에서 진행 중인 문장을 끝난 것으로 기록
+    _finish(_tl())
+
+def _rows(v) -> Optional[int]:
+    if isinstance(v, tuple) and v and isinstance(v[0], list):
+        v = v[0]  # (페이지 행, 다음 커서)
+    if isinstance(v, list):
+        return len(v)
+    if isinstance(v, dict) and v and all(isinstance(x, list) for x in v.values()):
+        return sum(len(x) for x in v.values())
+    return None
+
+def _record(name: str, ms: float, steps: int, rows: Optional[int]):
+    with _lock:
+        f = _funcs.get(name)
+        if f is None:
+            f = _funcs[name] = {"name": name, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                "hist": [0] * (len(HIST_MS) + 1), "steps": 0, "rows": 0, "row_calls": 0}
+        f["count"] += 1
+        f["total_ms"] += ms
+        f["max_ms"] = max(f["max_ms"], ms)
+        f["hist"][_bucket(ms)] += 1
+        f["steps"] += steps
+        if rows is not None:
+            f["rows"] += rows
+            f["row_calls"] += 1
+
+# ---------- 래퍼 ----------
+def _timed(name: str, fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        tl = _tl()
+        tl.api.append(name)
+        s0, t0 = tl.steps, time.perf_counter()
+        val, ok = None, False
+        try:
+            val = fn(*args, **kwargs)
+            ok = True
+            return val
+        finally:
+            tl.api.pop()
+            _record(name, (time.perf_counter() - t0) * 1000, (tl.steps - s0) * STEP, _rows(val) if ok else None)
+    return wrapper
+
+def _span(fn):
+    # db.reading/writing 을 감싸 블록이 끝날 때(커밋 포함) 마지막 문장을 마감
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        cm = fn(*args, **kwargs)
+        return _SpanCM(cm)
+    return wrapper
+
+class _SpanCM:
+    def __init__(self, cm):
+        self.cm = cm
+
+    def __enter__(self):
+        return self.cm.__enter__()
+
+    def __exit__(self, *exc):
+        try:
+            return self.cm.__exit__(*exc)
+        finally:
+            flush()
+
+_SPANS = ("_reading", "_writing", "reading", "writing")
+
+def _db_modules(db) -> List[Any]:
+    # 감쌀 db 모듈들. app/ 의 modules.db 는 루트 db 를 diary_core_db 로 불러와 다시 내보내는 shim 이라,
+    # shim 으로 부르는 호출과 루트 db 안의 호출(다른 공개 함수·reading/writing)을 모두 잡으려면 둘 다 감싼다
+    core = sys.modules.get(db.reading.__module__)
+    return [db] if core is None or core is db else [db, core]
+
+def _api_names(mod, owners: Tuple[str, ...]) -> List[str]:
+    # owners: 이 모듈에서 정의했거나 다시 내보낸 함수의 원래 모듈 이름들
+    names = []
+    for name, fn in vars(mod).items():
+        if name.startswith("_") or not inspect.isfunction(fn) or fn.__module__ not in owners:
+            continue
+        if inspect.isgeneratorfunction(inspect.unwrap(fn)):
+            continue  # reading/writing/transaction 같은 컨텍스트 매니저
+        params = list(inspect.signature(fn).parameters)
+        if params and params[0] == "conn":
+            names.append(name)
+    return names
+
+# ---------- 켜기/끄기 ----------
+def enabled() -> bool:
+    return _enabled
+
+def enable():
+    global _enabled, _since
+    from modules import db
+    with _lock:
+        if _enabled:
+            return
+        mods = _db_modules(db)
+        owners = tuple(m.__name__ for m in mods)
+        for mod in mods:
+            for name in _api_names(mod, owners):
+                fn = getattr(mod, name)
+                _originals.append((mod, name, fn))
+                setattr(mod, name, _timed(name, fn))
+            for name in _SPANS:
+                if hasattr(mod, name):
+                    fn = getattr(mod, name)
+                    _originals.append((mod, name, fn))
+                    setattr(mod, name, _span(fn))
+        _enabled = True
+        _since = _since or datetime.now().isoformat(timespec="seconds")
+    for c in list(_conns):
+        _attach(c)
+
+def disable():
+    global _enabled
+    with _lock:
+        if not _enabled:
+            return
+        for mod, name, fn in _originals:
+            setattr(mod, name, fn)
+        _originals.clear()
+        _enabled = False
+    for c in list(_conns):
+        _detach(c)
+    flush()
+
+def reset():
+    global _since
+    with _lock:
+        _funcs.clear()
+        _stmts.clear()
+        _slow.clear()
+        _since = datetime.now().isoformat(timespec="seconds") if _enabled else None
+
+# ---------- 조회 ----------
+def report(top: int = 30) -> Dict[str, Any]:
+    # 함수별/문장별 집계. 시간은 ms, steps 는 VM 명령 수(근사)
+    with _lock:
+        funcs = [dict(f, hist=list(f["hist"])) for f in _funcs.values()]
+        stmts = [dict(s) for s in _stmts.values()]
+        slow_cnt = len(_slow)
+    for f in funcs:
+        f["avg_ms"] = round(f["total_ms"] / f["count"], 3)
+        f["steps_per_row"] = round(f["steps"] / f["rows"], 1) if f["rows"] else None
+    for s in stmts:
+        s["avg_ms"] = round(s["total_ms"] / s["count"], 3)
+    funcs.sort(key=lambda f: f["total_ms"], reverse=True)
+    stmts.sort(key=lambda s: s["total_ms"], reverse=True)
+    return {"enabled": _enabled, "since": _since, "hist_ms": list(HIST_MS), "functions": funcs,
+            "statements": stmts[:top], "slow_count": slow_cnt}
+
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+def _explain(path: str, sql: str) -> List[str]:
+    # 느린 문장을 별도 읽기 전용 연결에서 EXPLAIN QUERY PLAN. 행: (id, parent, notused, detail)
+    if not path or path == ":memory:" or not sql.lstrip().upper().startswith(_EXPLAINABLE):
+        return []
+    try:
+        c = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            rows = c.execute("EXPLAIN QUERY PLAN " + sql).fetchall()
+        finally:
+            c.close()
+    except sqlite3.Error as e:
+        return [f"(실행 계획 실패: {e})"]
+    parents = {r[0]: r[1] for r in rows}
+    out = []
+    for r in rows:
+        depth, p = 0, r[1]
+        while p and depth < 20:
+            depth, p = depth + 1, parents.get(p, 0)
+        out.append("  " * depth + r[3])
+    return out
+
+def slow_queries() -> List[Dict[str, Any]]:
+    # 느린 쿼리 로그 (최신순). 실행 계획은 처음 볼 때 한 번만 뽑아 둔다
+    with _lock:
+        entries = list(_slow)
+    for e in entries:
+        if e["plan"] is None:
+            e["plan"] = _explain(e["path"], e["sql"])
+    return entries[::-1]
@@ -0,0 +1,230 @@
+# modules/semantic.py
+# 역할: 오프라인 의미(유사도) 검색. 네트워크 모델 없이 글자 n-gram 해싱 + IDF 가중 코사인 유사도.
+# - 벡터는 DB 옆 파일(data/app.semantic.f32)에 float32 행렬로 두고 np.memmap 으로 연다
+# - 일기/메모가 바뀌면 db 트리거가 semantic_queue 에 id 를 기록 → refresh() 가 바뀐 행만 다시 임베딩
+# - 문서 빈도(df)는 따로 저장하지 않고 열 때 벡터 파일에서 다시 센다. 벡터 기록 뒤 대기열 삭제 전에 멈춰도
+#   다음 refresh 가 같은 행을 (지금 파일에 있는 벡터를 빼고) 다시 반영하므로 두 번 세지 않는다
+# - 검색은 행렬 × 질의 벡터 한 번 + argpartition 상위 k 개 (수만 건도 수 ms)
+
+import os, threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from modules import db
+
+DIM = 1024               # 해싱 차원 (행 하나 4KB)
+NGRAMS = (2, 3)          # 한국어는 어절보다 글자 2/3-gram 이 형태 변화에 강하다
+_KIND_CODE = {"diary": 1, "memo": 2}
+_CODE_KIND = {v: k for k, v in _KIND_CODE.items()}
+_MIX = np.int64(0x9E3779B1)
+
+def embed(text: str, dim: int = DIM) -> np.ndarray:
+    # 글자 n-gram 을 해싱해 센 뒤 로그 TF + L2 정규화 (float32)
+    t = " ".join((text or "").lower().split())
+    vec = np.zeros(dim, dtype=np.float32)
+    if not t:
+        return vec
+    codes = np.frombuffer(t.encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    grams = []
+    h = codes.copy()
+    for n in range(2, max(NGRAMS) + 1):
+        if len(codes) < n:
+            break
+        h = h[:-1] * 1000003 + codes[n - 1:]
+        if n in NGRAMS:
+            grams.append(h)
+    if not grams:
+        grams = [codes]
+    buckets = ((np.concatenate(grams) * _MIX) >> 7) % dim
+    counts = np.bincount(buckets, minlength=dim).astype(np.float32)
+    nz = counts > 0
+    vec[nz] = 1.0 + np.log(counts[nz])
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+class SemanticIndex:
+    """DB 하나에 대한 메모리 맵 벡터 색인. search() 전에 refresh() 로 대기열을 반영한다."""
+
+    def __init__(self, conn, db_path: str, dim: int = DIM):
+        self.conn = conn
+        self.dim = dim
+        base = os.path.splitext(os.path.abspath(db_path))[0]
+        self.vec_path = base + ".semantic.f32"
+        self._lock = threading.RLock()
+        self._open()
+
+    # ---------- 파일/메타데이터 ----------
+    def _open(self):
+        if not os.path.exists(self.vec_path) or os.path.getsize(self.vec_path) % (self.dim * 4):
+            self._reset_files()
+        self.capacity = max(1, os.path.getsize(self.vec_path) // (self.dim * 4))
+        self.mm = np.memmap(self.vec_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+        self.kinds = np.zeros(self.capacity, dtype=np.int8)   # 0: 빈 행
+        self.keys = np.zeros(self.capacity, dtype=np.int64)
+        with db.reading(self.conn) as c:
+            for slot, kind, key in c.execute("SELECT slot, kind, key FROM semantic_slots WHERE kind IS NOT NULL"):
+                if slot < self.capacity:
+                    self.kinds[slot], self.keys[slot] = _KIND_CODE[kind], key
+            self.next_slot = (c.execute("SELECT MAX(slot) FROM semantic_slots").fetchone()[0] or -1) + 1
+            self.free = [r[0] for r in c.execute("SELECT slot FROM semantic_slots WHERE kind IS NULL")]
+        self.df = self._count_df()
+
+    def _count_df(self, chunk: int = 8192) -> np.ndarray:
+        # 살아 있는 행(kinds > 0)에서 차원별로 0 이 아닌 행 수를 센다 (청크 단위라 메모리 일정)
+        df = np.zeros(self.dim, dtype=np.float64)
+        used = min(self.next_slot, self.capacity)
+        for i in range(0, used, chunk):
+            live = self.kinds[i:i + chunk] > 0
+            if live.any():
+                df += (self.mm[i:i + chunk][live] > 0).sum(axis=0)
+        return df
+
+    def _reset_files(self):
+        with open(self.vec_path, "wb") as f:
+            f.truncate(1024 * self.dim * 4)
+        # 벡터 파일이 없거나 깨졌으면 전체를 다시 대기열에 올린다
+        with db.writing(self.conn) as c:
+            c.execute("DELETE FROM semantic_slots")
+            for kind, src in db.SEMANTIC_SOURCES:
+                c.execute(f"INSERT OR IGNORE INTO semantic_queue(kind, key) SELECT '{kind}', id FROM {src}")
+
+    def _grow(self, need: int):
+        cap = self.capacity
+        while cap <= need:
+            cap *= 2
+        self.mm.flush()
+        del self.mm
+        with open(self.vec_path, "r+b") as f:
+            f.truncate(cap * self.dim * 4)
+        self.mm = np.memmap(self.vec_path, dtype=np.float32, mode="r+", shape=(cap, self.dim))
+        self.kinds = np.concatenate([self.kinds, np.zeros(cap - self.capacity, dtype=np.int8)])
+        self.keys = np.concatenate([self.keys, np.zeros(cap - self.capacity, dtype=np.int64)])
+        self.capacity = cap
+
+    def rebuild(self):
+        with self._lock:
+            del self.mm
+            self._reset_files()
+            self._open()
+            while self.refresh():
+                pass
+
+    # ---------- 증분 갱신 ----------
+    def pending(self) -> int:
+        with db.reading(self.conn) as c:
+            return c.execute("SELECT COUNT(*) FROM semantic_queue").fetchone()[0]
+
+    def refresh(self, batch: int = 2000) -> int:
+        # 대기열에서 batch 건을 반영하고 처리 건수를 반환 (0 이면 최신 상태)
+        with self._lock:
+            with db.reading(self.conn) as c:
+                queued = c.execute("SELECT kind, key, ver FROM semantic_queue LIMIT ?", (batch,)).fetchall()
+                if not queued:
+                    return 0
+                texts: Dict[tuple, str] = {}
+                slots: Dict[tuple, int] = {}
+                for kind, src in db.SEMANTIC_SOURCES:
+                    ids = [q["key"] for q in queued if q["kind"] == kind]
+                    for i in range(0, len(ids), 500):
+                        part = ids[i:i + 500]
+                        ph = ",".join(["?"] * len(part))
+                        for r in c.execute(f"SELECT id, text, tags FROM {src} WHERE id IN ({ph})", part):
+                            texts[(kind, r["id"])] = f"{r['text'] or ''} {r['tags'] or ''}"
+                        for r in c.execute(f"SELECT slot, key FROM semantic_slots WHERE kind=? AND key IN ({ph})", [kind, *part]):
+                            slots[(kind, r["key"])] = r["slot"]
+            upserts, frees = [], []
+            for q in queued:
+                k = (q["kind"], q["key"])
+                slot = slots.get(k)
+                if slot is not None:
+                    self.df -= self.mm[slot] > 0
+                if k in texts:
+                    if slot is None:
+                        if self.free:
+                            slot = self.free.pop()
+                        else:
+                            slot = self.next_slot
+                            self.next_slot += 1
+                            if slot >= self.capacity:
+                                self._grow(slot)
+                    vec = embed(texts[k], self.dim)
+                    self.mm[slot] = vec
+                    self.df += vec > 0
+                    self.kinds[slot], self.keys[slot] = _KIND_CODE[q["kind"]], q["key"]
+                    upserts.append((slot, q["kind"], q["key"]))
+                elif slot is not None:
+                    self.mm[slot] = 0
+                    self.kinds[slot] = 0
+                    self.free.append(slot)
+                    frees.append((slot,))
+            self.mm.flush()
+            try:
+                with db.writing(self.conn) as c:
+                    c.executemany("UPDATE semantic_slots SET kind=NULL, key=NULL WHERE slot=?", frees)
+                    c.executemany("INSERT INTO semantic_slots(slot, kind, key) VALUES(?,?,?) "
+                                  "ON CONFLICT(slot) DO UPDATE SET kind=excluded.kind, key=excluded.key", upserts)
+                    # 반영 도중 다시 바뀐 항목(ver 증가)은 대기열에 남겨 다음 refresh 에서 처리
+                    c.executemany("DELETE FROM semantic_queue WHERE kind=? AND key=? AND ver=?",
+                                  [(q["kind"], q["key"], q["ver"]) for q in queued])
+            except BaseException:
+                # 커밋 실패 → 슬롯/df 를 커밋된 상태에서 다시 읽는다 (대기열은 그대로라 다음 refresh 가 다시 반영)
+                del self.mm
+                self._open()
+                raise
+            return len(queued)
+
+    # ---------- 검색 ----------
+    def search(self, q: str, k: int = 10, kinds: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        qv = embed(q, self.dim)
+        if not qv.any():
+            return []
+        with self._lock:
+            n_docs = int((self.kinds > 0).sum())
+            if not n_docs:
+                return []
+            idf = np.log((n_docs + 1) / (self.df + 1)).astype(np.float32) + 1.0
+            qv = qv * idf
+            qv /= np.linalg.norm(qv)
+            used = self.next_slot
+            scores = np.asarray(self.mm[:used] @ qv)
+            mask = self.kinds[:used] > 0
+            if kinds:
+                mask &= np.isin(self.kinds[:used], [_KIND_CODE[x] for x in kinds])
+            scores = np.where(mask, scores, -np.inf)
+            k = min(k, int(mask.sum()))
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            hits = [(_CODE_KIND[int(self.kinds[i])], int(self.keys[i]), float(scores[i])) for i in top if scores[i] > 0]
+        return self._load(hits)
+
+    def _load(self, hits) -> List[Dict[str, Any]]:
+        out = []
+        with db.reading(self.conn) as c:
+            for kind, key, score in hits:
+                if kind == "diary":
+                    r = c.execute("SELECT id, d, mood, text, tags FROM diary WHERE id=?", (key,)).fetchone()
+                else:
+                    r = c.execute("SELECT id, created_at, pinned, text, tags FROM memos WHERE id=?", (key,)).fetchone()
+                if r:
+                    out.append({"kind": kind, "score": round(score, 4), **db.decode_row(r)})
+        return out
+
+_INDEXES: Dict[str, SemanticIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+def get_index(conn, db_path: str) -> SemanticIndex:
+    # 프로세스당 DB 파일별로 하나 (memmap 재사용)
+    key = os.path.abspath(db_path)
+    with _INDEXES_LOCK:
+        idx = _INDEXES.get(key)
+        if idx is None:
+            idx = _INDEXES[key] = SemanticIndex(conn, db_path)
+        return idx
+
+def drop_index(db_path: str) -> bool:
+    # 풀을 닫고 놓아 줄 때(shards LRU) 색인도 놓는다. 다음 get_index 가 파일에서 다시 연다
+    with _INDEXES_LOCK:
+        return _INDEXES.pop(os.path.abspath(db_path), None) is not None
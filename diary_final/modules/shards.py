@@ -0,0 +1,271 @@
+# modules/shards.py
+# 역할: 사용자별 DB 파일(샤드). 사용자마다 data/users/<해시 2자리>/<사용자>.db 를 따로 두어
+#       쓰기 잠금/WAL 이 사용자끼리 겹치지 않게 한다 (쓰기 처리량이 사용자 수만큼 늘어난다).
+# - Router: 사용자(세션) → 연결 풀. 열린 풀은 LRU 로 MAX_OPEN 개까지만 유지 (연결마다 db/wal/shm 파일 핸들)
+#   오래 안 쓴 풀부터 연결을 닫되, 사용 중(lease)이거나 IDLE_CLOSE 초 안에 쓴 풀은 닫지 않는다 (그동안은 상한을 잠시 넘김)
+#   밀려난 풀은 라우터·db.get_pool·의미 색인 등록에서 모두 빠져, 접속했던 사용자 수만큼 풀 객체가 쌓이지 않는다
+# - 관리/집계 조회는 샤드 전체에: fan_out(읽기 전용 연결로 병렬) 또는 attach_query(ATTACH + UNION ALL)
+#   둘 다 LRU 를 거치지 않으므로 전체를 훑어도 접속 중인 사용자의 풀이 밀려나지 않는다
+# 사용:
+#   router = shards.get_router()
+#   conn = router.pool("alice")            # db.* 함수에 그대로 넘긴다
+#   with router.lease("alice") as conn: …  # 블록 동안은 연결을 닫지 않음 (긴 작업)
+#   shards.fan_out(router, "SELECT COUNT(*) AS n FROM memos")
+
+import hashlib, os, re, sqlite3, threading, time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence
+from urllib.parse import quote, unquote
+
+from modules import db, jobs, semantic
+
+SHARD_DIR = os.path.join("data", "users")
+MAX_OPEN = 64          # 동시에 열어 둘 사용자 풀 수
+MAX_READERS = 2        # 사용자 풀당 읽기 연결 수 (사용자 한 명의 동시 요청은 많지 않음)
+IDLE_CLOSE = 60.0      # 마지막 사용 후 이 시간(초)이 지나야 LRU 에서 닫을 수 있다
+FANOUT_WORKERS = 8
+ATTACH_MAX = 10        # SQLite 기본 SQLITE_MAX_ATTACHED
+
+_NAME = re.compile(r"^[^\x00-\x1f/\\]{1,128}$")
+
+def _check_user(user: str) -> str:
+    user = (user or "").strip()
+    if not _NAME.match(user) or user in (".", ".."):
+        raise ValueError(f"사용자 이름 오류: {user!r}")
+    return user
+
+def shard_path(user: str, root: str = SHARD_DIR) -> str:
+    # 파일 이름은 사용자 이름을 퍼센트 인코딩 (되돌릴 수 있고 경로 조작 불가), 폴더는 해시 앞 2자리로 나눈다
+    user = _check_user(user)
+    sub = hashlib.sha1(user.encode("utf-8")).hexdigest()[:2]
+    return os.path.join(root, sub, quote(user, safe="") + ".db")
+
+def list_users(root: str = SHARD_DIR) -> List[str]:
+    if not os.path.isdir(root):
+        return []
+    users = []
+    for sub in os.listdir(root):
+        d = os.path.join(root, sub)
+        if os.path.isdir(d):
+            users += [unquote(n[:-3]) for n in os.listdir(d) if n.endswith(".db")]
+    return sorted(users)
+
+# ---------- 라우터 ----------
+class Router:
+    """사용자 → 연결 풀. LRU 로 연결이 열린 풀 수를 제한한다.
+    밀려난 풀은 연결을 닫고 등록에서 뺀다 (다음 pool() 은 새 풀). 밀려난 풀을 들고 있던 코드가 다시 쓰면
+    연결을 새로 열고(on_open), 그 사이 새 풀이 없으면 다시 등록돼 LRU 에 들어온다. 그래서 닫힌 DB 를 쓰는 오류는 생기지 않는다."""
+
+    def __init__(self, root: str = SHARD_DIR, max_open: int = MAX_OPEN, max_readers: int = MAX_READERS,
+                 idle_close: float = IDLE_CLOSE):
+        self.root = root
+        self.max_open = max_open
+        self.max_readers = max_readers
+        self.idle_close = idle_close
+        self._lock = threading.Lock()
+        self._pools: Dict[str, db.ConnectionPool] = {}
+        self._open: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # 연결이 열린 풀: user -> {"used", "leases"}
+        self.stats = {"hits": 0, "opens": 0, "evictions": 0}
+
+    def path(self, user: str) -> str:
+        return shard_path(user, self.root)
+
+    def _touch(self, user: str, lease: int) -> bool:
+        # self._lock 안에서 호출. 새로 LRU 에 들어왔으면 True
+        ent = self._open.get(user)
+        if ent is None:
+            self._open[user] = {"used": time.monotonic(), "leases": lease}
+            return True
+        self._open.move_to_end(user)
+        ent["used"] = time.monotonic()
+        ent["leases"] += lease
+        return False
+
+    def _get(self, user: str, lease: int) -> db.ConnectionPool:
+        user = _check_user(user)
+        with self._lock:
+            pool = self._pools.get(user)
+            if pool is not None:
+                added = self._touch(user, lease)
+                self.stats["hits" if not added else "opens"] += 1
+        if pool is None:
+            # 처음 보는 사용자: 파일 생성/스키마 초기화 (get_pool 이 경로별로 한 번만 한다)
+            path = self.path(user)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            pool = db.get_pool(path, max_readers=self.max_readers)
+            pool.on_open = lambda p, user=user: self._reopened(user, p)
+            with self._lock:
+                self._pools.setdefault(user, pool)
+                added = self._touch(user, lease)
+                self.stats["opens"] += 1
+        if added:
+            self._evict()
+        return pool
+
+    def _reopened(self, user: str, pool: db.ConnectionPool):
+        # 밀려난 풀을 누군가 다시 써서 연결이 열렸다. 그 사이 새 풀이 생겼으면 이 풀은 LRU 밖에서 쓰고 버려진다
+        with self._lock:
+            if self._pools.setdefault(user, pool) is not pool:
+                return
+            added = self._touch(user, 0)
+        if added:
+            self._evict()
+
+    def pool(self, user: str) -> db.ConnectionPool:
+        # 요청 하나(Streamlit 스크립트 실행 한 번) 동안 쓰는 풀
+        return self._get(user, 0)
+
+    @contextmanager
+    def lease(self, user: str):
+        # 오래 걸리는 작업용: 블록이 끝날 때까지 연결을 닫지 않는다
+        pool = self._get(user, 1)
+        try:
+            yield pool
+        finally:
+            with self._lock:
+                ent = self._open.get(user)
+                if ent is not None:
+                    ent["leases"] -= 1
+                    ent["used"] = time.monotonic()
+
+    def _evict(self):
+        # 오래된 것부터, 닫아도 되는 풀만 닫는다
+        now = time.monotonic()
+        victims = []
+        with self._lock:
+            over = len(self._open) - self.max_open
+            for user, ent in list(self._open.items()):
+                if over <= 0:
+                    break
+                pool = self._pools[user]
+                if ent["leases"] or now - ent["used"] < self.idle_close or pool.busy():
+                    continue
+                if not jobs.stop(pool):
+                    continue  # 백그라운드 작업 실행 중
+                del self._open[user]
+                del self._pools[user]
+                victims.append(pool)
+                over -= 1
+        for pool in victims:
+            pool.close()
+            db.forget_pool(pool)
+            semantic.drop_index(pool.path)
+            self.stats["evictions"] += 1
+
+    def close(self, user: Optional[str] = None):
+        # 연결 닫기. user 생략 시 모두 (종료/테스트용)
+        with self._lock:
+            users = [user] if user else list(self._open)
+            for u in users:
+                self._open.pop(u, None)
+            pools = [self._pools[u] for u in users if u in self._pools]
+        for pool in pools:
+            jobs.stop(pool)
+            pool.close()
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, open=len(self._open), max_open=self.max_open, known=len(self._pools),
+                        leased=sum(1 for e in self._open.values() if e["leases"]))
+
+_ROUTER: Optional[Router] = None
+_ROUTER_LOCK = threading.Lock()
+
+def get_router(root: str = SHARD_DIR) -> Router:
+    # 프로세스당 하나 (Streamlit 세션들이 공유)
+    global _ROUTER
+    with _ROUTER_LOCK:
+        if _ROUTER is None or _ROUTER.root != root:
+            _ROUTER = Router(root)
+        return _ROUTER
+
+# ---------- 샤드 전체 조회 ----------
+def _ro(path: str) -> sqlite3.Connection:
+    c = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True, check_same_thread=False)
+    c.row_factory = sqlite3.Row
+    c.execute("PRAGMA busy_timeout=5000")
+    return c
+
+def fan_out(router: Router, sql: str, params: Sequence[Any] = (), users: Optional[List[str]] = None,
+            workers: int = FANOUT_WORKERS) -> List[Dict[str, Any]]:
+    # 샤드마다 읽기 전용 연결로 같은 SQL 을 병렬 실행. 각 행에 "user" 를 붙여 반환 (실패한 샤드는 "error" 행)
+    users = users if users is not None else list_users(router.root)
+
+    def one(user: str) -> List[Dict[str, Any]]:
+        try:
+            c = _ro(router.path(user))
+            try:
+                return [dict(r, user=user) for r in c.execute(sql, params).fetchall()]
+            finally:
+                c.close()
+        except sqlite3.Error as e:
+            return [{"user": user, "error": str(e)}]
+
+    out: List[Dict[str, Any]] = []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(users) or 1)), thread_name_prefix="shard-fanout") as ex:
+        for rows in ex.map(one, users):
+            out += rows
+    return out
+
+def attach_query(router: Router, sql: str, params: Sequence[Any] = (), users: Optional[List[str]] = None,
+                 chunk: int = ATTACH_MAX) -> List[Dict[str, Any]]:
+    # sql 안의 {s} 를 샤드 스키마 이름으로 바꿔 ATTACH 한 샤드들을 UNION ALL 로 한 번에 조회 (chunk 개씩).
+    #   attach_query(router, "SELECT COUNT(*) AS n FROM {s}.memos")
+    # 샤드마다 연결을 여는 fan_out 보다 연결 수가 적고, 결과가 작은 집계에 알맞다
+    users = users if users is not None else list_users(router.root)
+    out: List[Dict[str, Any]] = []
+    for i in range(0, len(users), chunk):
+        part = users[i:i + chunk]
+        c = sqlite3.connect("file::memory:", uri=True)
+        c.row_factory = sqlite3.Row
+        try:
+            for j, user in enumerate(part):
+                c.execute(f"ATTACH DATABASE ? AS s{j}", (f"file:{quote(os.path.abspath(router.path(user)))}?mode=ro",))
+            union = " UNION ALL ".join(f"SELECT ? AS user, * FROM ({sql.format(s=f's{j}')})" for j in range(len(part)))
+            args: List[Any] = []
+            for user in part:
+                args += [user, *params]
+            out += [dict(r) for r in c.execute(union, args).fetchall()]
+        finally:
+            c.close()
+    return out
+
+def admin_summary(router: Router, users: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    # 사용자별 항목 수/최근 활동/파일 크기 (관리 화면용)
+    rows = fan_out(router, """
+        SELECT (SELECT COUNT(*) FROM diary) AS diary, (SELECT COUNT(*) FROM memos) AS memos,
+               (SELECT COUNT(*) FROM todos) AS todos,
+               (SELECT MAX(t) FROM (SELECT MAX(saved_at) AS t FROM diary UNION ALL SELECT MAX(created_at) FROM memos
+                                    UNION ALL SELECT MAX(created_at) FROM todos)) AS last_active""", users=users)
+    for r in rows:
+        path = router.path(r["user"])
+        r["bytes"] = sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+    return rows
+
+def global_daily_stats(router: Router, start_d=None, end_d=None, users: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    # 전체 사용자의 날짜별 합계 (daily_stats 를 ATTACH 로 모아 날짜별로 더함). 기분은 일기 수 가중 평균
+    where, params = "WHERE (diaries > 0 OR todo_total > 0)", []
+    if start_d:
+        where += " AND d >= ?"
+        params.append(db.day_num(start_d))
+    if end_d:
+        where += " AND d <= ?"
+        params.append(db.day_num(end_d))
+    acc: Dict[int, Dict[str, Any]] = {}
+    for r in attach_query(router, f"SELECT d, diaries, mood, text_len, word_cnt, todo_total, todo_done "
+                                  f"FROM {{s}}.daily_stats {where}", params, users):
+        a = acc.setdefault(r["d"], {"users": 0, "diaries": 0, "mood_sum": 0.0, "text_len": 0, "word_cnt": 0,
+                                    "todo_total": 0, "todo_done": 0})
+        a["users"] += 1
+        for k in ("diaries", "text_len", "word_cnt", "todo_total", "todo_done"):
+            a[k] += r[k] or 0
+        if r["mood"] is not None:
+            a["mood_sum"] += r["mood"] * (r["diaries"] or 0)
+    out = []
+    for d in sorted(acc):
+        a = acc[d]
+        mood_sum = a.pop("mood_sum")
+        out.append(dict(a, d=db.day_iso(d), mood=round(mood_sum / a["diaries"], 2) if a["diaries"] else None))
+    return out
@@ -6,18 +6,44 @@ import pandas as pd
 from html import escape
 from datetime import time
 
+from modules.db import HL_START, HL_END, PRIORITIES
+
 def ok(msg: str): st.toast(f"✅ {msg}")
 def warn(msg: str): st.toast(f"⚠️ {msg}")
 
-def render_diary_snippets(items):
+def render_tag_hints(items):
+    # db.tag_counts 결과를 자동완성 힌트로 표시
+    if items:
+        st.caption("태그: " + " ".join(f"#{escape(t['name'])}({t['cnt']})" for t in items))
+
+def calendar_label(day_num: int, info) -> str:
+    # db.get_month_overview 의 하루 정보 → 캘린더 버튼 라벨 (기분 + 할 일 달성도 색)
+    if not info:
+        return f"{day_num}"
+    label = f"{day_num} {info['mood'] or '📓'}" if info["has_diary"] else f"{day_num}"
+    total = info["open_cnt"] + info["done_cnt"]
+    if total:
+        rate = info["done_cnt"] / total
+        heat = "🟩" if rate == 1 else ("🟨" if rate >= 0.5 else ("🟧" if rate > 0 else "🟥"))
+        label += f" {heat}{info['done_cnt']}/{total}"
+    return label
+
+def _snippet_text(it) -> str:
+    # 목록 행(db 의 snippet/has_more) → 표시 문구. 잘린 경우만 … 를 붙인다
+    return escape(it.get("snippet") or "") + ("…" if it.get("has_more") else "")
+
+def render_diary_snippets(items, load_text):
+    # items: db.get_diary_page 결과 (본문 없음). load_text(date) 는 펼칠 때만 호출된다
     if not items:
         st.caption("최근 일기가 없습니다.")
         return
     for it in items:
-        text = (it.get("text") or "")[:140]
-        st.markdown(f"**{it.get('date')}** · {it.get('mood','')}  \n{escape(text)}…")
+        st.markdown(f"**{it.get('date')}** · {it.get('mood','')}  \n{_snippet_text(it)}")
+        if it.get("has_more") and st.toggle("전체 보기", key=f"diary_full_{it['date']}"):
+            st.text(load_text(it["date"]))
 
-def render_memos(items, on_update, on_delete):
+def render_memos(items, on_update, on_delete, load_text):
+    # items: db.list_memos_page 결과 (본문 없음). load_text(id) 는 펼치거나 수정할 때만 호출된다
     if not items:
         st.caption("등록된 메모가 없습니다.")
         return
@@ -29,7 +55,9 @@ def render_memos(items, on_update, on_delete):
         with col1:
             pin = "🔖 " if m.get("pinned") else ""
             tags = m.get("tags") or ""
-            st.markdown(f"**{pin}{escape(m.get('text',''))}** \n<small>{escape(tags)}</small> · <small>{escape(m.get('created_at',''))}</small>", unsafe_allow_html=True)
+            st.markdown(f"**{pin}{_snippet_text(m)}** \n<small>{escape(tags)}</small> · <small>{escape(m.get('created_at',''))}</small>", unsafe_allow_html=True)
+            if m.get("has_more") and not is_editing and st.toggle("전체 보기", key=f"memo_full_{mid}"):
+                st.text(load_text(mid))
 
         with col2:
             if st.button("수정", key=f"edit_m_{mid}", use_container_width=True):
@@ -42,7 +70,7 @@ def render_memos(items, on_update, on_delete):
         if is_editing:
             with st.expander("메모 수정", expanded=True):
                 with st.form(key=f"form_memo_{mid}"):
-                    text = st.text_area("내용", value=m['text'])
+                    text = st.text_area("내용", value=load_text(mid))
                     tags = st.text_input("태그", value=m['tags'])
                     pinned = st.checkbox("상단 고정", value=bool(m['pinned']))
 
@@ -71,7 +99,8 @@ def render_todos(items, on_toggle, on_update, on_delete):
                 st.rerun()
         with c2:
             due = t.get("due") or "--:--"
-            st.markdown(f"**{escape(t.get('title',''))}** \n<small>{due} · {t.get('priority','보통')}</small>", unsafe_allow_html=True)
+            tags = f" · {escape(t['tags'])}" if t.get("tags") else ""
+            st.markdown(f"**{escape(t.get('title',''))}** \n<small>{due} · {t.get('priority','보통')}{tags}</small>", unsafe_allow_html=True)
         with c3:
             if st.button("수정", key=f"edit_t_{tid}", use_container_width=True):
                 st.session_state['editing_todo_id'] = tid
@@ -87,22 +116,122 @@ def render_todos(items, on_toggle, on_update, on_delete):
                     current_due = time.fromisoformat(t['due']) if t['due'] else time(18, 0)
                     due = st.time_input("시간", value=current_due)
                     priority = st.selectbox("우선순위", ["보통", "높음", "긴급"], index=["보통", "높음", "긴급"].index(t['priority'] or '보통'))
+                    tags = st.text_input("태그", value=t.get('tags') or "")
 
                     sf1, sf2 = st.columns(2)
                     with sf1:
                         if st.form_submit_button("💾 저장", type="primary"):
-                            on_update(tid, title, due, priority)
+                            on_update(tid, title, due, priority, tags)
                     with sf2:
                         if st.form_submit_button("❌ 취소"):
                             st.session_state['editing_todo_id'] = None
                             st.rerun()
 
-def render_timeline(diaries, todos_summary):
+# ---------- 표 편집 (data_editor) ----------
+# 행마다 체크박스/버튼을 만드는 목록 대신 표 하나. 폼 안에 두어 편집하는 동안은 다시 실행되지 않고,
+# 저장을 누르면 편집 전/후 표의 차이만 on_save(added, updated, deleted) 로 넘긴다 (main.py → db.apply_edits, 커밋 1회)
+def _cell(v):
+    # 빈 칸(None/NaN/NaT/"") → None, numpy 값 → 파이썬 값
+    if v is None or isinstance(v, str) and not v.strip() or not isinstance(v, str) and pd.isna(v):
+        return None
+    return v.item() if hasattr(v, "item") else v
+
+def grid_changes(before, after, cols, required):
+    # before/after: id 열이 있는 DataFrame. 새 행은 id 가 비어 있다. required 열이 빈 새 행은 버리고, 기존 행에서 비우면 무시
+    old = {int(r["id"]): r for r in before.to_dict("records")}
+    added, updated, seen = [], {}, set()
+    for r in after.to_dict("records"):
+        row = {c: _cell(r.get(c)) for c in cols}
+        if _cell(r.get("id")) is None:
+            if row[required] is not None:
+                added.append(row)
+            continue
+        eid = int(r["id"])
+        seen.add(eid)
+        diff = {c: v for c, v in row.items() if v != _cell(old[eid].get(c)) and not (c == required and v is None)}
+        if diff:
+            updated[eid] = diff
+    return added, updated, [eid for eid in old if eid not in seen]
+
+def _render_grid(key, df, column_config, cols, required, on_save):
+    # 저장 후에는 편집기 key 를 바꿔 이전 편집 내용이 새 데이터 위에 다시 얹히지 않게 한다
+    ver = st.session_state.get(f"{key}_ver", 0)
+    with st.form(key=key):
+        edited = st.data_editor(df, key=f"{key}_editor_{ver}", num_rows="dynamic", hide_index=True,
+                                use_container_width=True, column_config={"id": None, **column_config})
+        if st.form_submit_button("💾 변경 저장", type="primary"):
+            added, updated, deleted = grid_changes(df, edited, cols, required)
+            if added or updated or deleted:
+                st.session_state[f"{key}_ver"] = ver + 1
+                on_save(added, updated, deleted)
+            else:
+                st.toast("바뀐 내용이 없습니다.")
+
+def render_todo_grid(items, on_save, key="todo_grid"):
+    # items: db.list_todos_for_date 결과. 추가 행에는 날짜가 없으므로 on_save 쪽에서 채운다
+    cols = ["done", "title", "due", "priority", "tags"]
+    df = pd.DataFrame([{"id": t["id"], "done": bool(t["done"]), "title": t["title"],
+                        "due": time.fromisoformat(t["due"]) if t.get("due") else None,
+                        "priority": t.get("priority") or "보통", "tags": t.get("tags") or ""} for t in items],
+                      columns=["id", *cols])
+    _render_grid(key, df, {
+        "done": st.column_config.CheckboxColumn("완료", default=False, width="small"),
+        "title": st.column_config.TextColumn("할 일", required=True, width="large"),
+        "due": st.column_config.TimeColumn("시간", format="HH:mm", step=60),
+        "priority": st.column_config.SelectboxColumn("우선순위", options=list(PRIORITIES.values()), default="보통", required=True),
+        "tags": st.column_config.TextColumn("태그", help="쉼표로 구분"),
+    }, cols, "title", on_save)
+
+def render_memo_grid(items, on_save, key="memo_grid"):
+    # items: 본문이 있는 메모 (db.get_memo). 작성 시각은 읽기 전용
+    cols = ["pinned", "text", "tags"]
+    df = pd.DataFrame([{"id": m["id"], "pinned": bool(m["pinned"]), "text": m["text"], "tags": m.get("tags") or "",
+                        "created_at": m.get("created_at")} for m in items],
+                      columns=["id", *cols, "created_at"])
+    _render_grid(key, df, {
+        "pinned": st.column_config.CheckboxColumn("고정", default=False, width="small"),
+        "text": st.column_config.TextColumn("내용", required=True, width="large"),
+        "tags": st.column_config.TextColumn("태그", help="쉼표로 구분"),
+        "created_at": st.column_config.TextColumn("작성", disabled=True),
+    }, cols, "text", on_save)
+
+AGENDA_SECTIONS = [("overdue", "⏰ 지난 할 일"), ("upcoming", "🗓️ 다가오는 7일"), ("backlog", "📥 날짜 없음")]
+
+def render_agenda(agenda, counts, on_toggle, on_move):
+    # db.get_agenda 결과. on_move(tid): 선택한 날짜로 옮기기
+    tabs = st.tabs([f"{label} ({counts[key]})" for key, label in AGENDA_SECTIONS])
+    for tab, (key, label) in zip(tabs, AGENDA_SECTIONS):
+        with tab:
+            items = agenda[key]
+            if not items:
+                st.caption("없습니다.")
+                continue
+            for t in items:
+                tid = t["id"]
+                c1, c2, c3 = st.columns([0.1, 0.65, 0.25])
+                with c1:
+                    if st.checkbox(" ", value=False, key=f"agenda_done_{tid}"):
+                        on_toggle(tid, True)
+                        st.rerun()
+                with c2:
+                    when = " ".join(x for x in (t.get("d") and t["d"][5:], t.get("due")) if x) or "날짜 없음"
+                    st.markdown(f"**{escape(t.get('title', ''))}** \n<small>{when} · {t.get('priority', '보통')}</small>",
+                                unsafe_allow_html=True)
+                with c3:
+                    if st.button("여기로", key=f"agenda_move_{tid}", use_container_width=True, help="선택한 날짜로 옮기기"):
+                        on_move(tid)
+                        st.rerun()
+            if counts[key] > len(items):
+                st.caption(f"… 외 {counts[key] - len(items)}개")
+
+def render_timeline(diaries, todos_summary, load_text):
+    # diaries: db.list_diaries_between 결과 (본문 없음). load_text(date) 는 펼칠 때만 호출된다
     st.markdown("#### 일기 요약")
     if diaries:
         for d in diaries:
-            text = (d.get("text") or "")[:120]
-            st.markdown(f"- **{d['d']}** · {d.get('mood','')} — {escape(text)}…")
+            st.markdown(f"- **{d['d']}** · {d.get('mood','')} — {_snippet_text(d)}")
+            if d.get("has_more") and st.toggle("전체 보기", key=f"timeline_full_{d['d']}"):
+                st.text(load_text(d["d"]))
     else:
         st.caption("선택한 범위의 일기가 없습니다.")
 
@@ -113,45 +242,185 @@ def render_timeline(diaries, todos_summary):
     else:
         st.caption("선택한 범위의 할 일 기록이 없습니다.")
 
-def render_charts(diaries, todos_summary):
+def render_charts(stats):
+    # stats: db.get_daily_stats 결과 (구간별 mood 평균 1~5, todo_total/todo_done, word_cnt)
     st.subheader("📊 데이터 시각화", divider="gray")
-    col1, col2 = st.columns(2)
+    if not stats:
+        st.caption("차트를 표시할 데이터가 없습니다.")
+        return
+    df = pd.DataFrame(stats)
+    df['d'] = pd.to_datetime(df['d'])
+    df = df.set_index('d')
+    col1, col2, col3 = st.columns(3)
 
     with col1:
         st.markdown("##### 😊 기분 변화 추이")
-        if diaries:
-            mood_map = {"😣": 1, "😕": 2, "😐": 3, "🙂": 4, "😄": 5}
-            df_mood = pd.DataFrame(diaries)
-            df_mood['mood_val'] = df_mood['mood'].map(mood_map)
-            df_mood['d'] = pd.to_datetime(df_mood['d'])
-            df_mood = df_mood.set_index('d')
-            st.line_chart(df_mood['mood_val'])
+        if df['mood'].notna().any():
+            st.line_chart(df['mood'].dropna())
         else:
             st.caption("차트를 표시할 일기 데이터가 없습니다.")
 
     with col2:
         st.markdown("##### 📈 할 일 완료율 (%)")
-        if todos_summary:
-            df_todos = pd.DataFrame(todos_summary)
-            df_todos['rate'] = (df_todos['done_cnt'] / df_todos['total_cnt'] * 100).round(1)
-            df_todos['d'] = pd.to_datetime(df_todos['d'])
-            df_todos = df_todos.set_index('d')
-            st.bar_chart(df_todos['rate'])
+        todos = df[df['todo_total'] > 0]
+        if not todos.empty:
+            st.bar_chart((todos['todo_done'] / todos['todo_total'] * 100).round(1).rename('rate'))
         else:
             st.caption("차트를 표시할 할 일 데이터가 없습니다.")
 
+    with col3:
+        st.markdown("##### ✍️ 일기 단어 수")
+        if df['word_cnt'].any():
+            st.bar_chart(df['word_cnt'])
+        else:
+            st.caption("차트를 표시할 일기 데이터가 없습니다.")
+
+def render_stats_table(stats):
+    if not stats:
+        st.caption("선택한 범위의 기록이 없습니다.")
+        return
+    st.dataframe(
+        pd.DataFrame(stats).rename(columns={
+            "d": "시작일", "diaries": "일기", "mood": "기분(평균)", "text_len": "글자 수",
+            "word_cnt": "단어 수", "todo_total": "할 일", "todo_done": "완료",
+        }),
+        hide_index=True, use_container_width=True,
+    )
+
+def _highlight(snippet: str) -> str:
+    # db.search_all 의 snippet 강조 표시(HL_START/HL_END)를 <mark> 로 변환
+    return escape(snippet or "").replace(HL_START, "<mark>").replace(HL_END, "</mark>")
+
 def render_search_results(results):
     st.markdown("### 결과")
     for k in ["일기","메모","할 일"]:
         data = results.get(k,[])
         st.markdown(f"#### {k} ({len(data)}건)")
-        if not data:
-            st.caption("결과 없음")
-            continue
-        for r in data:
-            if k == "일기":
-                st.markdown(f"- **{r['d']}** · {r.get('mood','')} — {(r.get('text') or '')[:120]}…")
-            elif k == "메모":
-                st.markdown(f"- **{r.get('text','')}** \n<small>{r.get('tags','')}</small> · <small>{r.get('created_at','')}</small>", unsafe_allow_html=True)
-            else:
-                st.markdown(f"- **[{r['d']}] {r.get('title','')}** \n<small>{r.get('due') or '--:--'} · {r.get('priority','보통')} · {'완료' if r.get('done') else '미완료'}</small>", unsafe_allow_html=True)
\ No newline at end of file
+        render_search_section(k, data)
+
+def render_search_section(k, data):
+    if not data:
+        st.caption("결과 없음")
+        return
+    for r in data:
+        if k == "일기":
+            st.markdown(f"- **{r['d']}** · {r.get('mood','')} — {_highlight(r.get('snippet'))}", unsafe_allow_html=True)
+        elif k == "메모":
+            st.markdown(f"- **{_highlight(r.get('snippet'))}** \n<small>{escape(r.get('tags') or '')}</small> · <small>{r.get('created_at','')}</small>", unsafe_allow_html=True)
+        else:
+            st.markdown(f"- **[{r['d']}] {_highlight(r.get('snippet'))}** \n<small>{r.get('due') or '--:--'} · {r.get('priority','보통')} · {'완료' if r.get('done') else '미완료'}</small>", unsafe_allow_html=True)
+
+def render_semantic_results(results):
+    st.markdown(f"### 비슷한 항목 ({len(results)}건)")
+    if not results:
+        st.caption("결과 없음")
+        return
+    for r in results:
+        body = escape(" ".join((r.get("text") or "").split())[:120])
+        if r["kind"] == "diary":
+            st.markdown(f"- **{r['d']}** · {r.get('mood','')} — {body} <small>({r['score']:.2f})</small>", unsafe_allow_html=True)
+        else:
+            st.markdown(f"- 📝 {body} \n<small>{escape(r.get('tags') or '')}</small> · <small>{r.get('created_at','')} ({r['score']:.2f})</small>", unsafe_allow_html=True)
+
+# ---------- 페이지 이동 (키셋 커서) ----------
+# 세션에 지나온 페이지의 커서만 쌓아 두고, 매 실행마다 현재 페이지 하나만 조회·렌더링한다.
+def page_cursor(key, scope=None):
+    # 현재 페이지 커서. scope(검색어/필터 등)가 바뀌면 첫 페이지로 돌아간다
+    state = st.session_state.get(f"pager_{key}")
+    if state is None or state["scope"] != scope:
+        state = st.session_state[f"pager_{key}"] = {"scope": scope, "stack": [None]}
+    return state["stack"][-1]
+
+def render_pager(key, next_cursor):
+    stack = st.session_state[f"pager_{key}"]["stack"]
+    if len(stack) == 1 and next_cursor is None:
+        return
+    c1, c2, c3 = st.columns([0.3, 0.4, 0.3])
+    with c1:
+        if st.button("◀ 이전", key=f"pager_prev_{key}", disabled=len(stack) == 1, use_container_width=True):
+            stack.pop()
+            st.rerun()
+    with c2:
+        st.caption(f"{len(stack)} 페이지")
+    with c3:
+        if st.button("더 보기 ▶", key=f"pager_next_{key}", disabled=next_cursor is None, use_container_width=True):
+            stack.append(next_cursor)
+            st.rerun()
+
+# ---------- 일기 자동 저장 ----------
+def render_autosave(status):
+    # status: autosave.status 결과
+    state = status["state"]
+    if state == "pending":
+        st.caption("⏳ 저장 대기 중…")
+    elif state == "saving":
+        st.caption("💾 저장 중…")
+    elif state == "saved":
+        st.caption(f"✅ 자동 저장됨 · {status['saved_at']}")
+    elif state == "error":
+        st.caption(f"⚠️ 자동 저장 실패, 다시 시도합니다: {status['error']}")
+    else:
+        st.caption("자동 저장: 입력 칸을 벗어나면 몇 초 안에 저장됩니다.")
+
+# ---------- 백그라운드 작업 ----------
+JOB_STATUS = {"queued": "⏳ 대기", "running": "▶️ 실행 중", "done": "✅ 완료", "failed": "❌ 실패", "cancelled": "⏹️ 취소"}
+
+def render_jobs(items, on_cancel):
+    # items: jobs.list_jobs 결과. 진행 중 작업은 진행 막대 + 취소 버튼
+    if not items:
+        st.caption("실행한 작업이 없습니다.")
+        return
+    for j in items:
+        active = j["status"] in ("queued", "running")
+        c1, c2 = st.columns([0.8, 0.2])
+        with c1:
+            st.markdown(f"**{j['label']}** · {JOB_STATUS.get(j['status'], j['status'])} <small>{j['created_at'] or ''}</small>", unsafe_allow_html=True)
+            if j["status"] == "running":
+                rate = j["done"] / j["total"] if j["total"] else 0.0
+                st.progress(min(1.0, rate), text=f"{j['message'] or ''} {j['done']}/{j['total']}")
+            elif j["message"] and j["status"] != "done":
+                st.caption(j["message"])
+            elif j["result"]:
+                st.caption(", ".join(f"{k}: {v}" for k, v in j["result"].items() if not isinstance(v, list))
+                           or " · ".join(j["result"].get("paths", [])))
+        with c2:
+            if active and st.button("취소", key=f"job_cancel_{j['id']}", disabled=bool(j["cancel"]), use_container_width=True):
+                on_cancel(j["id"])
+
+# ---------- 쿼리 프로파일링 ----------
+def _hist_labels(bounds):
+    return [f"≤{b}ms" for b in bounds] + [f">{bounds[-1]}ms"]
+
+def render_profile(report, slow):
+    # report: profiler.report(), slow: profiler.slow_queries()
+    if not report["functions"] and not report["statements"]:
+        st.caption("아직 기록이 없습니다. 앱을 사용한 뒤 다시 확인하세요.")
+        return
+    st.caption(f"수집 시작: {report['since'] or '-'} · VM 명령 수는 progress handler 기준 근사치(스캔량 지표)")
+
+    st.markdown("##### 함수별 지연 시간")
+    labels = _hist_labels(report["hist_ms"])
+    rows = []
+    for f in report["functions"]:
+        row = {"함수": f["name"], "호출": f["count"], "평균(ms)": f["avg_ms"], "최대(ms)": round(f["max_ms"], 2),
+               "합계(ms)": round(f["total_ms"], 1), "반환 행": f["rows"] if f["row_calls"] else None,
+               "VM 명령/행": f["steps_per_row"]}
+        row.update(zip(labels, f["hist"]))
+        rows.append(row)
+    st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+
+    st.markdown("##### SQL 문장 (총 시간순)")
+    st.dataframe(pd.DataFrame([{
+        "SQL": s["sql"], "실행": s["count"], "평균(ms)": s["avg_ms"], "최대(ms)": round(s["max_ms"], 2),
+        "합계(ms)": round(s["total_ms"], 1), "VM 명령": s["steps"],
+    } for s in report["statements"]]), hide_index=True, use_container_width=True)
+
+    st.markdown(f"##### 느린 쿼리 ({len(slow)}건)")
+    if not slow:
+        st.caption("기준 시간을 넘은 쿼리가 없습니다.")
+    for e in slow:
+        with st.expander(f"{e['ms']:.1f}ms · {e['api'] or '직접 실행'} · {e['at']}"):
+            st.code(e["sql"], language="sql")
+            if e["plan"]:
+                st.code("\n".join(e["plan"]), language="text")
+            st.caption(f"VM 명령 약 {e['steps']:,}개")
@@ -0,0 +1,46 @@
+# tests/test_api.py
+# 역할: modules/api.call 의 ETag / 응답 캐시 키 확인 (HTTP 서버 없이 call 을 바로 부른다).
+# 실행 (diary_final/ 에서): python -m pytest -q tests
+
+import os, shutil, tempfile, unittest
+from datetime import date
+from unittest import mock
+
+from modules import api, db
+
+def _today(d: date):
+    class FixedDate(date):
+        @classmethod
+        def today(cls):
+            return d
+    return mock.patch.object(api, "date", FixedDate)
+
+class AgendaEtagTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.conn = db.get_pool(os.path.join(self.tmp, "app.db"))
+        db.add_todo(self.conn, "내일 할 일", date(2024, 5, 2), None, "보통")
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_omitted_today_changes_etag_after_midnight(self):
+        with _today(date(2024, 5, 1)):
+            status, body, etag, key = api.call(self.conn, "GET", "/api/agenda")
+            self.assertEqual((status, body["counts"]["upcoming"]), (200, 1))
+            self.assertEqual(api.call(self.conn, "GET", "/api/agenda", if_none_match=etag)[0], 304)
+        with _today(date(2024, 5, 3)):
+            status, body, etag2, key2 = api.call(self.conn, "GET", "/api/agenda", if_none_match=etag)
+            self.assertEqual((status, body["counts"]["overdue"], body["counts"]["upcoming"]), (200, 1, 0))
+        self.assertNotEqual(etag, etag2)
+        self.assertNotEqual(key, key2)
+
+    def test_explicit_today_etag_is_stable(self):
+        with _today(date(2024, 5, 1)):
+            etag = api.call(self.conn, "GET", "/api/agenda?today=2024-05-01")[2]
+        with _today(date(2024, 5, 3)):
+            self.assertEqual(api.call(self.conn, "GET", "/api/agenda?today=2024-05-01", if_none_match=etag)[0], 304)
+
+if __name__ == "__main__":
+    unittest.main()
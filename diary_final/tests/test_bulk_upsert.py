@@ -0,0 +1,88 @@
+# tests/test_bulk_upsert.py
+# 역할: bulk_upsert 확인 — 같은 입력을 다시 넣으면 바뀌는 게 없는지, 배치 경계/입력 안 중복, 떼어 둔 파생 트리거가
+#       성공·실패 모두에서 그대로 돌아오는지, 끝에 한 번 반영한 FTS/집계/태그가 트리거로 만든 것과 같은지.
+# 실행 (diary_final/ 에서): python -m pytest -q tests
+
+import os, shutil, tempfile, unittest
+from datetime import date
+
+from modules import db
+
+def _triggers(conn):
+    with db.reading(conn) as c:
+        return c.execute("SELECT name, sql FROM sqlite_master WHERE type='trigger' ORDER BY name").fetchall()
+
+class BulkUpsertTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.conn = db.get_pool(os.path.join(self.tmp, "app.db"))
+        self.diary = [{"d": f"2024-05-{i:02d}", "text": f"{i}일 산책 기록", "mood": "🙂", "tags": "산책,기록",
+                       "saved_at": f"2024-05-{i:02d}T21:00:00"} for i in range(1, 8)]
+        # 같은 자연 키 (created_at, text) 메모 2건은 두 행으로 남는다
+        self.memos = [{"text": "같은 메모", "tags": "", "created_at": "2024-05-01T09:00:00"}] * 2 + \
+                     [{"text": "다른 메모", "tags": "업무", "pinned": 1, "created_at": "2024-05-01T10:00:00"}]
+        self.todos = [{"title": "날짜 없는 할 일", "d": None, "priority": "높음", "created_at": "2024-05-01T08:00:00"},
+                      {"title": "장보기", "d": "2024-05-03", "due": "18:00", "created_at": "2024-05-01T08:00:00", "tags": "집"}]
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _import_all(self, batch: int = 3):
+        return {kind: db.bulk_upsert(self.conn, kind, rows, batch=batch)
+                for kind, rows in (("diary", self.diary), ("memos", self.memos), ("todos", self.todos))}
+
+    def test_second_import_is_noop(self):
+        triggers = _triggers(self.conn)
+        first = self._import_all()
+        self.assertEqual(first["diary"], {"rows": 7, "inserted": 7, "updated": 0, "unchanged": 0})
+        self.assertEqual(first["memos"]["inserted"], 3)
+        self.assertEqual(first["todos"]["inserted"], 2)
+        with db.reading(self.conn) as c:
+            before = [c.execute(f"SELECT * FROM {t} ORDER BY 1, 2, 3").fetchall() for t in ("diary", "memos", "todos", "entity_tags")]
+        again = self._import_all(batch=2)
+        for kind, res in again.items():
+            self.assertEqual((res["inserted"], res["updated"], res["unchanged"]), (0, 0, res["rows"]), kind)
+        with db.reading(self.conn) as c:
+            after = [c.execute(f"SELECT * FROM {t} ORDER BY 1, 2, 3").fetchall() for t in ("diary", "memos", "todos", "entity_tags")]
+        self.assertEqual([[tuple(r) for r in t] for t in after], [[tuple(r) for r in t] for t in before])
+        self.assertEqual(_triggers(self.conn), triggers)
+
+    def test_update_refreshes_derived_data_once(self):
+        self._import_all()
+        self.diary[2] = dict(self.diary[2], text="3일 바닷가 수영", mood="😄", tags="여행")
+        res = db.bulk_upsert(self.conn, "diary", self.diary, batch=4)
+        self.assertEqual((res["inserted"], res["updated"], res["unchanged"]), (0, 1, 6))
+        # FTS: 새 본문으로 찾히고 예전 본문으로는 그날이 안 나온다
+        hits = db.search_all(self.conn, "바닷가", ["일기"], [], "전체", [])["일기"]
+        self.assertEqual([r["d"] for r in hits], ["2024-05-03"])
+        hits = db.search_all(self.conn, "산책 기록", ["일기"], [], "전체", [])["일기"]
+        self.assertNotIn("2024-05-03", [r["d"] for r in hits])
+        with db.writing(self.conn) as c:
+            c.execute("INSERT INTO diary_fts(diary_fts, rank) VALUES('integrity-check', 1)")
+        # 집계와 태그도 바뀐 값으로
+        day = db.get_daily_stats(self.conn, date(2024, 5, 3), date(2024, 5, 3))[0]
+        self.assertEqual((day["diaries"], day["mood"], day["text_len"]), (1, 5, len("3일 바닷가 수영")))
+        self.assertEqual({t["name"]: t["cnt"] for t in db.tag_counts(self.conn, kind="diary")},
+                         {"산책": 6, "기록": 6, "여행": 1})
+        # 끝에 한 번 반영한 파생 데이터가 트리거로 저장한 것과 같다
+        db.upsert_diary(self.conn, date(2024, 5, 3), "3일 바닷가 수영", "😄", ["여행"])
+        self.assertEqual(db.get_daily_stats(self.conn, date(2024, 5, 3), date(2024, 5, 3))[0], day)
+
+    def test_failed_import_restores_triggers(self):
+        triggers = _triggers(self.conn)
+        def rows():
+            yield from self.diary[:4]
+            raise RuntimeError("읽기 실패")
+        with self.assertRaises(RuntimeError):
+            db.bulk_upsert(self.conn, "diary", rows(), batch=2)
+        self.assertEqual(_triggers(self.conn), triggers)
+        with db.writing(self.conn) as c:  # 임시 표는 쓰기 연결에 있다
+            self.assertEqual(c.execute("SELECT COUNT(*) FROM diary").fetchone()[0], 0)
+            self.assertIsNone(c.execute("SELECT 1 FROM sqlite_temp_master WHERE name LIKE '\\_upsert%' ESCAPE '\\'").fetchone())
+        # 트리거가 다시 붙었으므로 일반 저장은 파생 데이터를 채운다
+        db.upsert_diary(self.conn, date(2024, 5, 1), "트리거 확인", "🙂", [])
+        self.assertEqual(len(db.search_all(self.conn, "트리거 확인", ["일기"], [], "전체", [])["일기"]), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+# tests/test_export_import.py
+# 역할: 내보내기 아카이브(zip / jsonl.gz)를 importer 로 다시 가져오는 왕복 확인 — 삭제 기록(deleted) 멤버 포함.
+# 실행 (diary_final/ 에서): python -m pytest -q tests
+
+import os, shutil, tempfile, unittest
+from datetime import date
+
+from modules import db, export, importer
+
+class ExportImportRoundTripTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.src = db.get_pool(os.path.join(self.tmp, "src.db"))
+        db.upsert_diary(self.src, date(2024, 5, 1), "첫째 날", "🙂", ["여행"])
+        db.upsert_diary(self.src, date(2024, 5, 2), "둘째 날", "😐", [])
+        db.add_memo(self.src, "남길 메모", ["업무"], True)
+        self.gone = db.add_memo(self.src, "지울 메모", [], False)
+        db.add_todo(self.src, "날짜 있는 할 일", date(2024, 5, 1), None, "높음", ["집"])
+        db.add_todo(self.src, "날짜 없는 할 일", None, None, "보통")
+
+    def tearDown(self):
+        self.src.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _archive(self, fmt: str, since=None):
+        path = os.path.join(self.tmp, f"export_{len(os.listdir(self.tmp))}{export.FORMATS[fmt][1]}")
+        with open(path, "wb") as f:
+            marks = export.write_archive(self.src, f, fmt=fmt, since=since)
+        return path, marks
+
+    def _contents(self, conn):
+        with db.reading(conn) as c:
+            return (sorted(tuple(r) for r in c.execute("SELECT d, text, mood, tags FROM diary")),
+                    sorted(tuple(r) for r in c.execute("SELECT text, tags, pinned, created_at FROM memos")),
+                    sorted(tuple(r) for r in c.execute("SELECT title, COALESCE(d, -1), priority, done, tags FROM todos")))
+
+    def _round_trip(self, fmt: str):
+        dst = db.get_pool(os.path.join(self.tmp, f"dst_{fmt}.db"))
+        try:
+            path, marks = self._archive(fmt)
+            res = importer.import_paths(dst, [path])
+            self.assertEqual((res["errors"], res["skipped"]), ([], 0))
+            self.assertEqual(self._contents(dst), self._contents(self.src))
+            # 같은 아카이브를 다시 가져와도 그대로
+            again = importer.import_paths(dst, [path])
+            self.assertEqual(sum(r.get("inserted", 0) + r.get("updated", 0) for r in again["tables"].values()), 0)
+
+            # 원본에서 지운 일기/메모 → 증분 아카이브의 deleted 로 넘어온다
+            db.delete_memo(self.src, self.gone)
+            with db.writing(self.src) as c:
+                c.execute("DELETE FROM diary WHERE d=?", (db.day_num(date(2024, 5, 2)),))
+            path, _ = self._archive(fmt, since=marks)
+            res = importer.import_paths(dst, [path])
+            self.assertEqual((res["errors"], res["skipped"]), ([], 0))
+            self.assertEqual(res["tables"]["deleted"], {"rows": 2, "deleted": 1, "unchanged": 1})
+            with db.reading(dst) as c:
+                self.assertEqual([r[0] for r in c.execute("SELECT d FROM diary")], [db.day_num(date(2024, 5, 1))])
+                # 메모 id 는 DB 마다 달라 삭제를 옮기지 않는다
+                self.assertEqual(c.execute("SELECT COUNT(*) FROM memos").fetchone()[0], 2)
+        finally:
+            dst.close()
+
+    def test_zip_round_trip(self):
+        self._round_trip("zip")
+
+    def test_jsonl_round_trip(self):
+        self._round_trip("jsonl.gz")
+
+    def test_full_export_keeps_incremental_marks(self):
+        f, name, _ = export.build_archive(self.src, incremental=True)
+        f.close()
+        marks = db.get_export_marks(self.src)
+        self.assertTrue(marks)
+        db.add_memo(self.src, "백업 뒤 메모", [], False)
+        f, name, _ = export.build_archive(self.src)  # 전체 백업
+        f.close()
+        self.assertIn("_full_", name)
+        self.assertEqual(db.get_export_marks(self.src), marks)
+        # 다음 증분에는 백업 뒤 메모가 그대로 들어 있다
+        path, _ = self._archive("jsonl.gz", since=marks)
+        rows = [r for _, _, _, r in importer.read_rows([path])]
+        self.assertIn("백업 뒤 메모", [r.get("text") for r in rows])
+
+    def test_incremental_does_not_repeat_boundary_rows(self):
+        _, marks = self._archive("zip")
+        path, again = self._archive("jsonl.gz", since=marks)
+        self.assertEqual(list(importer.read_rows([path])), [])
+        self.assertEqual(again, marks)
+        mid = db.add_memo(self.src, "새 메모", [], False)
+        path, _ = self._archive("jsonl.gz", since=marks)
+        self.assertEqual([(t, r["id"]) for t, _, _, r in importer.read_rows([path])], [("memos", mid)])
+
+    def test_cli_exit_code(self):
+        path, _ = self._archive("zip")
+        self.assertEqual(importer.main([path, "--db", os.path.join(self.tmp, "cli.db")]), 0)
+
+if __name__ == "__main__":
+    unittest.main()
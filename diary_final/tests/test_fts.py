@@ -0,0 +1,71 @@
+# tests/test_fts.py
+# 역할: FTS5 trigram 검색 확인 — 한국어 어절 중간 부분 일치, bm25 순위, 강조 snippet, 짧은 검색어(LIKE) 섞기,
+#       트리거로 본문 수정/삭제가 색인에 반영되는지, 찾는 행이 LIKE 전체 훑기와 같은지.
+# 실행 (diary_final/ 에서): python -m pytest -q tests
+
+import os, shutil, tempfile, unittest
+from datetime import date
+from unittest import mock
+
+from modules import db
+
+class FtsSearchTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.conn = db.get_pool(os.path.join(self.tmp, "app.db"))
+        self.many = db.add_memo(self.conn, "수영장 수영장 수영장 다녀옴", [], False)
+        self.once = db.add_memo(self.conn, "오늘은 회사 일이 많았고 저녁에는 친구를 만나 밥을 먹은 뒤 잠깐 수영장에 들렀다 " * 3, [], False)
+        self.other = db.add_memo(self.conn, "바닷가에서 Python 공부", ["공부"], True)
+        db.upsert_diary(self.conn, date(2024, 5, 1), "비 오는 날 수영장에 갔다", "😐", ["운동"])
+        db.add_todo(self.conn, "수영장 회원권 연장", date(2024, 5, 2), None, "높음")
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _memos(self, q: str):
+        return db.search_page(self.conn, "메모", q, [], "전체", [], limit=50)[0]
+
+    def test_trigram_matches_inside_words(self):
+        self.assertEqual([r["id"] for r in self._memos("닷가에")], [self.other])
+        self.assertEqual([r["id"] for r in self._memos("python")], [self.other])  # 대소문자 구분 없음
+        res = db.search_all(self.conn, "수영장", ["일기", "메모", "할 일"], [], "전체", [])
+        self.assertEqual((len(res["일기"]), len(res["메모"]), len(res["할 일"])), (1, 2, 1))
+
+    def test_bm25_orders_by_relevance(self):
+        rows = self._memos("수영장")
+        self.assertEqual([r["id"] for r in rows], [self.many, self.once])
+        # 강조 표시는 색인이 만든 snippet 에, 본문은 결과에 넣지 않는다
+        self.assertIn(f"{db.HL_START}수영장{db.HL_END}", rows[0]["snippet"])
+        self.assertNotIn("text", rows[0])
+
+    def test_short_terms_added_as_like(self):
+        res = db.search_all(self.conn, "수영장 비", ["일기", "메모"], [], "전체", [])
+        self.assertEqual([r["d"] for r in res["일기"]], ["2024-05-01"])
+        self.assertEqual(res["메모"], [])
+        # 2글자 검색어만 있으면 LIKE 만 (snippet 은 본문에서 만든다)
+        rows = self._memos("공부")
+        self.assertEqual([r["id"] for r in rows], [self.other])
+        self.assertIn(f"{db.HL_START}공부{db.HL_END}", rows[0]["snippet"])
+
+    def test_index_follows_updates_and_deletes(self):
+        db.update_memo(self.conn, self.other, "산골짜기에서 공부", ["공부"], True)
+        self.assertEqual(self._memos("닷가에"), [])
+        self.assertEqual([r["id"] for r in self._memos("골짜기")], [self.other])
+        db.delete_memo(self.conn, self.many)
+        self.assertEqual([r["id"] for r in self._memos("수영장")], [self.once])
+        with db.writing(self.conn) as c:
+            for fts, _, _ in db.FTS_SOURCES:
+                c.execute(f"INSERT INTO {fts}({fts}, rank) VALUES('integrity-check', 1)")
+
+    def test_fts_finds_same_rows_as_like_scan(self):
+        for q in ("수영장", "영장에", "회원권 연장", "Python"):
+            fts = {k: sorted(r["id"] for r in v) for k, v in db.search_all(self.conn, q, ["일기", "메모", "할 일"], [], "전체", []).items()}
+            db.cache_clear()
+            with mock.patch.object(db, "_has_fts", return_value=False):
+                like = {k: sorted(r["id"] for r in v) for k, v in db.search_all(self.conn, q, ["일기", "메모", "할 일"], [], "전체", []).items()}
+            db.cache_clear()
+            self.assertEqual(fts, like, q)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+# tests/test_migrations.py
+# 역할: user_version 마이그레이션 확인 — 예전(문자열 날짜/기분/우선순위) DB 를 최신 단계까지 올렸을 때 값/색인/파생 테이블이 맞는지,
+#       다시 열어도 아무것도 바꾸지 않는지, 실패한 단계는 통째로 롤백되는지.
+# 실행 (diary_final/ 에서): python -m pytest -q tests
+
+import os, shutil, sqlite3, tempfile, unittest
+from datetime import date
+from unittest import mock
+
+from modules import db
+
+def _legacy_db(path: str):
+    # 마이그레이션 도입 전 DB: 1단계 기본 테이블에 문자열 값, 같은 날짜 일기 2건, user_version 0
+    c = sqlite3.connect(path)
+    c.row_factory = sqlite3.Row
+    db._m1_base(c.cursor(), lambda done, total: None)
+    c.executemany("INSERT INTO diary(d, text, mood, tags, saved_at) VALUES(?,?,?,?,?)", [
+        ("2024-05-01", "먼저 쓴 일기", "😐", "", "2024-05-01T09:00:00"),
+        ("2024-05-01", "나중에 고친 일기\n둘째 줄", "🙂", "여행,가족", "2024-05-01T21:00:00"),
+        ("2024-05-02", "바닷가 산책" * 30, "😄", "여행", "2024-05-02T20:00:00"),
+    ])
+    c.execute("INSERT INTO memos(text, tags, pinned, created_at) VALUES('회의 준비 메모', '업무', 1, '2024-05-01T10:00:00')")
+    c.execute("INSERT INTO todos(title, d, due, priority, done, created_at, tags) "
+              "VALUES('장보기', '2024-05-03', '18:00', '긴급', 0, '2024-05-01T08:00:00', '집')")
+    c.execute("INSERT INTO todos(title, d, due, priority, done, created_at) VALUES('언젠가', NULL, NULL, NULL, 0, '2024-05-01T08:00:00')")
+    c.commit()
+    c.close()
+
+class MigrationTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "app.db")
+        _legacy_db(self.path)
+        self.steps = []
+        self.conn = db.ConnectionPool(self.path)
+        db.init_schema(self.conn, progress=lambda desc, done, total: self.steps.append(desc))
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_legacy_db_reaches_latest_version(self):
+        self.assertEqual(db.schema_version(self.conn), db.SCHEMA_VERSION)
+        # 1단계(기본 테이블)는 이미 있고 진행 보고도 없다. 2단계부터 차례로
+        self.assertEqual(list(dict.fromkeys(self.steps)), [desc for _, desc, _ in db.MIGRATIONS[1:]])
+        with db.reading(self.conn) as c:
+            # 2단계: 정수 날짜/코드, 3단계: 날짜당 일기 1건 (나중 행)
+            rows = c.execute("SELECT d, mood, text, snippet, body_len, has_more, updated_at FROM diary ORDER BY d").fetchall()
+            self.assertEqual([(r["d"], r["mood"]) for r in rows],
+                             [(db.day_num(date(2024, 5, 1)), 4), (db.day_num(date(2024, 5, 2)), 5)])
+            self.assertEqual(rows[0]["text"], "나중에 고친 일기\n둘째 줄")
+            # 4단계: 목록용 열, 5단계: updated_at 은 저장 시각으로
+            self.assertEqual((rows[0]["snippet"], rows[0]["has_more"]), ("나중에 고친 일기 둘째 줄", 0))
+            self.assertEqual((rows[1]["body_len"], rows[1]["has_more"]), (len("바닷가 산책") * 30, 1))
+            self.assertEqual(rows[1]["updated_at"], "2024-05-02T20:00:00")
+            todos = c.execute("SELECT title, d, priority, due FROM todos ORDER BY id").fetchall()
+            self.assertEqual([tuple(r) for r in todos],
+                             [("장보기", db.day_num(date(2024, 5, 3)), 3, "18:00"), ("언젠가", None, 1, None)])
+            self.assertEqual(c.execute("SELECT typeof(d) FROM diary LIMIT 1").fetchone()[0], "integer")
+            # 6단계 뒤 init_schema 가 만든 할 일 색인
+            ddl = c.execute("SELECT sql FROM sqlite_master WHERE name='idx_todos_day'").fetchone()[0]
+            self.assertIn("due IS NULL", ddl)
+        # 예전 CSV 태그와 본문은 정규화 태그·전문 검색 색인으로 옮겨져 있다
+        self.assertEqual({t["name"]: t["cnt"] for t in db.tag_counts(self.conn, kind="diary")}, {"여행": 2, "가족": 1})
+        res = db.search_all(self.conn, "고친 일기", ["일기"], [], "전체", [])
+        self.assertEqual([r["d"] for r in res["일기"]], ["2024-05-01"])
+
+    def test_reopen_is_noop(self):
+        with db.reading(self.conn) as c:
+            before = c.execute("SELECT type, name, sql FROM sqlite_master ORDER BY name").fetchall()
+        steps = []
+        self.assertEqual(db.migrate(self.conn, lambda desc, done, total: steps.append(desc)), db.SCHEMA_VERSION)
+        db.init_schema(self.conn)
+        self.assertEqual(steps, [])
+        with db.reading(self.conn) as c:
+            self.assertEqual(c.execute("SELECT type, name, sql FROM sqlite_master ORDER BY name").fetchall(), before)
+
+    def test_failed_step_rolls_back(self):
+        def broken(cur, progress):
+            cur.execute("ALTER TABLE memos ADD COLUMN half_done TEXT")
+            raise RuntimeError("중간 실패")
+        with mock.patch.object(db, "MIGRATIONS", db.MIGRATIONS + [(db.SCHEMA_VERSION + 1, "실패하는 단계", broken)]):
+            with self.assertRaises(RuntimeError):
+                db.migrate(self.conn)
+        self.assertEqual(db.schema_version(self.conn), db.SCHEMA_VERSION)
+        with db.reading(self.conn) as c:
+            self.assertNotIn("half_done", [r[1] for r in c.execute("PRAGMA table_info(memos)")])
+
+if __name__ == "__main__":
+    unittest.main()
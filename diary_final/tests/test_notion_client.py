@@ -0,0 +1,138 @@
+# tests/test_notion_client.py
+# 역할: NotionSync 를 로컬 목 HTTP 서버(http.server, 포트 0)에 붙여 outbox 동기화 흐름을 확인한다.
+# 실행 (diary_final/ 에서): python -m pytest -q tests   또는   python -m unittest discover -s tests -t .
+
+import json, os, shutil, tempfile, threading, unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from modules import db
+from modules.notion_client import NotionSync
+
+class MockNotion(ThreadingHTTPServer):
+    """POST /pages, PATCH /pages/<id> 만 흉내 낸다. 받은 요청을 requests 에 쌓는다."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.requests = []          # (method, path, body)
+        self.fail_next = []         # 다음 요청들에 줄 (상태, 헤더) — 비면 정상 응답
+        self.on_request = None      # 응답 전에 부를 함수 (method, path, body)
+        self.pages = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, fmt, *args):
+        pass
+
+    def _handle(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(n)) if n else None
+        srv = self.server
+        with srv.lock:
+            srv.requests.append((self.command, self.path, body))
+            forced = srv.fail_next.pop(0) if srv.fail_next else None
+        if forced:
+            status, headers = forced
+            self.send_response(status)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            payload = b'{"object": "error"}'
+        else:
+            if srv.on_request:
+                srv.on_request(self.command, self.path, body)
+            if self.command == "POST":
+                with srv.lock:
+                    srv.pages += 1
+                    page_id = f"page-{srv.pages}"
+            else:
+                page_id = self.path.rsplit("/", 1)[-1]
+            self.send_response(200)
+            payload = json.dumps({"object": "page", "id": page_id}).encode("utf-8")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_POST = do_PATCH = _handle
+
+class NotionSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.conn = db.get_pool(os.path.join(self.tmp, "app.db"))
+        self.server = MockNotion()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self._env = {k: os.environ.get(k) for k in ("NOTION_TOKEN", "NOTION_DB_TODOS", "NOTION_DB_DIARY", "NOTION_DB_MEMOS")}
+        os.environ.update(NOTION_TOKEN="secret", NOTION_DB_TODOS="db-todos", NOTION_DB_DIARY="db-diary", NOTION_DB_MEMOS="db-memos")
+        self.sync = NotionSync(base_url=self.server.url, rate=100.0, max_retries=3, timeout=5.0)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        for k, v in self._env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        self.conn.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _page_id(self, key: str):
+        with db.reading(self.conn) as c:
+            row = c.execute("SELECT page_id FROM notion_pages WHERE kind='memo' AND key=?", (key,)).fetchone()
+        return row["page_id"] if row else None
+
+    def test_create_update_archive(self):
+        mid = db.add_memo(self.conn, "첫 메모", ["업무"], False)
+        self.assertEqual(self.sync.sync_pending(self.conn), {"synced": 1, "deleted": 0, "failed": 0})
+        method, path, body = self.server.requests[-1]
+        self.assertEqual((method, path), ("POST", "/v1/pages"))
+        self.assertEqual(body["parent"], {"database_id": "db-memos"})
+        self.assertEqual(body["properties"]["Text"]["rich_text"][0]["text"]["content"], "첫 메모")
+        self.assertEqual(self._page_id(str(mid)), "page-1")
+        self.assertEqual(db.outbox_count(self.conn), 0)
+
+        db.update_memo(self.conn, mid, "고친 메모", ["업무"], True)
+        self.assertEqual(self.sync.sync_pending(self.conn), {"synced": 1, "deleted": 0, "failed": 0})
+        method, path, body = self.server.requests[-1]
+        self.assertEqual((method, path), ("PATCH", "/v1/pages/page-1"))
+        self.assertEqual(body["properties"]["Text"]["rich_text"][0]["text"]["content"], "고친 메모")
+
+        db.delete_memo(self.conn, mid)
+        self.assertEqual(self.sync.sync_pending(self.conn), {"synced": 0, "deleted": 1, "failed": 0})
+        self.assertEqual(self.server.requests[-1], ("PATCH", "/v1/pages/page-1", {"archived": True}))
+        self.assertIsNone(self._page_id(str(mid)))
+        self.assertEqual(db.outbox_count(self.conn), 0)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_retry_after_429(self):
+        db.add_memo(self.conn, "한도 초과", [], False)
+        self.server.fail_next.append((429, {"Retry-After": "0.2"}))
+        self.assertEqual(self.sync.sync_pending(self.conn), {"synced": 1, "deleted": 0, "failed": 0})
+        self.assertEqual([r[:2] for r in self.server.requests], [("POST", "/v1/pages"), ("POST", "/v1/pages")])
+        self.assertEqual(db.outbox_count(self.conn), 0)
+
+    def test_changed_during_push_stays_queued(self):
+        mid = db.add_memo(self.conn, "보내는 중", [], False)
+
+        def edit_once(method, path, body):
+            # 첫 전송을 받는 사이 로컬에서 다시 고침 → outbox ver 증가
+            self.server.on_request = None
+            db.update_memo(self.conn, mid, "보내는 중에 고침", [], False)
+        self.server.on_request = edit_once
+
+        # limit=1: 첫 전송만 (제한이 없으면 같은 실행에서 남은 새 ver 까지 이어서 보낸다)
+        self.assertEqual(self.sync.sync_pending(self.conn, limit=1), {"synced": 1, "deleted": 0, "failed": 0})
+        self.assertEqual(self._page_id(str(mid)), "page-1")
+        self.assertEqual(db.outbox_count(self.conn), 1)  # 전송 중 바뀐 새 ver 는 남아 있다
+
+        self.assertEqual(self.sync.sync_pending(self.conn), {"synced": 1, "deleted": 0, "failed": 0})
+        method, path, body = self.server.requests[-1]
+        self.assertEqual((method, path), ("PATCH", "/v1/pages/page-1"))
+        self.assertEqual(body["properties"]["Text"]["rich_text"][0]["text"]["content"], "보내는 중에 고침")
+        self.assertEqual(db.outbox_count(self.conn), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+# tests/test_pagination.py
+# 역할: 키셋 페이지 확인 — 메모/일기 목록과 검색(FTS bm25) 결과를 페이지로 이어 읽으면 한 번에 읽은 순서와 같고
+#       (정렬 열이 같은 행 포함), 읽는 사이에 새 행이 들어와도 빠지거나 겹치지 않으며, 정렬 없이 색인 순서로 읽히는지.
+# 실행 (diary_final/ 에서): python -m pytest -q tests
+
+import os, shutil, tempfile, unittest
+from datetime import date, timedelta
+
+from modules import db
+
+def _walk(fetch, limit: int):
+    # fetch(after, limit) -> (행, 다음 커서) 를 끝까지
+    rows, after = [], None
+    while True:
+        page, after = fetch(after, limit)
+        rows += page
+        if after is None:
+            return rows
+
+class KeysetPageTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.conn = db.get_pool(os.path.join(self.tmp, "app.db"))
+        # 작성 시각이 같은 메모가 여럿 (id 로 순서가 갈린다), 고정 메모는 맨 앞
+        self.memos = [db.add_memo(self.conn, f"산책로 메모 {i} " + "산책로 " * (i % 4), [], i % 5 == 0) for i in range(23)]
+        with db.writing(self.conn) as c:
+            c.execute("UPDATE memos SET created_at = '2024-05-0' || (1 + id % 3) || 'T09:00:00'")
+        self.start = date(2024, 5, 1)
+        for i in range(17):
+            db.upsert_diary(self.conn, self.start + timedelta(days=i * 2), f"{i}번째 산책 일기", "🙂", [])
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_memo_pages_match_single_query(self):
+        with db.reading(self.conn) as c:
+            expected = [r[0] for r in c.execute("SELECT id FROM memos ORDER BY pinned DESC, created_at DESC, id DESC")]
+        for limit in (1, 4, 7, 23, 50):
+            rows = _walk(lambda after, n: db.list_memos_page(self.conn, after=after, limit=n), limit)
+            self.assertEqual([r["id"] for r in rows], expected, limit)
+
+    def test_diary_pages_match_single_query(self):
+        rows = _walk(lambda after, n: db.get_diary_page(self.conn, after=after, limit=n), 5)
+        self.assertEqual([r["date"] for r in rows],
+                         [(self.start + timedelta(days=i * 2)).isoformat() for i in range(16, -1, -1)])
+
+    def test_rows_added_while_paging_do_not_shift_pages(self):
+        first, after = db.list_memos_page(self.conn, limit=6)
+        db.add_memo(self.conn, "페이지 읽는 중에 쓴 메모", [], False)  # 맨 앞 페이지에 들어갈 새 행
+        rest = _walk(lambda a, n: db.list_memos_page(self.conn, after=a or after, limit=n), 6)
+        ids = [r["id"] for r in first + rest]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(sorted(ids), sorted(self.memos))
+
+    def test_search_pages_follow_bm25_order(self):
+        full = db.search_page(self.conn, "메모", "산책로", [], "전체", [], limit=100)[0]
+        self.assertEqual(sorted(r["id"] for r in full), sorted(self.memos))
+        rows = _walk(lambda after, n: db.search_page(self.conn, "메모", "산책로", [], "전체", [], after=after, limit=n), 4)
+        self.assertEqual([r["id"] for r in rows], [r["id"] for r in full])
+        ranks = [r["rank"] for r in rows]
+        self.assertEqual(ranks, sorted(ranks))
+
+    def test_pages_read_in_index_order(self):
+        with db.reading(self.conn) as c:
+            for sql in ("SELECT id FROM memos WHERE (pinned, created_at, id) < (?, ?, ?) "
+                        "ORDER BY pinned DESC, created_at DESC, id DESC LIMIT 8",
+                        "SELECT id FROM diary WHERE (d, id) < (?, ?) ORDER BY d DESC, id DESC LIMIT 8"):
+                plan = " / ".join(r[3] for r in c.execute("EXPLAIN QUERY PLAN " + sql, (1, "x", 1)[:sql.count("?")]))
+                self.assertIn("USING", plan, sql)
+                self.assertNotIn("TEMP B-TREE", plan, sql)
+
+if __name__ == "__main__":
+    unittest.main()
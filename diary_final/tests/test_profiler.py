@@ -0,0 +1,56 @@
+# tests/test_profiler.py
+# 역할: profiler.enable() 이 db 공개 함수를 감싸는지 확인 — 루트와, db 를 다시 내보내는 app/ shim 아래 둘 다.
+# 실행 (diary_final/ 에서): python -m pytest -q tests
+
+import os, shutil, subprocess, sys, tempfile, unittest
+
+from modules import db, profiler
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+
+# app/ 에서는 `modules` 가 app/modules 라 같은 프로세스에서 부를 수 없어 따로 실행한다
+_APP_SCRIPT = """
+import os, sys, tempfile
+from modules import db, profiler
+import diary_core_db as core
+conn = db.get_pool(os.path.join(tempfile.mkdtemp(), "app.db"))
+before = (db.add_memo, db.reading, core.add_memo, core.reading)
+profiler.enable()
+db.add_memo(conn, "메모", [], False)
+doc = db.create_document(conn, "a.pdf", "pdf")
+names = sorted(f["name"] for f in profiler.report()["functions"])
+profiler.disable()
+restored = before == (db.add_memo, db.reading, core.add_memo, core.reading)
+print(",".join(names), restored)
+"""
+
+class ProfilerWrapTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.conn = db.get_pool(os.path.join(self.tmp, "app.db"))
+
+    def tearDown(self):
+        profiler.disable()
+        profiler.reset()
+        self.conn.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_root_functions_wrapped_and_restored(self):
+        original = db.add_memo
+        profiler.enable()
+        self.assertIsNot(db.add_memo, original)
+        db.add_memo(self.conn, "메모", [], False)
+        self.assertIn("add_memo", [f["name"] for f in profiler.report()["functions"]])
+        profiler.disable()
+        self.assertIs(db.add_memo, original)
+
+    def test_app_shim_wraps_reexported_core_functions(self):
+        out = subprocess.run([sys.executable, "-c", _APP_SCRIPT], cwd=APP_DIR, capture_output=True,
+                             text=True, timeout=120)
+        self.assertEqual(out.returncode, 0, out.stderr)
+        names, restored = out.stdout.split()
+        self.assertEqual(names.split(","), ["add_memo", "create_document"])
+        self.assertEqual(restored, "True")
+
+if __name__ == "__main__":
+    unittest.main()
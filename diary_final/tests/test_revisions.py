@@ -0,0 +1,94 @@
+# tests/test_revisions.py
+# 역할: 일기 개정 이력 확인 — zlib + JSON 변경분으로 저장한 모든 개정이 원문 그대로 되살아나는지,
+#       전체본 주기/이력 없이 바뀐 본문/손상된 이력 처리, 변경분 함수 자체의 왕복.
+# 실행 (diary_final/ 에서): python -m pytest -q tests
+
+import os, random, shutil, tempfile, unittest
+from datetime import date
+
+from modules import db
+
+def _edits(seed: int, n: int):
+    # 자동 저장처럼 한 곳씩 고치는 편집 n 번 (한글/이모지/줄바꿈 섞음)
+    rnd = random.Random(seed)
+    words = ["오늘", "바다", "산책을", "했다.", "🙂", "커피", "\n", "친구와", "저녁", "😄", "비가", "왔다"]
+    text = " ".join(rnd.choice(words) for _ in range(300))
+    out = []
+    for _ in range(n):
+        i = rnd.randrange(len(text) + 1)
+        op = rnd.random()
+        if op < 0.4:
+            text = text[:i] + " ".join(rnd.choice(words) for _ in range(rnd.randint(1, 5))) + text[i:]
+        elif op < 0.8:
+            text = text[:i] + text[i + rnd.randint(1, 30):]
+        else:
+            text = text[:i] + rnd.choice(words) + text[i + rnd.randint(1, 10):]
+        out.append(text)
+    return out
+
+class RevisionTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.conn = db.get_pool(os.path.join(self.tmp, "app.db"))
+        self.day = date(2024, 5, 1)
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_delta_round_trip(self):
+        rnd = random.Random(7)
+        alphabet = "가나다라마 abc\n😄"
+        for _ in range(300):
+            old = "".join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 60)))
+            new = "".join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 60)))
+            self.assertEqual(db._apply_delta(old, db._text_delta(old, new)), new)
+        old = "가" * 3000
+        new = "나" * 2000 + old  # 가운데 비교 상한(REV_DIFF_MAX)을 넘는 경우
+        self.assertEqual(db._apply_delta(old, db._text_delta(old, new)), new)
+
+    def test_every_revision_restores(self):
+        texts = _edits(1, db.REV_SNAPSHOT_EVERY * 2 + 5)
+        for i, t in enumerate(texts):
+            self.assertTrue(db.upsert_diary(self.conn, self.day, t, "🙂", ["기록"] if i % 2 else []))
+        self.assertFalse(db.upsert_diary(self.conn, self.day, texts[-1], "🙂", []))  # 그대로면 개정을 쌓지 않음
+        revs = db.list_diary_revisions(self.conn, self.day)
+        self.assertEqual([r["rev"] for r in revs], list(range(len(texts), 0, -1)))
+        # 전체본은 1번과 REV_SNAPSHOT_EVERY 마다. 나머지는 변경분이라 전체본보다 훨씬 작다
+        full = sorted(r["rev"] for r in revs if r["full"])
+        self.assertEqual(full, [1, 1 + db.REV_SNAPSHOT_EVERY, 1 + 2 * db.REV_SNAPSHOT_EVERY])
+        self.assertLess(max(r["size"] for r in revs if not r["full"]), min(r["size"] for r in revs if r["full"]) / 4)
+        for rev, t in enumerate(texts, start=1):
+            r = db.get_diary_revision(self.conn, self.day, rev)
+            self.assertEqual(r["text"], t, rev)
+            self.assertEqual(r["tags"], ["기록"] if (rev - 1) % 2 else [])
+        # 복원도 새 개정으로 쌓이고 현재 일기가 그 본문이 된다
+        self.assertTrue(db.restore_diary_revision(self.conn, self.day, 3))
+        self.assertEqual(db.get_diary_for_date(self.conn, self.day)["text"], texts[2])
+        self.assertEqual(db.get_diary_revision(self.conn, self.day, len(texts) + 1)["text"], texts[2])
+
+    def test_out_of_band_change_starts_full_revision(self):
+        texts = _edits(2, 4)
+        for t in texts[:2]:
+            db.upsert_diary(self.conn, self.day, t, "🙂", [])
+        # 가져오기처럼 이력 없이 본문이 바뀐 뒤 저장 → 직전 개정과 crc 가 달라 전체본으로 시작
+        db.bulk_upsert(self.conn, "diary", [{"d": self.day.isoformat(), "text": texts[2], "mood": "🙂", "tags": ""}])
+        db.upsert_diary(self.conn, self.day, texts[3], "🙂", [])
+        revs = {r["rev"]: r for r in db.list_diary_revisions(self.conn, self.day)}
+        self.assertTrue(revs[3]["full"])
+        self.assertEqual([db.get_diary_revision(self.conn, self.day, rev)["text"] for rev in (1, 2, 3)],
+                         [texts[0], texts[1], texts[3]])
+
+    def test_damaged_history_is_reported(self):
+        texts = _edits(3, 3)
+        for t in texts:
+            db.upsert_diary(self.conn, self.day, t, "🙂", [])
+        with db.writing(self.conn) as c:
+            c.execute("UPDATE diary_revisions SET crc=crc+1 WHERE d=? AND rev=2", (db.day_num(self.day),))
+        self.assertEqual(db.get_diary_revision(self.conn, self.day, 1)["text"], texts[0])
+        with self.assertRaises(ValueError):
+            db.get_diary_revision(self.conn, self.day, 2)
+        self.assertIsNone(db.get_diary_revision(self.conn, self.day, 99))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+# tests/test_search.py
+# 역할: 검색(search_page) 의 키셋 페이지 이동 확인 — 날짜 없는 할 일까지 모든 페이지를 빠짐없이 도는지.
+# 실행 (diary_final/ 에서): python -m pytest -q tests
+
+import os, shutil, tempfile, unittest
+from datetime import date
+
+from modules import db
+
+class SearchPageTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.conn = db.get_pool(os.path.join(self.tmp, "app.db"))
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _all_pages(self, kind: str, q: str, limit: int = 3):
+        ids, after, pages = [], None, 0
+        while True:
+            rows, after = db.search_page(self.conn, kind, q, [], "전체", [], after=after, limit=limit)
+            ids += [r["id"] for r in rows]
+            pages += 1
+            if after is None:
+                return ids, pages
+            self.assertLess(pages, 20)
+
+    def test_todos_without_date_reach_later_pages(self):
+        dated = [db.add_todo(self.conn, f"장보기 목록 {i}", date(2024, 5, 1 + i), None, "보통") for i in range(5)]
+        undated = [db.add_todo(self.conn, f"장보기 목록 {i}", None, None, "보통") for i in range(5, 10)]
+        db.add_todo(self.conn, "다른 일", None, None, "보통")
+
+        # 2글자 검색어 → LIKE + (d, id) 키셋: 날짜 내림차순, 날짜 없는 할 일은 맨 뒤 (id 내림차순)
+        ids, pages = self._all_pages("할 일", "장보")
+        self.assertEqual(ids, dated[::-1] + undated[::-1])
+        self.assertEqual(pages, 4)
+
+        # 3글자 이상 → FTS (bm25, id) 키셋
+        ids, _ = self._all_pages("할 일", "장보기")
+        self.assertEqual(sorted(ids), sorted(dated + undated))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+# tests/test_semantic.py
+# 역할: 의미 색인 갱신 확인 — 대기열 삭제 커밋 전에 멈춰도 문서 빈도(df)를 두 번 세지 않는지, 백그라운드 작업으로 반영되는지.
+# 실행 (diary_final/ 에서): python -m pytest -q tests
+
+import os, shutil, tempfile, unittest
+from datetime import date
+from unittest import mock
+
+import numpy as np
+
+from modules import db, jobs, semantic
+
+def _recount(idx) -> np.ndarray:
+    # 살아 있는 행의 벡터에서 df 를 직접 센 값
+    used = idx.next_slot
+    return (np.asarray(idx.mm[:used])[idx.kinds[:used] > 0] > 0).sum(axis=0).astype(np.float64)
+
+class _Ctx:
+    def progress(self, done, total, message=""):
+        pass
+
+class SemanticRefreshTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "app.db")
+        self.conn = db.get_pool(self.path)
+        db.upsert_diary(self.conn, date(2024, 5, 1), "바다에 가서 수영을 했다", "🙂", ["여행"])
+        self.memo = db.add_memo(self.conn, "회의 자료 정리하기", ["업무"], False)
+
+    def tearDown(self):
+        semantic._INDEXES.pop(os.path.abspath(self.path), None)
+        self.conn.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _crash_before_commit(self, idx):
+        with mock.patch.object(semantic.db, "writing", side_effect=RuntimeError("중단")):
+            with self.assertRaises(RuntimeError):
+                idx.refresh()
+
+    def test_crash_before_dequeue_does_not_double_count_df(self):
+        self._crash_before_commit(semantic.SemanticIndex(self.conn, self.path))
+        # 프로세스가 죽은 뒤 다시 열었다고 보고 새 색인으로 이어서 반영
+        idx = semantic.SemanticIndex(self.conn, self.path)
+        self.assertEqual(idx.pending(), 2)
+        while idx.refresh():
+            pass
+        np.testing.assert_array_equal(idx.df, _recount(idx))
+
+        db.update_memo(self.conn, self.memo, "회의록 다시 쓰기", ["업무"], False)
+        self._crash_before_commit(idx)
+        np.testing.assert_array_equal(idx.df, _recount(idx))  # 같은 프로세스에서도 커밋된 상태로 돌아간다
+        idx = semantic.SemanticIndex(self.conn, self.path)
+        while idx.refresh():
+            pass
+        np.testing.assert_array_equal(idx.df, _recount(idx))
+        self.assertEqual(idx.search("회의록", k=1)[0]["id"], self.memo)
+
+    def test_semantic_job_drains_queue(self):
+        res = jobs.HANDLERS["semantic"](self.conn, {"db_path": self.path}, _Ctx())
+        self.assertEqual(res, {"embedded": 2})
+        idx = semantic.get_index(self.conn, self.path)
+        self.assertEqual(idx.pending(), 0)
+        self.assertEqual(idx.search("수영", k=1)[0]["kind"], "diary")
+
+if __name__ == "__main__":
+    unittest.main()
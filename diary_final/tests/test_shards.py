@@ -0,0 +1,42 @@
+# tests/test_shards.py
+# 역할: 사용자별 DB 라우터의 LRU 확인 — 밀려난 풀이 db.get_pool 등록에서도 빠지고, 다시 써도 동작하는지.
+# 실행 (diary_final/ 에서): python -m pytest -q tests
+
+import gc, os, shutil, tempfile, unittest, weakref
+
+from modules import db, shards
+
+class RouterEvictionTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.router = shards.Router(root=self.tmp, max_open=1, idle_close=0)
+
+    def tearDown(self):
+        self.router.close()
+        for user in ("alice", "bob"):
+            db._POOLS.pop(os.path.abspath(self.router.path(user)), None)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_evicted_pool_is_released(self):
+        mid = db.add_memo(self.router.pool("alice"), "앨리스 메모", [], False)
+        ref = weakref.ref(self.router.pool("alice"))
+        db.add_memo(self.router.pool("bob"), "밥 메모", [], False)  # alice 가 밀려난다
+        self.assertEqual(self.router.stats["evictions"], 1)
+        self.assertNotIn(os.path.abspath(self.router.path("alice")), db._POOLS)
+        self.assertEqual(self.router.info()["known"], 1)
+        gc.collect()
+        self.assertIsNone(ref())
+        # 다시 접속하면 새 풀로 같은 파일을 연다
+        alice = self.router.pool("alice")
+        self.assertEqual(db.get_memo(alice, mid)["text"], "앨리스 메모")
+        self.assertIs(db._POOLS[os.path.abspath(self.router.path("alice"))], alice)
+
+    def test_held_evicted_pool_reopens_and_rejoins(self):
+        alice = self.router.pool("alice")
+        self.router.pool("bob")
+        self.assertEqual(self.router.stats["evictions"], 1)
+        db.add_memo(alice, "다시 쓴 메모", [], False)  # 닫힌 풀을 다시 쓰면 연결을 새로 연다
+        self.assertIs(self.router.pool("alice"), alice)
+
+if __name__ == "__main__":
+    unittest.main()
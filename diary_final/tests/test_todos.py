@@ -0,0 +1,41 @@
+# tests/test_todos.py
+# 역할: 할 일 목록 정렬 확인 — 날짜별 목록과 일정(agenda)이 같은 순서(마감 없음은 맨 뒤)이고 색인 순서 그대로 읽히는지.
+# 실행 (diary_final/ 에서): python -m pytest -q tests
+
+import os, shutil, tempfile, unittest
+from datetime import date, time, timedelta
+
+from modules import db
+
+class TodoOrderTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.conn = db.get_pool(os.path.join(self.tmp, "app.db"))
+        self.day = date(2024, 5, 2)
+        for title, due, pri in [("마감 없음", None, "높음"), ("오후", time(15, 0), "높음"),
+                                ("아침", time(9, 0), "높음"), ("낮은 우선순위", time(8, 0), "낮음")]:
+            db.add_todo(self.conn, title, self.day, due, pri)
+        self.expected = ["아침", "오후", "마감 없음", "낮은 우선순위"]
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_day_list_and_agenda_share_order(self):
+        self.assertEqual([t["title"] for t in db.list_todos_for_date(self.conn, self.day)], self.expected)
+        agenda = db.get_agenda(self.conn, self.day - timedelta(days=1))
+        self.assertEqual([t["title"] for t in agenda["upcoming"]], self.expected)
+        overdue = db.get_agenda(self.conn, self.day + timedelta(days=1))["overdue"]
+        self.assertEqual([t["title"] for t in overdue], self.expected)
+
+    def test_orders_read_from_index_without_sort(self):
+        with db.reading(self.conn) as c:
+            plan = c.execute("EXPLAIN QUERY PLAN SELECT * FROM todos WHERE d=? "
+                             "ORDER BY done ASC, priority DESC, due IS NULL, due ASC, id ASC", (1,)).fetchall()
+            self.assertEqual([r[3] for r in plan], ["SEARCH todos USING INDEX idx_todos_day (d=?)"])
+            plan = c.execute("EXPLAIN QUERY PLAN SELECT * FROM todos INDEXED BY idx_todos_open WHERE done=0 AND d < ? "
+                             "ORDER BY d ASC, priority DESC, due IS NULL, due ASC, id ASC LIMIT 5", (1,)).fetchall()
+            self.assertFalse([r for r in plan if "TEMP B-TREE" in r[3]])
+
+if __name__ == "__main__":
+    unittest.main()